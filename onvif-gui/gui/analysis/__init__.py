@@ -0,0 +1,15 @@
+from .batcher import InferenceBatcher
+from .mailbox import FrameMailbox
+from .throttle import RateController
+from .pool import AnalysisPool
+from .audiopool import AudioPool, AudioFrame
+from .preprocess import Letterbox
+from .modelcache import ModelCache, model_cache
+from .sequencer import ResultSequencer
+from .detectioncache import DetectionCache
+from .motiongate import MotionGate
+from .regions import parse_regions, format_regions, region_crops, RegionResult
+from .background import BackgroundModel
+from .zones import parse_zones, format_zones, ZoneMap
+from .spectrum import rms, magnitudes, band_mask, band_level, window_weights, AudioWindow, WINDOW_FUNCTIONS
+from .postprocess import decode_yolov8, decode_yolox, nms, scale_boxes, postprocess_yolov8
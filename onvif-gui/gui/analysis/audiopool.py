@@ -0,0 +1,144 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/audiopool.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+
+import os
+import threading
+from collections import deque
+import numpy as np
+from loguru import logger
+
+class AudioFrame():
+    # Copy of the samples of a decoder frame, so the decoder can reuse its
+    # frame as soon as the callback returns.  Supports the parts of the
+    # frame interface the audio workers use.
+
+    def __init__(self, F):
+        self.samples = np.array(F, copy=True)
+        self.nb_channels = F.channels()
+
+    def channels(self):
+        return self.nb_channels
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is not None and dtype != self.samples.dtype:
+            return self.samples.astype(dtype)
+        return self.samples.copy() if copy else self.samples
+
+class AudioPool():
+    # Runs the loaded AudioWorker on a set of threads so the decoder audio
+    # callback only has to copy the frame and return.  Unlike video, every
+    # audio frame counts, the samples of a stream are analyzed in order as a
+    # continuous signal.  Each player has a bounded queue and is handled by
+    # one thread at a time, which takes all of its queued frames in one go,
+    # so per player state needs no locking while different players run in
+    # parallel.  A queue that fills up drops its oldest frame.  Workers that
+    # do not declare thread_safe are run one at a time.  Frames arriving from
+    # a player that is shutting down are turned away, so a late decoder
+    # callback cannot bring back the queue of a discarded player.
+
+    def __init__(self, mw, size=None, depth=64):
+        self.mw = mw
+        self.size = size if size else max(1, min(4, os.cpu_count() or 1))
+        self.depth = depth
+        self.queues = {}
+        self.ready = deque()
+        self.scheduled = set()
+        self.dropped = 0
+        self.cond = threading.Condition()
+        self.worker_lock = threading.Lock()
+        self.running = True
+
+        self.threads = []
+        for i in range(self.size):
+            thread = threading.Thread(target=self.run, name=f'audio-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, F, player):
+        frame = AudioFrame(F)
+        with self.cond:
+            if not self.running or not player.running:
+                return
+            queue = self.queues.get(player)
+            if queue is None:
+                queue = self.queues[player] = deque(maxlen=self.depth)
+            if len(queue) == self.depth:
+                self.dropped += 1
+            queue.append(frame)
+            if player not in self.scheduled:
+                self.scheduled.add(player)
+                self.ready.append(player)
+                self.cond.notify()
+
+    def discard(self, player):
+        with self.cond:
+            self.queues.pop(player, None)
+            if player in self.ready:
+                self.ready.remove(player)
+                self.scheduled.discard(player)
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.queues.clear()
+            self.ready.clear()
+            self.scheduled.clear()
+            self.cond.notify_all()
+
+    def __str__(self):
+        return f'Audio analysis dropped {self.dropped} frames'
+
+    def take(self):
+        with self.cond:
+            while self.running and not len(self.ready):
+                self.cond.wait()
+            if not self.running:
+                return None
+            player = self.ready.popleft()
+            frames = []
+            if queue := self.queues.get(player):
+                frames = list(queue)
+                queue.clear()
+            return player, frames
+
+    def done(self, player):
+        with self.cond:
+            if self.queues.get(player):
+                self.ready.append(player)
+                self.cond.notify()
+            else:
+                self.scheduled.discard(player)
+
+    def run(self):
+        while item := self.take():
+            player, frames = item
+            for frame in frames:
+                try:
+                    self.analyze(frame, player)
+                except Exception as ex:
+                    logger.exception(f'audio analysis error: {ex}')
+            self.done(player)
+
+    def analyze(self, F, player):
+        if getattr(self.mw.audioWorker, "thread_safe", False):
+            self.mw.pyAudioAnalysis(F, player)
+        else:
+            with self.worker_lock:
+                self.mw.pyAudioAnalysis(F, player)
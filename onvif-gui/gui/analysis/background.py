@@ -0,0 +1,91 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/background.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import numpy as np
+import cv2
+
+class BackgroundModel():
+    # Motion of one stream against a running average of its past frames.
+    # Frames are reduced to a small blurred gray copy first, so the cost
+    # hardly depends on the stream resolution, and every intermediate image
+    # is kept between calls and written in place.  The background follows
+    # slow changes such as daylight or clouds at the learning rate, while a
+    # moving object stands out against it for as long as it keeps moving.
+    #
+    #   width - width of the working copy, the height keeps the aspect ratio
+    #   alpha - weight of each new frame in the background
+    #   level - gray level difference from the background that counts as motion
+
+    def __init__(self, width=320, alpha=0.05, level=20):
+        self.width = width
+        self.alpha = alpha
+        self.level = level
+        self.size = None
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+    def allocate(self, img):
+        h, w = img.shape[:2]
+        width = min(self.width, w)
+        self.size = (width, max(1, round(h * width / w)))
+        self.source = img.shape
+        # point sampling to a few times the working size before the area average
+        # keeps the cost of the reduction low on large frames
+        self.sample = None
+        if w > width * 4:
+            self.sample = np.empty((self.size[1] * 4, width * 4) + img.shape[2:], dtype=np.uint8)
+        self.small = np.empty((self.size[1], width) + img.shape[2:], dtype=np.uint8)
+        self.gray = np.empty((self.size[1], width), dtype=np.uint8)
+        self.blur = np.empty_like(self.gray)
+        self.reference = np.empty_like(self.gray)
+        self.diff = np.empty_like(self.gray)
+        self.mask = np.empty_like(self.gray)
+        self.background = None
+
+    def reduce(self, img):
+        if self.sample is not None:
+            cv2.resize(img, self.sample.shape[1::-1], dst=self.sample, interpolation=cv2.INTER_NEAREST)
+            img = self.sample
+        cv2.resize(img, self.size, dst=self.small, interpolation=cv2.INTER_AREA)
+        if self.small.ndim == 3:
+            cv2.cvtColor(self.small, cv2.COLOR_RGB2GRAY, dst=self.gray)
+        else:
+            self.gray[...] = self.small
+        cv2.GaussianBlur(self.gray, (5, 5), 0, dst=self.blur)
+        return self.blur
+
+    def apply(self, img):
+        # returns the motion mask, 255 where the frame differs from the background
+        if self.size is None or img.shape != self.source:
+            self.allocate(img)
+
+        blur = self.reduce(img)
+        if self.background is None:
+            self.background = blur.astype(np.float32)
+            self.mask.fill(0)
+            return self.mask
+
+        cv2.convertScaleAbs(self.background, dst=self.reference)
+        cv2.absdiff(blur, self.reference, dst=self.diff)
+        cv2.threshold(self.diff, self.level, 255, cv2.THRESH_BINARY, dst=self.mask)
+        cv2.morphologyEx(self.mask, cv2.MORPH_OPEN, self.kernel, dst=self.mask)
+        cv2.accumulateWeighted(blur, self.background, self.alpha)
+        return self.mask
+
+    def reset(self):
+        self.background = None
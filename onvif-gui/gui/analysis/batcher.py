@@ -0,0 +1,115 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/batcher.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import time
+import threading
+from loguru import logger
+
+class InferenceBatcher():
+    # Collects the most recent frame from each player and hands them to
+    # run_batch as a list once max_batch_size frames are waiting or the
+    # oldest frame has waited max_wait seconds.  run_batch is called from
+    # the batcher thread, which exits after idle_timeout seconds without
+    # work and is restarted by the next submit.  A run_batch that starts
+    # asynchronous inference requests gives each request its own frames,
+    # starting one only blocks once every request is busy, so the next
+    # batch is gathered while the earlier ones are still running.
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait=0.02, idle_timeout=5.0):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+        self.idle_timeout = idle_timeout
+        self.statsCallback = None
+        self.stats_interval = 1.0
+
+        self.pending = {}
+        self.cond = threading.Condition()
+        self.thread = None
+        self.running = False
+
+        self.batch_count = 0
+        self.frame_count = 0
+        self.last_batch_size = 0
+        self.average_batch_size = 0.0
+        self.last_stats_time = 0
+
+    def submit(self, key, item):
+        with self.cond:
+            if key in self.pending:
+                # a newer frame replaces the waiting one but keeps its place in line
+                self.pending[key] = (self.pending[key][0], item)
+            else:
+                self.pending[key] = (time.monotonic(), item)
+
+            if not self.running:
+                self.running = True
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+            self.cond.notify()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.pending.clear()
+            self.cond.notify_all()
+
+    def next_batch(self):
+        with self.cond:
+            while self.running and not len(self.pending):
+                if not self.cond.wait(self.idle_timeout) and not len(self.pending):
+                    self.running = False
+
+            if not self.running:
+                return None
+
+            deadline = next(iter(self.pending.values()))[0] + self.max_wait
+            while self.running and len(self.pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+
+            if not self.running:
+                return None
+
+            keys = list(self.pending.keys())[:self.max_batch_size]
+            return [self.pending.pop(key)[1] for key in keys]
+
+    def run(self):
+        while batch := self.next_batch():
+            try:
+                self.run_batch(batch)
+            except Exception as ex:
+                logger.exception(f'inference batch error: {ex}')
+
+            self.batch_count += 1
+            self.frame_count += len(batch)
+            self.last_batch_size = len(batch)
+            if self.batch_count == 1:
+                self.average_batch_size = float(len(batch))
+            else:
+                self.average_batch_size += 0.1 * (len(batch) - self.average_batch_size)
+
+            if self.statsCallback:
+                now = time.monotonic()
+                if now - self.last_stats_time > self.stats_interval:
+                    self.last_stats_time = now
+                    self.statsCallback(self)
@@ -0,0 +1,335 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/benchmark.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+# Timing of the detector post processing, motion and audio analysis on synthetic input
+#
+#   python -m gui.analysis.benchmark
+
+import math
+import time
+import numpy as np
+import cv2
+from .postprocess import postprocess_yolov8, decode_yolox, nms
+from .background import BackgroundModel
+from .spectrum import rms, magnitudes, band_level, AudioWindow, SEGMENT_SIZE, WINDOW_FUNCTIONS
+
+def timeit(func, repeat=50):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def yolov8_output(res=640, classes=80, objects=20, seed=0):
+    # raw (1, 4 + classes, anchors) output with clusters of overlapping candidates
+    # around a few objects and low scores everywhere else, similar to a busy scene
+    rng = np.random.default_rng(seed)
+    anchors = sum((res // s) ** 2 for s in (8, 16, 32))
+    pred = np.zeros((1, 4 + classes, anchors), dtype=np.float32)
+    pred[0, 4:] = rng.uniform(0, 0.05, (classes, anchors))
+
+    centers = rng.uniform(0.1 * res, 0.9 * res, (objects, 2))
+    sizes = rng.uniform(0.05 * res, 0.3 * res, (objects, 2))
+    labels = rng.integers(0, classes, objects)
+    owner = rng.integers(-1, objects, anchors)
+    for k in range(objects):
+        idx = np.flatnonzero(owner == k)
+        pred[0, 0:2, idx] = centers[k] + rng.normal(0, 3, (len(idx), 2))
+        pred[0, 2:4, idx] = sizes[k] * rng.uniform(0.9, 1.1, (len(idx), 2))
+        pred[0, 4 + labels[k], idx] = rng.uniform(0.3, 0.95, len(idx))
+    return pred
+
+def yolov8_torch(pred, res, shape, conf_thre, iou_thre):
+    import torch
+    from ultralytics.utils import ops
+    det = ops.non_max_suppression(torch.from_numpy(pred), conf_thre, iou_thre, nc=pred.shape[1]-4, max_det=300)[0]
+    det[:, :4] = ops.scale_boxes((res, res), det[:, :4], shape).round()
+    return det.numpy()
+
+def yolov8(res=640, shape=(1080, 1920)):
+    pred = yolov8_output(res)
+    ratio = min(res / shape[0], res / shape[1])
+    offset = ((res - round(shape[1] * ratio)) // 2, (res - round(shape[0] * ratio)) // 2)
+    conf_thre, iou_thre = 0.25, 0.7
+
+    print(f'yolov8 postprocess, output {pred.shape}, {int((pred[0, 4:].max(0) >= conf_thre).sum())} candidates')
+    det = postprocess_yolov8(pred[0], ratio, offset, shape, conf_thre, iou_thre)
+    ms = timeit(lambda: postprocess_yolov8(pred[0], ratio, offset, shape, conf_thre, iou_thre))
+    print(f'  numpy   {ms:8.2f} ms  {len(det)} detections')
+
+    try:
+        ref = yolov8_torch(pred, res, shape, conf_thre, iou_thre)
+    except ModuleNotFoundError as ex:
+        print(f'  torch   skipped - {ex}')
+        return
+    ms = timeit(lambda: yolov8_torch(pred, res, shape, conf_thre, iou_thre))
+    print(f'  torch   {ms:8.2f} ms  {len(ref)} detections')
+    if len(ref) == len(det):
+        print(f'  largest box difference {np.abs(ref[:, :4] - det[:, :4]).max():.1f} px')
+
+def yolox_outputs(res=640, classes=80, objects=20, seed=0):
+    # raw NHWC outputs of each stride as produced by the RyzenAI model, every anchor
+    # near an object predicts a jittered copy of its box, so thousands of candidates
+    # pass the score threshold and collapse to a few detections
+    rng = np.random.default_rng(seed)
+    outputs = []
+    for stride in (8, 16, 32):
+        n = res // stride
+        out = rng.normal(-6, 1, (1, n, n, 5 + classes)).astype(np.float32)
+        out[..., :2] = rng.uniform(0, 1, (1, n, n, 2))
+        out[..., 2:4] = np.log(rng.uniform(0.5, 4, (1, n, n, 2)))
+        outputs.append(out)
+
+    for k in range(objects):
+        label = rng.integers(0, classes)
+        cx, cy = rng.uniform(0.1, 0.9, 2) * res
+        w, h = rng.uniform(0.05, 0.3, 2) * res
+        for out, stride in zip(outputs, (8, 16, 32)):
+            n = out.shape[1]
+            x, y = int(cx / stride), int(cy / stride)
+            r = max(1, n // 10)
+            y0, x0 = max(0, y-r), max(0, x-r)
+            cell = out[0, y0:y+r, x0:x+r]
+            gy, gx = np.mgrid[y0:y0+cell.shape[0], x0:x0+cell.shape[1]]
+            cell[..., 0] = cx / stride - gx + rng.normal(0, 0.2, gx.shape)
+            cell[..., 1] = cy / stride - gy + rng.normal(0, 0.2, gy.shape)
+            cell[..., 2] = np.log(w / stride) + rng.normal(0, 0.05, gx.shape)
+            cell[..., 3] = np.log(h / stride) + rng.normal(0, 0.05, gy.shape)
+            cell[..., 4] = rng.uniform(1, 4, cell.shape[:2])
+            cell[..., 5 + label] = rng.uniform(1, 4, cell.shape[:2])
+    return outputs
+
+def yolox_legacy(outputs, size, conf_thre, nms_thre):
+    # the per-frame decoding previously done by the RyzenAI worker
+    outputs = [np.transpose(out, (0, 3, 1, 2)) for out in outputs]
+    outputs = [out.reshape(*out.shape[:2], -1).transpose(0, 2, 1) for out in outputs]
+    outputs = np.concatenate(outputs, axis=1)
+    outputs[..., 4:] = 1.0 / (1.0 + np.exp(-outputs[..., 4:]))
+    grids, expanded_strides = [], []
+    for stride in (8, 16, 32):
+        xv, yv = np.meshgrid(np.arange(size[1] // stride), np.arange(size[0] // stride))
+        grid = np.stack((xv, yv), 2).reshape(1, -1, 2)
+        grids.append(grid)
+        expanded_strides.append(np.full((*grid.shape[:2], 1), stride))
+    grids = np.concatenate(grids, 1)
+    expanded_strides = np.concatenate(expanded_strides, 1)
+    outputs[..., :2] = (outputs[..., :2] + grids) * expanded_strides
+    outputs[..., 2:4] = np.exp(outputs[..., 2:4]) * expanded_strides
+    pred = outputs[0]
+
+    boxes = np.empty_like(pred[:, :4])
+    boxes[:, :2] = pred[:, :2] - pred[:, 2:4] / 2
+    boxes[:, 2:] = pred[:, :2] + pred[:, 2:4] / 2
+    scores = pred[:, 4:5] * pred[:, 5:]
+    cls = scores.argmax(1)
+    best = scores[np.arange(len(cls)), cls]
+    mask = best > conf_thre
+    boxes, best, cls = boxes[mask], best[mask], cls[mask]
+
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1 + 1) * (y2 - y1 + 1)
+    order = best.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+        w = np.maximum(0.0, xx2 - xx1 + 1)
+        h = np.maximum(0.0, yy2 - yy1 + 1)
+        inter = w * h
+        ovr = inter / (areas[i] + areas[order[1:]] - inter)
+        order = order[np.where(ovr <= nms_thre)[0] + 1]
+    return boxes[keep], mask.sum()
+
+def yolox_numpy(outputs, size, conf_thre, nms_thre):
+    pred = np.concatenate([out.reshape(-1, out.shape[-1]) for out in outputs])
+    boxes, scores, cls = decode_yolox(pred, size, conf_thre)
+    return boxes[nms(boxes, scores, nms_thre)]
+
+def yolox(res=640):
+    outputs = yolox_outputs(res)
+    size, conf_thre, nms_thre = (res, res), 0.3, 0.45
+
+    ref, candidates = yolox_legacy([out.copy() for out in outputs], size, conf_thre, nms_thre)
+    print(f'yolox postprocess (RyzenAI), {sum(out.shape[1] * out.shape[2] for out in outputs)} anchors, {candidates} candidates')
+    ms = timeit(lambda: yolox_legacy([out.copy() for out in outputs], size, conf_thre, nms_thre), 10)
+    print(f'  legacy  {ms:8.2f} ms  {len(ref)} detections')
+    det = yolox_numpy(outputs, size, conf_thre, nms_thre)
+    ms = timeit(lambda: yolox_numpy(outputs, size, conf_thre, nms_thre))
+    print(f'  numpy   {ms:8.2f} ms  {len(det)} detections')
+
+def nms_legacy(boxes, scores, iou_thre, classes):
+    # the python loop previously used by nms, one row of iou per kept box
+    boxes = boxes + (classes * 7680)[:, None].astype(boxes.dtype)
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.maximum(0.0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        h = np.maximum(0.0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = w * h
+        order = rest[inter / (areas[i] + areas[rest] - inter + 1e-9) <= iou_thre]
+    return np.array(keep, dtype=np.int64)
+
+def nms_dense(counts=(300, 1000, 3000), seed=0):
+    # crowded scenes where many boxes survive the score screen
+    rng = np.random.default_rng(seed)
+    print('nms, crowded scene')
+    for count in counts:
+        xy = rng.uniform(0, 600, (count, 2))
+        boxes = np.hstack((xy, xy + rng.uniform(20, 60, (count, 2)))).astype(np.float32)
+        scores = rng.uniform(0.3, 1.0, count).astype(np.float32)
+        classes = rng.integers(0, 3, count)
+        ref = nms_legacy(boxes, scores, 0.45, classes)
+        keep = nms(boxes, scores, 0.45, classes, max_det=count)
+        legacy = timeit(lambda: nms_legacy(boxes, scores, 0.45, classes), 5)
+        ms = timeit(lambda: nms(boxes, scores, 0.45, classes, max_det=count), 5)
+        print(f'  {count:5d} boxes  loop {legacy:8.2f} ms  opencv {ms:8.2f} ms  {len(keep)} kept, same as loop: {np.array_equal(ref, keep)}')
+
+def motion_frames(shape=(1440, 2560), count=8, seed=0):
+    # a textured scene with a block moving across it
+    rng = np.random.default_rng(seed)
+    scene = cv2.GaussianBlur(rng.integers(0, 255, shape + (3,), dtype=np.uint8), (0, 0), 3)
+    frames = []
+    for i in range(count):
+        frame = scene.copy()
+        x = 200 + i * 40
+        frame[600:800, x:x+120] = 30
+        frames.append(frame)
+    return frames
+
+def motion_legacy(frames):
+    # the per-frame work of the frame difference engine in motion.py
+    kernel = np.array((9, 9), dtype=np.uint8)
+    last = None
+    for frame in frames:
+        img = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        if last is not None:
+            diff = cv2.subtract(img, last)
+            diff = cv2.medianBlur(diff, 3)
+            diff = cv2.adaptiveThreshold(diff, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 3)
+            diff = cv2.medianBlur(diff, 3)
+            diff = cv2.morphologyEx(diff, cv2.MORPH_CLOSE, kernel, iterations=1)
+            diff.sum()
+        last = img
+
+def motion_background(frames, model):
+    for frame in frames:
+        cv2.countNonZero(model.apply(frame))
+
+def motion(shape=(1440, 2560)):
+    frames = motion_frames(shape)
+    print(f'motion engine, {shape[1]}x{shape[0]} frames')
+    ms = timeit(lambda: motion_legacy(frames), 5) / len(frames)
+    print(f'  frame difference  {ms:8.2f} ms per frame')
+    model = BackgroundModel()
+    ms = timeit(lambda: motion_background(frames, model), 5) / len(frames)
+    print(f'  background model  {ms:8.2f} ms per frame')
+
+def audio_legacy(samples, high_pass, low_pass, coverage):
+    spectrum = np.fft.fft(samples)
+    level = 0
+    for s in samples:
+        level += s * s
+    level = math.sqrt(level / samples.size)
+
+    frequencies = np.abs(spectrum[:int(len(spectrum) / 2)])
+    high, low = high_pass * frequencies.size, low_pass * frequencies.size
+    sph = 0
+    for i, f in enumerate(frequencies):
+        if high < low:
+            if i > high and i < low:
+                sph += f
+        else:
+            if i > high or i < low:
+                sph += f
+    return level, sph / (frequencies.size * coverage)
+
+def audio_numpy(samples, high_pass, low_pass, coverage):
+    return rms(samples), band_level(magnitudes(samples), high_pass, low_pass, coverage)
+
+def audio(sizes=(960, 1024, 2048), band=(0.1, 0.6, 0.5)):
+    # AAC decoders deliver 1024 samples per channel, 960 and 2048 are also common
+    rng = np.random.default_rng(0)
+    print(f'audio levels, band {band[0]} - {band[1]}')
+    for size in sizes:
+        samples = rng.uniform(-0.5, 0.5, size).astype(np.float32)
+        # longer blocks are averaged over segments, so only the shorter ones match the single fft
+        if size <= SEGMENT_SIZE:
+            assert np.allclose(audio_legacy(samples, *band), audio_numpy(samples, *band), rtol=1e-4)
+        legacy = timeit(lambda: audio_legacy(samples, *band), 20)
+        ms = timeit(lambda: audio_numpy(samples, *band), 200)
+        print(f'  {size:5d} samples  loop {legacy:7.3f} ms  numpy {ms:7.3f} ms')
+
+    # one second of 48 kHz audio in 1024 sample frames, analyzed per frame and in windows
+    frames = rng.uniform(-0.5, 0.5, (47, 1024)).astype(np.float32)
+    ms = timeit(lambda: [audio_numpy(frame, *band) for frame in frames], 20)
+    print(f'  per frame          {ms:7.3f} ms per second of audio, {len(frames)} decisions')
+    for size, hop in ((1024, 512), (2048, 1024), (4096, 2048), (4096, 1024), (8192, 4096)):
+        def windowed():
+            window, count = AudioWindow(size, hop), 0
+            for frame in frames:
+                window.push(frame)
+                for block in window:
+                    rms(block)
+                    band_level(magnitudes(block, window.weights), *band)
+                    count += 1
+            return count
+        ms = timeit(windowed, 20)
+        print(f'  window {size}/{hop:4d}  {ms:7.3f} ms per second of audio, {windowed()} decisions')
+
+def audio_calibration(band=(0.1, 0.6, 0.5), rate=48000, seconds=4, seed=0):
+    # frequency level of the same signals as read by the old analysis of single 1024 sample
+    # frames and by windows of each size and function, the alarm limits are fixed so the
+    # level of a signal has to stay put
+    rng = np.random.default_rng(seed)
+    t = np.arange(rate * seconds) / rate
+    signals = {
+        "white noise": rng.normal(0, 0.1, t.size),
+        "5 kHz tone": 0.1 * np.sin(2 * np.pi * 5000 * t),
+        "tone + noise": 0.1 * np.sin(2 * np.pi * 5000 * t) + rng.normal(0, 0.05, t.size)
+    }
+    print(f'audio frequency level, band {band[0]} - {band[1]}')
+    for name, signal in signals.items():
+        signal = signal.astype(np.float32)
+        frames = signal[:signal.size // 1024 * 1024].reshape(-1, 1024)
+        text = f'  {name:13s}  frames {np.mean([audio_legacy(frame, *band)[1] for frame in frames[:40]]):.3f}'
+        for function in WINDOW_FUNCTIONS:
+            for size in (1024, 4096, 8192):
+                window, levels = AudioWindow(size, size // 2, function), []
+                window.push(signal)
+                for block in window:
+                    levels.append(band_level(magnitudes(block, window.weights), *band))
+                text += f'  {function[:4]} {size} {np.mean(levels):.3f}'
+        print(text)
+
+if __name__ == "__main__":
+    yolov8()
+    yolox()
+    nms_dense()
+    motion()
+    audio()
+    audio_calibration()
@@ -0,0 +1,99 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/detectioncache.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import time
+import threading
+import numpy as np
+import cv2
+
+class DetectionCache():
+    # Hands back the last detections of a stream while its picture has not
+    # changed.  Each frame is reduced to a small gray signature, every cell of
+    # which is the average of a block of pixels, so sensor noise cancels out
+    # while anything moving changes at least one cell.  The signature is
+    # compared with the one of the frame the stored detections were made on,
+    # so slow drift adds up until the detector is run again, and a result is
+    # never reused for longer than max_age seconds.  A frame that misses is
+    # sent to the detector along with its signature, which is handed back to
+    # store with the detections, so results finishing out of order are still
+    # kept with the frame they belong to.
+    #
+    #   size      - width and height of the signature
+    #   threshold - gray level change of a cell that counts as a change
+
+    def __init__(self, max_age=5.0, threshold=12, size=48):
+        self.max_age = max_age
+        self.threshold = threshold
+        self.size = size
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.mutex = threading.Lock()
+
+    def signature(self, img):
+        # point sampling down to a few samples per cell first keeps the cost
+        # independent of the stream resolution
+        h, w = img.shape[:2]
+        step = self.size * 8
+        if h > step and w > step:
+            img = cv2.resize(img, (step, step), interpolation=cv2.INTER_NEAREST)
+        small = cv2.resize(img, (self.size, self.size), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+        return small.astype(np.int16)
+
+    def lookup(self, key, img):
+        # returns the reusable boxes or None, in which case the frame should go to
+        # the detector, and the signature of the frame
+        sig = self.signature(img)
+        now = time.monotonic()
+        with self.mutex:
+            entry = self.entries.get(key)
+            if entry and now - entry["time"] < self.max_age:
+                if not (np.abs(sig - entry["sig"]) > self.threshold).any():
+                    self.hits += 1
+                    return entry["boxes"], sig
+
+            self.misses += 1
+            return None, sig
+
+    def store(self, key, sig, boxes):
+        # sig is the signature lookup returned for the frame the boxes were found on,
+        # frames that did not go through lookup have none and are not kept
+        if sig is None:
+            return
+        with self.mutex:
+            self.entries[key] = {"sig": sig, "boxes": boxes, "time": time.monotonic()}
+
+    def discard(self, key):
+        with self.mutex:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.mutex:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def reuse_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self):
+        return f'Reused {self.reuse_ratio() * 100:.0f}% of detections'
@@ -0,0 +1,87 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/mailbox.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import time
+
+class FrameMailbox():
+    # Single slot holding the newest frame from a player that is waiting to
+    # be analyzed.  A frame put into an occupied slot replaces the one there,
+    # so the analyzer always works on the latest picture and never falls
+    # behind the camera.  Frames arriving sooner than min_interval after the
+    # last accepted frame are turned away.  The mailbox owns the reference
+    # to each FrameBuffer put into it and releases frames it turns away or
+    # replaces, the one handed out by take belongs to the taker.  The caller
+    # is responsible for locking.
+
+    def __init__(self, player):
+        self.player = player
+        self.frame = None
+        self.busy = False
+        self.offered = 0
+        self.analyzed = 0
+        self.dropped = 0
+        self.min_interval = 0.0
+        self.last_accept = 0.0
+
+    def put(self, F):
+        # returns True if the frame went into an empty slot
+        self.offered += 1
+        now = time.monotonic()
+        if now - self.last_accept < self.min_interval:
+            self.dropped += 1
+            F.release()
+            return False
+        self.last_accept = now
+
+        empty = self.frame is None
+        if not empty:
+            self.dropped += 1
+            self.frame.release()
+        self.frame = F
+        return empty
+
+    def take(self):
+        F = self.frame
+        self.frame = None
+        self.busy = True
+        return F
+
+    def release(self):
+        self.busy = False
+        self.analyzed += 1
+
+    def clear(self):
+        if self.frame is not None:
+            self.dropped += 1
+            self.frame.release()
+        self.frame = None
+
+    def waiting(self):
+        return self.frame is not None
+
+    def reset(self):
+        self.offered = 0
+        self.analyzed = 0
+        self.dropped = 0
+
+    def __str__(self):
+        result = f'Analyzed {self.analyzed} of {self.offered} frames, {self.dropped} dropped'
+        if self.min_interval:
+            result += f', limited to {1.0 / self.min_interval:.1f} fps'
+        return result
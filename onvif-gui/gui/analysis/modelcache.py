@@ -0,0 +1,61 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/modelcache.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+class ModelCache():
+    # Keeps the most recently used compiled models in memory, so a worker
+    # re-initialized with a configuration it has already seen picks the
+    # model up again instead of reloading and recompiling it.  Keys are
+    # tuples describing the configuration (module, model, resolution, api,
+    # device, ...).  compile_dir gives each module a directory for the
+    # on-disk caches kept by the inference runtimes, which carry compiled
+    # models across restarts of the application.
+
+    def __init__(self, size=4):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def compile_dir(self, name):
+        path = Path.home() / ".cache" / "onvif-gui" / "compiled" / name
+        path.mkdir(parents=True, exist_ok=True)
+        return str(path)
+
+model_cache = ModelCache()
@@ -0,0 +1,105 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/motiongate.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import time
+import threading
+import numpy as np
+import cv2
+
+class MotionGate():
+    # First stage of the detector cascade.  Every frame is checked for motion
+    # on a small blurred gray copy, and only frames of streams that have moved
+    # within the last hold seconds are passed on to the detector.  The state of
+    # each stream is kept under its own key so streams can be checked from
+    # any thread.
+    #
+    #   width       - width of the gray copy, the height keeps the aspect ratio
+    #   sensitivity - 0 to 100, sets the fraction of the picture that has to
+    #                 change, from 3% at 0 down to 0.003% at 100
+    #   level       - gray level change of a pixel that counts as motion
+
+    def __init__(self, sensitivity=50, hold=2.0, width=160, level=24):
+        self.sensitivity = sensitivity
+        self.hold = hold
+        self.width = width
+        self.level = level
+        self.streams = {}
+        self.passed = 0
+        self.blocked = 0
+        self.mutex = threading.Lock()
+
+    def min_area(self):
+        return 10 ** -(1.5 + 3 * self.sensitivity / 100)
+
+    def gray(self, img):
+        h, w = img.shape[:2]
+        size = (self.width, max(1, round(h * self.width / w)))
+        if w > self.width * 4:
+            img = cv2.resize(img, (self.width * 4, size[1] * 4), interpolation=cv2.INTER_NEAREST)
+        small = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def motion(self, key, img):
+        # fraction of the picture that changed since the last frame of the stream
+        gray = self.gray(img)
+        with self.mutex:
+            last = self.streams.get(key)
+            self.streams[key] = {"gray": gray, "time": last["time"] if last else 0.0}
+        if last is None or last["gray"].shape != gray.shape:
+            return 1.0
+        diff = cv2.absdiff(gray, last["gray"])
+        return np.count_nonzero(diff > self.level) / diff.size
+
+    def __call__(self, key, img):
+        # returns True if the frame should go on to the detector
+        now = time.monotonic()
+        moving = self.motion(key, img) >= self.min_area()
+        with self.mutex:
+            stream = self.streams[key]
+            if moving:
+                stream["time"] = now
+            active = now - stream["time"] <= self.hold
+            if active:
+                self.passed += 1
+            else:
+                self.blocked += 1
+        return active
+
+    def check(self, selector, player, img):
+        # First stage of the cascade, returns True if the frame of the player should
+        # go on to the detector.  Takes the settings of a GateSelector, every frame
+        # passes while the gate is switched off.
+        if not selector.isChecked():
+            return True
+        self.sensitivity = selector.sensitivity()
+        self.hold = selector.hold()
+        return self(player.uri, img)
+
+    def discard(self, key):
+        with self.mutex:
+            self.streams.pop(key, None)
+
+    def pass_ratio(self):
+        total = self.passed + self.blocked
+        return self.passed / total if total else 1.0
+
+    def __str__(self):
+        return f'Motion passed {self.pass_ratio() * 100:.0f}% of frames'
@@ -0,0 +1,131 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/pool.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import os
+import time
+import threading
+from collections import deque
+from loguru import logger
+from .throttle import RateController
+
+class AnalysisPool():
+    # Runs the loaded VideoWorker on a set of threads so the render callback
+    # only has to drop the frame into the player's mailbox and return.  A
+    # player never has more than one frame in flight, a frame arriving while
+    # the previous one is being analyzed waits in the mailbox and is replaced
+    # by anything newer.  Workers that do not declare thread_safe are run one
+    # at a time.  The controller limits how often each mailbox accepts a
+    # frame to keep the analysis load under its target.
+
+    def __init__(self, mw, size=None):
+        self.mw = mw
+        self.size = size if size else max(1, os.cpu_count() or 1)
+        self.ready = deque()
+        self.mailboxes = set()
+        self.controller = RateController()
+        self.cond = threading.Condition()
+        self.worker_lock = threading.Lock()
+        self.running = True
+
+        self.threads = []
+        for i in range(self.size):
+            thread = threading.Thread(target=self.run, name=f'analysis-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, frame, player):
+        # the pool takes its own reference to the FrameBuffer
+        with self.cond:
+            if not self.running:
+                return
+            mailbox = player.mailbox
+            self.mailboxes.add(mailbox)
+            if mailbox.put(frame.acquire()) and not mailbox.busy:
+                self.ready.append(mailbox)
+                self.cond.notify()
+
+    def discard(self, player):
+        with self.cond:
+            player.mailbox.clear()
+            self.mailboxes.discard(player.mailbox)
+            if player.mailbox in self.ready:
+                self.ready.remove(player.mailbox)
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            for mailbox in self.ready:
+                mailbox.clear()
+            self.ready.clear()
+            self.cond.notify_all()
+
+    def take(self):
+        with self.cond:
+            while self.running and not len(self.ready):
+                self.cond.wait()
+            if not self.running:
+                return None
+            mailbox = self.ready.popleft()
+            return mailbox, mailbox.take()
+
+    def done(self, mailbox):
+        with self.cond:
+            mailbox.release()
+            if mailbox.waiting():
+                self.ready.append(mailbox)
+                self.cond.notify()
+            self.controller.update(self.mailboxes, self.concurrency())
+
+    def concurrency(self):
+        return self.size if getattr(self.mw.videoWorker, "thread_safe", False) else 1
+
+    def run(self):
+        while item := self.take():
+            mailbox, frame = item
+            try:
+                self.analyze(frame, mailbox.player)
+            except Exception as ex:
+                logger.exception(f'video analysis error: {ex}')
+            finally:
+                frame.release()
+            self.done(mailbox)
+
+    def analyze(self, F, player):
+        start = time.monotonic()
+        if getattr(self.mw.videoWorker, "thread_safe", False):
+            result = self.mw.pyVideoCallback(F, player)
+        else:
+            with self.worker_lock:
+                result = self.mw.pyVideoCallback(F, player)
+        self.controller.record(time.monotonic() - start)
+
+        # the worker may hand back a picture to be displayed in place of the original, it
+        # is copied into a pooled buffer as the worker is free to overwrite it next call
+        if result is not None:
+            result = self.mw.framePool.copy(result)
+        with player.thread_lock:
+            # a player shutting down may have given back its frames already, nothing
+            # would release a picture stored now, so it goes straight back to the pool
+            if player.frames_released or not player.running:
+                previous = result
+            else:
+                previous = player.analysis_frame
+                player.analysis_frame = result
+        if previous is not None:
+            previous.release()
@@ -0,0 +1,123 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/postprocess.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import numpy as np
+import cv2
+
+# anchor grids are the same for every frame of a given input size, so they are built once
+_yolox_grids = {}
+
+def decode_yolov8(pred, conf_thre):
+    # pred is a single (4 + classes, anchors) output as exported by ultralytics,
+    # returns xyxy boxes, scores and class ids of the anchors above the threshold
+    scores = pred[4:]
+    conf = scores.max(axis=0)
+    keep = np.flatnonzero(conf >= conf_thre)
+    if not len(keep):
+        return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+    cls = scores[:, keep].argmax(axis=0)
+    cx, cy, w, h = pred[:4, keep]
+    boxes = np.empty((len(keep), 4), dtype=np.float32)
+    boxes[:, 0] = cx - w / 2
+    boxes[:, 1] = cy - h / 2
+    boxes[:, 2] = cx + w / 2
+    boxes[:, 3] = cy + h / 2
+    return boxes, conf[keep], cls
+
+def nms(boxes, scores, iou_thre, classes=None, max_det=300):
+    # greedy nms on xyxy boxes run by opencv, returns the indices kept in descending
+    # score order, when classes are given boxes only suppress others of the same class
+    if not len(boxes):
+        return np.empty(0, dtype=np.int64)
+
+    # opencv takes x, y, w, h as doubles, other types go through a much slower conversion,
+    # the boxes are already screened so only zero scores are turned away
+    xywh = np.empty((len(boxes), 4), dtype=np.float64)
+    xywh[:, :2] = boxes[:, :2]
+    xywh[:, 2:] = boxes[:, 2:4] - boxes[:, :2]
+    scores = np.ascontiguousarray(scores, dtype=np.float32)
+    if classes is None:
+        keep = cv2.dnn.NMSBoxes(xywh, scores, 0.0, iou_thre)
+    else:
+        keep = cv2.dnn.NMSBoxesBatched(xywh, scores, np.ascontiguousarray(classes, dtype=np.int32), 0.0, iou_thre)
+    return np.asarray(keep, dtype=np.int64).reshape(-1)[:max_det]
+
+def yolox_grids(size, strides=(8, 16, 32)):
+    key = (tuple(size), tuple(strides))
+    if (grids := _yolox_grids.get(key)) is None:
+        cells, expanded = [], []
+        for stride in strides:
+            h, w = size[0] // stride, size[1] // stride
+            xv, yv = np.meshgrid(np.arange(w), np.arange(h))
+            cells.append(np.stack((xv, yv), 2).reshape(-1, 2))
+            expanded.append(np.full((h * w, 1), stride))
+        grids = (np.concatenate(cells).astype(np.float32), np.concatenate(expanded).astype(np.float32))
+        _yolox_grids[key] = grids
+    return grids
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+def decode_yolox(pred, size, conf_thre, strides=(8, 16, 32), logits=True):
+    # pred is a single (anchors, 5 + classes) output in grid order, returns xyxy boxes
+    # in model input coordinates, scores and class ids of the anchors above the threshold.
+    # The score can not exceed the objectness, so anchors are screened on objectness
+    # alone before the class scores are looked at.  With logits the sigmoid is monotonic,
+    # the screen is done on the raw values and only the survivors are activated.
+    grids, expanded = yolox_grids(size, strides)
+    if logits:
+        p = min(max(conf_thre, 1e-6), 1 - 1e-6)
+        keep = np.flatnonzero(pred[:, 4] > np.log(p / (1 - p)))
+    else:
+        keep = np.flatnonzero(pred[:, 4] > conf_thre)
+
+    cand = pred[keep]
+    cls = cand[:, 5:].argmax(axis=1)
+    obj, best = cand[:, 4], cand[np.arange(len(cls)), cls + 5]
+    if logits:
+        scores = sigmoid(obj) * sigmoid(best)
+    else:
+        scores = obj * best
+    passed = scores > conf_thre
+    keep, cand, scores, cls = keep[passed], cand[passed], scores[passed], cls[passed]
+
+    xy = (cand[:, :2] + grids[keep]) * expanded[keep]
+    wh = np.exp(cand[:, 2:4]) * expanded[keep]
+    boxes = np.concatenate((xy - wh / 2, xy + wh / 2), axis=1).astype(np.float32)
+    return boxes, scores, cls
+
+def scale_boxes(boxes, ratio, offset, shape):
+    # maps xyxy boxes from the letterboxed model input back onto the original image
+    left, top = offset
+    x, y = boxes[:, 0::2], boxes[:, 1::2]
+    x -= left
+    y -= top
+    boxes /= ratio
+    h, w = shape[:2]
+    np.clip(x, 0, w, out=x)
+    np.clip(y, 0, h, out=y)
+    return boxes
+
+def postprocess_yolov8(pred, ratio, offset, shape, conf_thre=0.25, iou_thre=0.7, max_det=300):
+    # returns detections as rows of x1, y1, x2, y2, score, class in image coordinates
+    boxes, scores, cls = decode_yolov8(pred, conf_thre)
+    keep = nms(boxes, scores, iou_thre, cls, max_det)
+    boxes = scale_boxes(boxes[keep], ratio, offset, shape).round()
+    return np.column_stack((boxes, scores[keep], cls[keep])).astype(np.float32)
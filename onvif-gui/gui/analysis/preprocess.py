@@ -0,0 +1,105 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/preprocess.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import numpy as np
+import cv2
+
+class Letterbox():
+    # Fits frames into the model input without distorting the aspect ratio.
+    # Each frame is resized straight into its place on a reused uint8 canvas,
+    # the border is only repainted when the placement of the picture changes,
+    # and the canvas is converted to the float input tensor in one pass that
+    # does the transposition and scaling together.  Buffers grow to the
+    # largest batch seen and are then reused, so the tensor returned is a
+    # view that is overwritten by the next call.
+    #
+    #   center         - pad evenly on both sides (yolov8) or only on the
+    #                    bottom and right (yolox)
+    #   scaleup        - allow frames smaller than the input to be enlarged
+    #   scale          - multiplier applied to pixel values
+    #   channels_first - NCHW output, otherwise NHWC
+
+    def __init__(self, size, batch_size=1, center=True, scaleup=True, scale=1.0/255.0, 
+                 channels_first=True, color=114, dtype=np.float32):
+        self.size = (size, size) if isinstance(size, int) else tuple(size)
+        self.center = center
+        self.scaleup = scaleup
+        self.scale = dtype(scale)
+        self.channels_first = channels_first
+        self.color = color
+        self.dtype = dtype
+        self.allocate(batch_size)
+
+    def allocate(self, batch_size):
+        h, w = self.size
+        self.batch_size = batch_size
+        self.canvas = np.full((batch_size, h, w, 3), self.color, dtype=np.uint8)
+        if self.channels_first:
+            self.tensor = np.empty((batch_size, 3, h, w), dtype=self.dtype)
+        else:
+            self.tensor = np.empty((batch_size, h, w, 3), dtype=self.dtype)
+        self.placement = [None] * batch_size
+
+    def fit(self, shape):
+        h, w = shape[:2]
+        ratio = min(self.size[0] / h, self.size[1] / w)
+        if not self.scaleup:
+            ratio = min(ratio, 1.0)
+        nh, nw = int(round(h * ratio)), int(round(w * ratio))
+        top, left = 0, 0
+        if self.center:
+            top, left = (self.size[0] - nh) // 2, (self.size[1] - nw) // 2
+        return ratio, nh, nw, top, left
+
+    def __call__(self, images):
+        # returns the input tensor with the scale ratio and (left, top) offset of each picture
+        if isinstance(images, np.ndarray):
+            images = [images]
+        n = len(images)
+        if n > self.batch_size:
+            self.allocate(n)
+
+        ratios = []
+        offsets = []
+        for i, img in enumerate(images):
+            ratio, nh, nw, top, left = self.fit(img.shape)
+            placement = (nh, nw, top, left)
+            if self.placement[i] != placement:
+                self.canvas[i].fill(self.color)
+                self.placement[i] = placement
+
+            dst = self.canvas[i, top:top+nh, left:left+nw]
+            if img.shape[:2] == (nh, nw):
+                dst[...] = img
+            else:
+                cv2.resize(img, (nw, nh), dst=dst, interpolation=cv2.INTER_LINEAR)
+
+            ratios.append(ratio)
+            offsets.append((left, top))
+
+        canvas = self.canvas[:n]
+        tensor = self.tensor[:n]
+        if self.channels_first:
+            canvas = canvas.transpose(0, 3, 1, 2)
+        if self.scale == 1:
+            np.copyto(tensor, canvas, casting="unsafe")
+        else:
+            np.multiply(canvas, self.scale, out=tensor, casting="unsafe")
+
+        return tensor, ratios, offsets
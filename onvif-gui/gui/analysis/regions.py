@@ -0,0 +1,101 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/regions.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import math
+import threading
+import numpy as np
+from .postprocess import nms
+
+# Regions of interest are rectangles in fractions of the frame size, so they
+# survive changes of stream resolution.  They are kept in the settings as
+# "x,y,w,h" strings separated by ":", the same way targets are stored.
+
+def parse_regions(text):
+    regions = []
+    for item in str(text).split(":"):
+        try:
+            x, y, w, h = [min(max(float(v), 0.0), 1.0) for v in item.split(",")]
+            if w > 0 and h > 0:
+                regions.append((x, y, min(w, 1.0 - x), min(h, 1.0 - y)))
+        except ValueError:
+            pass
+    return regions
+
+def format_regions(regions):
+    return ":".join([",".join([f'{v:.4f}' for v in region]) for region in regions])
+
+def tile_spans(length, tile, overlap):
+    # start positions covering length with pieces no longer than tile
+    if length <= tile:
+        return [0]
+    step = tile - int(tile * overlap)
+    count = math.ceil((length - tile) / step) + 1
+    step = (length - tile) / (count - 1)
+    return [round(i * step) for i in range(count)]
+
+def region_crops(img, regions, tile=0, overlap=0.1):
+    # returns (view, (left, top)) for each piece of the frame the detector should see,
+    # regions larger than tile pixels are cut into overlapping tiles so small objects
+    # keep their size in the model input
+    h, w = img.shape[:2]
+    if not regions:
+        regions = [(0.0, 0.0, 1.0, 1.0)]
+
+    crops = []
+    for x, y, rw, rh in regions:
+        x0, y0 = int(x * w), int(y * h)
+        x1, y1 = max(x0 + 1, int(round((x + rw) * w))), max(y0 + 1, int(round((y + rh) * h)))
+        if not tile:
+            crops.append((img[y0:y1, x0:x1], (x0, y0)))
+            continue
+        for top in tile_spans(y1 - y0, tile, overlap):
+            for left in tile_spans(x1 - x0, tile, overlap):
+                t, l = y0 + top, x0 + left
+                crops.append((img[t:min(t + tile, y1), l:min(l + tile, x1)], (l, t)))
+    return crops
+
+class RegionResult():
+    # Collects the detections of the crops of one frame, which may finish on
+    # different threads, and merges them into full frame coordinates once the
+    # last one is in.  Objects cut by a tile border are found in both tiles,
+    # the duplicates are removed by running nms over the merged boxes.
+
+    def __init__(self, player, img, count, seq=0, iou_thre=0.5):
+        self.player = player
+        self.img = img
+        self.seq = seq
+        self.count = count
+        self.iou_thre = iou_thre
+        self.parts = []
+        self.lock = threading.Lock()
+
+    def add(self, detections, origin):
+        # detections are rows of x1, y1, x2, y2, score, class relative to the crop,
+        # returns the merged detections after the last crop and None before that
+        detections = np.array(detections, dtype=np.float32).reshape(-1, 6)
+        detections[:, 0:4] += np.array(origin * 2, dtype=np.float32)
+        with self.lock:
+            self.parts.append(detections)
+            if len(self.parts) < self.count:
+                return None
+
+        merged = np.concatenate(self.parts)
+        if self.count > 1 and len(merged):
+            merged = merged[nms(merged[:, :4], merged[:, 4], self.iou_thre, merged[:, 5].astype(np.int64))]
+        return merged
@@ -0,0 +1,44 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/sequencer.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import threading
+
+class ResultSequencer():
+    # Numbers the frames each camera sends for inference.  With several
+    # requests in flight the results can finish out of order, accept only
+    # lets a result through if nothing newer from the same camera has been
+    # published already, so the boxes shown never step back in time.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.issued = {}
+        self.published = {}
+
+    def next(self, key):
+        with self.lock:
+            seq = self.issued.get(key, 0) + 1
+            self.issued[key] = seq
+            return seq
+
+    def accept(self, key, seq):
+        with self.lock:
+            if seq <= self.published.get(key, 0):
+                return False
+            self.published[key] = seq
+            return True
@@ -0,0 +1,128 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/spectrum.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+
+import math
+from functools import lru_cache
+import numpy as np
+from numpy.fft import rfft
+
+# Audio level measurements on one block of mono samples.  The frequency
+# band is given by the high and low pass settings as fractions of the
+# spectrum, a high pass above the low pass selects the two outer ends.
+
+# Spectra are taken over segments of the frame size the frequency levels and
+# alarm limits were set up with, a longer block is averaged over several of
+# them, so the level of a signal does not depend on the analysis window size.
+SEGMENT_SIZE = 1024
+
+def rms(samples):
+    if not samples.size:
+        return 0
+    return math.sqrt(np.dot(samples, samples) / samples.size)
+
+def magnitudes(samples, weights=None):
+    # Mean magnitude spectrum of the segments of the block, half a segment
+    # apart (Welch's method), the weights are those of one segment.  rfft
+    # returns size // 2 + 1 bins, the last one is dropped to keep the length
+    # the full fft spectrum had after slicing off the mirrored half.
+    size = min(SEGMENT_SIZE, samples.size)
+    segments = np.lib.stride_tricks.sliding_window_view(samples, size)[::max(1, size // 2)]
+    if weights is not None:
+        segments = segments * weights
+    return np.abs(rfft(segments)[:, :size // 2]).mean(axis=0)
+
+WINDOW_FUNCTIONS = {
+    "Rectangular": np.ones,
+    "Hann": np.hanning,
+    "Hamming": np.hamming,
+    "Blackman": np.blackman
+}
+
+@lru_cache(maxsize=16)
+def window_weights(function, size):
+    # Scaled to a mean square of one, so the window keeps the energy of the signal
+    # and noise reads the same level with any function.  A tapered window removes
+    # the leakage of tones into neighbouring bins, which the rectangular one adds
+    # to the band, so tones read lower with it.
+    weights = WINDOW_FUNCTIONS.get(function, np.hanning)(size)
+    weights = (weights / np.sqrt(np.mean(weights ** 2))).astype(np.float32)
+    weights.flags.writeable = False
+    return weights
+
+@lru_cache(maxsize=64)
+def band_mask(size, high_pass, low_pass):
+    # weights of one inside the band and zero outside, shared between callers
+    index = np.arange(size)
+    high, low = high_pass * size, low_pass * size
+    if high < low:
+        mask = (index > high) & (index < low)
+    else:
+        mask = (index > high) | (index < low)
+    mask = mask.astype(np.float32)
+    mask.flags.writeable = False
+    return mask
+
+def band_level(frequencies, high_pass, low_pass, coverage):
+    # mean magnitude in the band, scaled by the share of the spectrum it covers
+    if not frequencies.size:
+        return 0
+    mask = band_mask(frequencies.size, high_pass, low_pass)
+    return float(np.dot(frequencies, mask)) / (frequencies.size * coverage)
+
+class AudioWindow():
+    # Collects the samples of one stream across decoder frames and hands
+    # them out as windows of a fixed size, each one hop further along than
+    # the last.  Decisions then come at a steady rate of sample rate / hop
+    # whatever the frame size of the codec, and the spectrum averaged over
+    # a long window is far less noisy than that of a single frame.
+    #
+    #   size     - samples in a window
+    #   hop      - samples between the starts of consecutive windows
+    #   function - name of the window function applied to each fft segment
+
+    def __init__(self, size=4096, hop=2048, function="Rectangular"):
+        self.size = size
+        self.hop = min(max(1, hop), size)
+        self.function = function
+        self.weights = window_weights(function, min(size, SEGMENT_SIZE))
+        self.buffer = np.zeros(size * 2, dtype=np.float32)
+        self.count = 0
+
+    def matches(self, size, hop, function):
+        return self.size == size and self.hop == min(max(1, hop), size) and self.function == function
+
+    def push(self, samples):
+        end = self.count + samples.size
+        if end > self.buffer.size:
+            buffer = np.zeros(max(end, self.buffer.size * 2), dtype=np.float32)
+            buffer[:self.count] = self.buffer[:self.count]
+            self.buffer = buffer
+        self.buffer[self.count:end] = samples
+        self.count = end
+
+    def __iter__(self):
+        # the window is a view of the buffer, it is only valid until the next one
+        while self.count >= self.size:
+            yield self.buffer[:self.size]
+            self.count -= self.hop
+            self.buffer[:self.count] = self.buffer[self.hop:self.hop + self.count]
+
+    def reset(self):
+        self.count = 0
@@ -0,0 +1,110 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/throttle.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import os
+import time
+
+class RateController():
+    # Sets the minimum interval between analyzed frames for each mailbox so
+    # that the analysis load stays under target.  Load is the larger of the
+    # share of worker time spent inside the video worker and the process CPU
+    # use, each as a fraction of what is available.  The allowed frame rate
+    # is split between cameras in proportion to their weight, cameras in
+    # alarm weigh more so they keep a higher rate, and no camera is given
+    # more than it delivers.
+
+    def __init__(self, target=0.8, period=1.0, alarm_weight=4.0, min_rate=0.2):
+        self.target = target
+        self.period = period
+        self.alarm_weight = alarm_weight
+        self.min_rate = min_rate
+        self.cores = os.cpu_count() or 1
+
+        self.load = 0.0
+        self.total_rate = None
+        self.busy_time = 0.0
+        self.last_update = time.monotonic()
+        self.last_cpu = time.process_time()
+        self.last_counts = {}
+
+    def record(self, seconds):
+        self.busy_time += seconds
+
+    def weight(self, mailbox):
+        return self.alarm_weight if mailbox.player.alarm_state else 1.0
+
+    def update(self, mailboxes, concurrency):
+        now = time.monotonic()
+        elapsed = now - self.last_update
+        if elapsed < self.period:
+            return False
+
+        cpu = time.process_time()
+        busy = self.busy_time / (elapsed * max(1, concurrency))
+        cpu_load = (cpu - self.last_cpu) / (elapsed * self.cores)
+        self.load = max(busy, cpu_load)
+        self.busy_time = 0.0
+        self.last_update = now
+        self.last_cpu = cpu
+
+        demand = {}
+        analyzed = 0
+        for mailbox in mailboxes:
+            offered, count = self.last_counts.get(mailbox, (mailbox.offered, mailbox.analyzed))
+            demand[mailbox] = (mailbox.offered - offered) / elapsed
+            analyzed += mailbox.analyzed - count
+        self.last_counts = {mailbox: (mailbox.offered, mailbox.analyzed) for mailbox in mailboxes}
+        rate = analyzed / elapsed
+
+        if self.load > self.target:
+            self.total_rate = rate * self.target / self.load
+        elif self.total_rate is not None:
+            # there is headroom, let the rate climb back toward the target
+            self.total_rate *= min(1.5, self.target / max(self.load, 0.01))
+            if self.total_rate >= sum(demand.values()):
+                self.total_rate = None
+
+        rates = self.allocate(demand)
+        for mailbox in mailboxes:
+            rate = rates.get(mailbox)
+            mailbox.min_interval = 1.0 / rate if rate else 0.0
+
+        return True
+
+    def allocate(self, demand):
+        # water filling, cameras asking for less than their share are given
+        # what they ask for and the remainder is shared among the others
+        rates = {}
+        if self.total_rate is None:
+            return rates
+
+        remaining = self.total_rate
+        active = {mailbox: self.weight(mailbox) for mailbox, fps in demand.items() if fps > 0}
+        while len(active):
+            share = remaining / sum(active.values())
+            capped = [mailbox for mailbox, weight in active.items() if demand[mailbox] <= share * weight]
+            if not len(capped):
+                for mailbox, weight in active.items():
+                    rates[mailbox] = max(share * weight, self.min_rate)
+                break
+            for mailbox in capped:
+                remaining -= demand[mailbox]
+                active.pop(mailbox)
+
+        return rates
@@ -0,0 +1,74 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/analysis/zones.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import numpy as np
+import cv2
+
+# Zones are polygons with corners in fractions of the frame size.  They are
+# kept in the settings as "x,y;x,y;x,y" strings separated by ":".
+
+def parse_zones(text):
+    zones = []
+    for item in str(text).split(":"):
+        try:
+            points = [tuple(min(max(float(v), 0.0), 1.0) for v in point.split(",")) for point in item.split(";")]
+            if len(points) > 2 and all(len(point) == 2 for point in points):
+                zones.append(points)
+        except ValueError:
+            pass
+    return zones
+
+def format_zones(zones):
+    return ":".join([";".join([f'{x:.4f},{y:.4f}' for x, y in zone]) for zone in zones])
+
+class ZoneMap():
+    # Averages a motion mask over each zone.  The mask is reduced to a small
+    # copy and every zone becomes a row of weights, one over its area on the
+    # pixels inside the polygon, so the scores of all zones come out of a
+    # single matrix product.  Zones may overlap.  The weights are rebuilt only
+    # when the shape of the mask changes.
+    #
+    #   width - width of the reduced mask the zones are scored on
+
+    def __init__(self, zones, width=160):
+        self.zones = [list(zone) for zone in zones]
+        self.width = width
+        self.shape = None
+        self.matrix = None
+
+    def build(self, shape):
+        h, w = shape
+        self.shape = shape
+        self.matrix = np.zeros((len(self.zones), h * w), dtype=np.float32)
+        canvas = np.empty((h, w), dtype=np.uint8)
+        for i, zone in enumerate(self.zones):
+            canvas.fill(0)
+            points = np.round(np.array(zone) * (w - 1, h - 1)).astype(np.int32)
+            cv2.fillPoly(canvas, [points], 1)
+            if area := np.count_nonzero(canvas):
+                self.matrix[i] = canvas.ravel() / area
+
+    def __call__(self, mask):
+        # returns the mean mask value inside each zone
+        h, w = mask.shape[:2]
+        if w > self.width:
+            mask = cv2.resize(mask, (self.width, max(1, round(h * self.width / w))), interpolation=cv2.INTER_AREA)
+        if mask.shape[:2] != self.shape:
+            self.build(mask.shape[:2])
+        return self.matrix @ mask.ravel().astype(np.float32)
@@ -4,4 +4,8 @@ from .thresholdslider import ThresholdSlider
 from .comboselector import ComboSelector
 from .progress import Progress
 from .warningbar import WarningBar, Indicator
-from .target import Target, TargetList, TargetDialog, TargetSelector
\ No newline at end of file
+from .target import Target, TargetList, TargetDialog, TargetSelector
+from .reuseselector import ReuseSelector
+from .gateselector import GateSelector
+from .regionselector import RegionSelector, RegionDialog
+from .zoneselector import ZoneSelector, ZoneDialog
\ No newline at end of file
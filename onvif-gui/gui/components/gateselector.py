@@ -0,0 +1,77 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/components/gateselector.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+from PyQt6.QtWidgets import QWidget, QCheckBox, QSpinBox, QLabel, QGridLayout
+
+class GateSelector(QWidget):
+    # system wide setting for running the detector only on streams with motion
+    def __init__(self, mw, module):
+        super().__init__()
+        self.mw = mw
+        self.enabledKey = "Module/" + module + "/motionGate"
+        self.sensitivityKey = "Module/" + module + "/motionGateSensitivity"
+        self.holdKey = "Module/" + module + "/motionGateHold"
+
+        self.chkGate = QCheckBox("Detect only when motion is present")
+        self.chkGate.setChecked(bool(int(self.mw.settings.value(self.enabledKey, 0))))
+        self.chkGate.stateChanged.connect(self.chkGateChecked)
+
+        self.spnSensitivity = QSpinBox()
+        self.spnSensitivity.setMaximum(100)
+        self.spnSensitivity.setValue(int(self.mw.settings.value(self.sensitivityKey, 50)))
+        self.spnSensitivity.valueChanged.connect(self.spnSensitivityChanged)
+        lblSensitivity = QLabel("Sensitivity")
+
+        self.spnHold = QSpinBox()
+        self.spnHold.setMaximum(60)
+        self.spnHold.setValue(int(self.mw.settings.value(self.holdKey, 2)))
+        self.spnHold.valueChanged.connect(self.spnHoldChanged)
+        lblHold = QLabel("Hold (s)")
+
+        lytMain = QGridLayout(self)
+        lytMain.addWidget(self.chkGate,         0, 0, 1, 4)
+        lytMain.addWidget(lblSensitivity,       1, 0, 1, 1)
+        lytMain.addWidget(self.spnSensitivity,  1, 1, 1, 1)
+        lytMain.addWidget(lblHold,              1, 2, 1, 1)
+        lytMain.addWidget(self.spnHold,         1, 3, 1, 1)
+        lytMain.setContentsMargins(0, 0, 0, 0)
+        self.enableControls()
+
+    def enableControls(self):
+        self.spnSensitivity.setEnabled(self.chkGate.isChecked())
+        self.spnHold.setEnabled(self.chkGate.isChecked())
+
+    def chkGateChecked(self, state):
+        self.mw.settings.setValue(self.enabledKey, int(self.chkGate.isChecked()))
+        self.enableControls()
+
+    def spnSensitivityChanged(self, value):
+        self.mw.settings.setValue(self.sensitivityKey, value)
+
+    def spnHoldChanged(self, value):
+        self.mw.settings.setValue(self.holdKey, value)
+
+    def isChecked(self):
+        return self.chkGate.isChecked()
+
+    def sensitivity(self):
+        return self.spnSensitivity.value()
+
+    def hold(self):
+        return self.spnHold.value()
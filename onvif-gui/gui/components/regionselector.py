@@ -0,0 +1,217 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/components/regionselector.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+from PyQt6.QtWidgets import QDialog, QGridLayout, QDialogButtonBox, QWidget, \
+    QLabel, QPushButton, QCheckBox
+from PyQt6.QtGui import QPainter, QPen, QColor, QColorConstants, QImage
+from PyQt6.QtCore import Qt, QRectF, QPointF, QSize
+from gui.enums import MediaSource
+from loguru import logger
+
+def currentModelSettings(mw):
+    # model settings of the camera or file selected in the video panel
+    if not mw.videoConfigure:
+        return None
+    match mw.videoConfigure.source:
+        case MediaSource.CAMERA:
+            if camera := mw.cameraPanel.getCurrentCamera():
+                return camera.videoModelSettings
+        case MediaSource.FILE:
+            return mw.filePanel.videoModelSettings
+    return None
+
+def currentSnapshot(mw):
+    # copy of the last picture shown for the selected camera or file
+    player = None
+    if mw.videoConfigure:
+        match mw.videoConfigure.source:
+            case MediaSource.CAMERA:
+                player = mw.cameraPanel.getCurrentPlayer()
+            case MediaSource.FILE:
+                player = mw.pm.getCurrentPlayer()
+    image = None
+    if player:
+        with player.thread_lock:
+            if player.image is not None:
+                image = QImage(player.image).copy()
+    return image
+
+class RegionCanvas(QWidget):
+    # shows a still of the stream, drag to add a rectangle, right click to remove one
+    def __init__(self):
+        super().__init__()
+        self.image = None
+        self.regions = []
+        self.start = None
+        self.current = None
+        self.setMinimumSize(480, 270)
+
+    def imageRect(self):
+        if self.image is None or self.image.isNull():
+            return QRectF(self.rect())
+        size = QSize(self.image.size())
+        size.scale(self.size(), Qt.AspectRatioMode.KeepAspectRatio)
+        rect = QRectF(0, 0, size.width(), size.height())
+        rect.moveCenter(QPointF(self.rect().center()))
+        return rect
+
+    def toFraction(self, pos):
+        rect = self.imageRect()
+        x = min(max((pos.x() - rect.x()) / rect.width(), 0.0), 1.0)
+        y = min(max((pos.y() - rect.y()) / rect.height(), 0.0), 1.0)
+        return QPointF(x, y)
+
+    def toCanvas(self, region):
+        rect = self.imageRect()
+        x, y, w, h = region
+        return QRectF(rect.x() + x * rect.width(), rect.y() + y * rect.height(), w * rect.width(), h * rect.height())
+
+    def mousePressEvent(self, event):
+        pos = self.toFraction(event.position())
+        if event.button() == Qt.MouseButton.RightButton:
+            for region in reversed(self.regions):
+                x, y, w, h = region
+                if x <= pos.x() <= x + w and y <= pos.y() <= y + h:
+                    self.regions.remove(region)
+                    break
+        else:
+            self.start = pos
+            self.current = pos
+        self.update()
+
+    def mouseMoveEvent(self, event):
+        if self.start:
+            self.current = self.toFraction(event.position())
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if self.start:
+            region = self.dragged()
+            if region[2] > 0.01 and region[3] > 0.01:
+                self.regions.append(region)
+        self.start = None
+        self.current = None
+        self.update()
+
+    def dragged(self):
+        x0, x1 = sorted((self.start.x(), self.current.x()))
+        y0, y1 = sorted((self.start.y(), self.current.y()))
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColorConstants.Black)
+        if self.image is not None and not self.image.isNull():
+            painter.drawImage(self.imageRect(), self.image)
+
+        pen = QPen(QColorConstants.Yellow)
+        pen.setWidth(2)
+        painter.setPen(pen)
+        painter.setBrush(QColor(255, 255, 0, 40))
+        for region in self.regions:
+            painter.drawRect(self.toCanvas(region))
+        if self.start:
+            painter.drawRect(self.toCanvas(self.dragged()))
+
+class RegionDialog(QDialog):
+    def __init__(self, mw):
+        super().__init__(mw)
+        self.mw = mw
+        self.setModal(True)
+        self.setWindowTitle("Detection Regions")
+
+        self.canvas = RegionCanvas()
+        lblHelp = QLabel("Drag to add a region, right click a region to remove it.  The whole frame is used if there are no regions.")
+        lblHelp.setWordWrap(True)
+        btnClear = QPushButton("Clear")
+        btnClear.clicked.connect(self.btnClearClicked)
+
+        self.buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        self.buttonBox.accepted.connect(self.accept)
+        self.buttonBox.rejected.connect(self.reject)
+
+        lytMain = QGridLayout(self)
+        lytMain.addWidget(self.canvas,     0, 0, 1, 2)
+        lytMain.addWidget(lblHelp,         1, 0, 1, 2)
+        lytMain.addWidget(btnClear,        2, 0, 1, 1)
+        lytMain.addWidget(self.buttonBox,  2, 1, 1, 1)
+        lytMain.setRowStretch(0, 10)
+
+    def btnClearClicked(self):
+        self.canvas.regions = []
+        self.canvas.update()
+
+    def sizeHint(self):
+        return QSize(800, 540)
+
+class RegionSelector(QWidget):
+    # per camera regions of interest, the detector only looks inside them
+    def __init__(self, mw, module):
+        super().__init__()
+        self.mw = mw
+        self.module = module
+
+        self.lblRegions = QLabel()
+        self.btnEdit = QPushButton("Regions...")
+        self.btnEdit.clicked.connect(self.btnEditClicked)
+        self.chkTile = QCheckBox("Tile large regions")
+        self.chkTile.stateChanged.connect(self.chkTileStateChanged)
+        self.setRegionText([])
+
+        lytMain = QGridLayout(self)
+        lytMain.addWidget(self.btnEdit,     0, 0, 1, 1)
+        lytMain.addWidget(self.lblRegions,  0, 1, 1, 1)
+        lytMain.addWidget(self.chkTile,     0, 2, 1, 1)
+        lytMain.setColumnStretch(1, 10)
+        lytMain.setContentsMargins(0, 0, 0, 0)
+
+    def setRegionText(self, regions):
+        if len(regions):
+            self.lblRegions.setText(f'{len(regions)} region{"s" if len(regions) > 1 else ""}')
+        else:
+            self.lblRegions.setText("Whole frame")
+
+    def btnEditClicked(self):
+        try:
+            videoModelSettings = currentModelSettings(self.mw)
+            if not videoModelSettings:
+                return
+
+            dlg = RegionDialog(self.mw)
+            dlg.canvas.image = currentSnapshot(self.mw)
+            dlg.canvas.regions = list(videoModelSettings.regions)
+
+            if dlg.exec() == QDialog.DialogCode.Accepted:
+                videoModelSettings.setRegions(dlg.canvas.regions)
+                self.setRegionText(videoModelSettings.regions)
+        except Exception as ex:
+            logger.error(f'Error editing regions : {ex}')
+
+    def chkTileStateChanged(self, state):
+        try:
+            if videoModelSettings := currentModelSettings(self.mw):
+                videoModelSettings.setTileRegions(self.chkTile.isChecked())
+        except Exception as ex:
+            logger.error(f'Error setting region tiling : {ex}')
+
+    def setModelParameters(self, videoModelSettings):
+        self.setRegionText(videoModelSettings.regions)
+        self.chkTile.blockSignals(True)
+        self.chkTile.setChecked(videoModelSettings.tileRegions)
+        self.chkTile.blockSignals(False)
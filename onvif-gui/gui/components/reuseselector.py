@@ -0,0 +1,60 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/components/reuseselector.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+from PyQt6.QtWidgets import QWidget, QCheckBox, QSpinBox, QLabel, QGridLayout
+
+class ReuseSelector(QWidget):
+    # system wide setting for skipping the detector while a scene is static
+    def __init__(self, mw, module):
+        super().__init__()
+        self.mw = mw
+        self.enabledKey = "Module/" + module + "/reuseDetections"
+        self.maxAgeKey = "Module/" + module + "/reuseMaxAge"
+
+        self.chkReuse = QCheckBox("Reuse detections while scene is unchanged")
+        self.chkReuse.setChecked(bool(int(self.mw.settings.value(self.enabledKey, 0))))
+        self.chkReuse.stateChanged.connect(self.chkReuseChecked)
+
+        self.spnMaxAge = QSpinBox()
+        self.spnMaxAge.setMinimum(1)
+        self.spnMaxAge.setMaximum(300)
+        self.spnMaxAge.setValue(int(self.mw.settings.value(self.maxAgeKey, 5)))
+        self.spnMaxAge.valueChanged.connect(self.spnMaxAgeChanged)
+        self.spnMaxAge.setEnabled(self.chkReuse.isChecked())
+        lblMaxAge = QLabel("Max Age (s)")
+
+        lytMain = QGridLayout(self)
+        lytMain.addWidget(self.chkReuse,   0, 0, 1, 1)
+        lytMain.addWidget(lblMaxAge,       0, 1, 1, 1)
+        lytMain.addWidget(self.spnMaxAge,  0, 2, 1, 1)
+        lytMain.setColumnStretch(0, 10)
+        lytMain.setContentsMargins(0, 0, 0, 0)
+
+    def chkReuseChecked(self, state):
+        self.mw.settings.setValue(self.enabledKey, int(self.chkReuse.isChecked()))
+        self.spnMaxAge.setEnabled(self.chkReuse.isChecked())
+
+    def spnMaxAgeChanged(self, value):
+        self.mw.settings.setValue(self.maxAgeKey, value)
+
+    def isChecked(self):
+        return self.chkReuse.isChecked()
+
+    def maxAge(self):
+        return self.spnMaxAge.value()
@@ -0,0 +1,166 @@
+#********************************************************************
+# libonvif/onvif-gui/gui/components/zoneselector.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+
+from PyQt6.QtWidgets import QDialog, QGridLayout, QDialogButtonBox, QWidget, QLabel, QPushButton
+from PyQt6.QtGui import QPainter, QPen, QColor, QColorConstants, QPolygonF
+from PyQt6.QtCore import Qt, QPointF, QSize
+from loguru import logger
+from .regionselector import RegionCanvas, currentModelSettings, currentSnapshot
+
+class ZoneCanvas(RegionCanvas):
+    # click to add corners, double click to close the polygon, right click a zone to remove it
+    def __init__(self):
+        super().__init__()
+        self.zones = []
+        self.points = []
+        self.setMouseTracking(True)
+
+    def toPolygon(self, points):
+        rect = self.imageRect()
+        return QPolygonF([QPointF(rect.x() + x * rect.width(), rect.y() + y * rect.height()) for x, y in points])
+
+    def mousePressEvent(self, event):
+        pos = self.toFraction(event.position())
+        if event.button() == Qt.MouseButton.RightButton:
+            if len(self.points):
+                self.points = []
+            else:
+                for zone in reversed(self.zones):
+                    if self.toPolygon(zone).containsPoint(event.position(), Qt.FillRule.OddEvenFill):
+                        self.zones.remove(zone)
+                        break
+        else:
+            self.points.append((pos.x(), pos.y()))
+        self.update()
+
+    def mouseDoubleClickEvent(self, event):
+        # Qt delivers the second click of a double click only as this event, so the
+        # corner under it was added once by the first press, a repeated point is dropped
+        points = list(self.points)
+        if len(points) > 1 and points[-1] == points[-2]:
+            points.pop()
+        if len(points) > 2:
+            self.zones.append(points)
+        self.points = []
+        self.update()
+
+    def mouseMoveEvent(self, event):
+        if len(self.points):
+            self.current = self.toFraction(event.position())
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        pass
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColorConstants.Black)
+        if self.image is not None and not self.image.isNull():
+            painter.drawImage(self.imageRect(), self.image)
+
+        pen = QPen(QColorConstants.Cyan)
+        pen.setWidth(2)
+        painter.setPen(pen)
+        painter.setBrush(QColor(0, 255, 255, 40))
+        for i, zone in enumerate(self.zones):
+            polygon = self.toPolygon(zone)
+            painter.drawPolygon(polygon)
+            painter.drawText(polygon.boundingRect().center(), str(i + 1))
+
+        if len(self.points):
+            points = list(self.points)
+            if self.current:
+                points.append((self.current.x(), self.current.y()))
+            painter.drawPolyline(self.toPolygon(points))
+
+class ZoneDialog(QDialog):
+    def __init__(self, mw):
+        super().__init__(mw)
+        self.mw = mw
+        self.setModal(True)
+        self.setWindowTitle("Motion Zones")
+
+        self.canvas = ZoneCanvas()
+        lblHelp = QLabel("Click to add the corners of a zone and double click to close it, right click a zone to remove it.  Motion anywhere in the frame is used if there are no zones.")
+        lblHelp.setWordWrap(True)
+        btnClear = QPushButton("Clear")
+        btnClear.clicked.connect(self.btnClearClicked)
+
+        self.buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        self.buttonBox.accepted.connect(self.accept)
+        self.buttonBox.rejected.connect(self.reject)
+
+        lytMain = QGridLayout(self)
+        lytMain.addWidget(self.canvas,     0, 0, 1, 2)
+        lytMain.addWidget(lblHelp,         1, 0, 1, 2)
+        lytMain.addWidget(btnClear,        2, 0, 1, 1)
+        lytMain.addWidget(self.buttonBox,  2, 1, 1, 1)
+        lytMain.setRowStretch(0, 10)
+
+    def btnClearClicked(self):
+        self.canvas.zones = []
+        self.canvas.points = []
+        self.canvas.update()
+
+    def sizeHint(self):
+        return QSize(800, 540)
+
+class ZoneSelector(QWidget):
+    # per camera motion zones, alarms come only from motion inside them
+    def __init__(self, mw, module):
+        super().__init__()
+        self.mw = mw
+        self.module = module
+
+        self.lblZones = QLabel()
+        self.btnEdit = QPushButton("Zones...")
+        self.btnEdit.clicked.connect(self.btnEditClicked)
+        self.setZoneText([])
+
+        lytMain = QGridLayout(self)
+        lytMain.addWidget(self.btnEdit,   0, 0, 1, 1)
+        lytMain.addWidget(self.lblZones,  0, 1, 1, 1)
+        lytMain.setColumnStretch(1, 10)
+        lytMain.setContentsMargins(0, 0, 0, 0)
+
+    def setZoneText(self, zones):
+        if len(zones):
+            self.lblZones.setText(f'{len(zones)} zone{"s" if len(zones) > 1 else ""}')
+        else:
+            self.lblZones.setText("Whole frame")
+
+    def btnEditClicked(self):
+        try:
+            videoModelSettings = currentModelSettings(self.mw)
+            if not videoModelSettings:
+                return
+
+            dlg = ZoneDialog(self.mw)
+            dlg.canvas.image = currentSnapshot(self.mw)
+            dlg.canvas.zones = [list(zone) for zone in videoModelSettings.zones]
+
+            if dlg.exec() == QDialog.DialogCode.Accepted:
+                videoModelSettings.setZones(dlg.canvas.zones)
+                self.setZoneText(videoModelSettings.zones)
+        except Exception as ex:
+            logger.error(f'Error editing zones : {ex}')
+
+    def setModelParameters(self, videoModelSettings):
+        self.setZoneText(videoModelSettings.zones)
@@ -0,0 +1,146 @@
+#/********************************************************************
+# libonvif/onvif-gui/gui/framebuffer.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import threading
+import numpy as np
+from PyQt6.QtGui import QImage
+
+class FrameBuffer():
+    # A decoded picture shared by the display, the analyzer and snapshot
+    # saving without copies.  The numpy array and the QImage are views of
+    # the same memory, and the decoder frame that memory belongs to is held
+    # for as long as the buffer is in use.
+    #
+    # The buffer starts with one reference owned by whoever made it.  Every
+    # other consumer takes its own with acquire and each reference is given
+    # back with release, or by leaving a with block.  Once the last one is
+    # released the views must not be used any more, the memory goes back to
+    # the decoder or, for a pooled copy, to the pool.  A numpy view of a
+    # wrapped decoder frame holds that frame by itself, so a worker passing
+    # such a view on to another thread stays safe, pooled copies have no
+    # such guard.
+    #
+    #   array  - the picture, height x width x channels or height x width
+    #   source - object owning the memory, kept alive until the last release
+    #   pool   - FramePool the array is returned to
+
+    def __init__(self, array, source=None, pool=None):
+        self.array = array
+        self.source = source
+        self.pool = pool
+        self.refs = 1
+        self.lock = threading.Lock()
+        self.qimage = None
+
+    def acquire(self):
+        with self.lock:
+            if self.refs < 1:
+                raise RuntimeError("frame buffer used after release")
+            self.refs += 1
+        return self
+
+    def release(self):
+        with self.lock:
+            self.refs -= 1
+            if self.refs:
+                return
+            array = self.array
+            self.array = None
+            self.source = None
+            self.qimage = None
+        if self.pool:
+            self.pool.recycle(array)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    @property
+    def image(self):
+        # QImage over the array, made on first use
+        if self.qimage is None:
+            h, w = self.array.shape[:2]
+            if self.array.ndim > 2 and self.array.shape[2] > 1:
+                self.qimage = QImage(self.array.data, w, h, self.array.strides[0], QImage.Format.Format_RGB888)
+            else:
+                self.qimage = QImage(self.array.data, w, h, self.array.strides[0], QImage.Format.Format_Grayscale8)
+        return self.qimage
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    @property
+    def ndim(self):
+        return self.array.ndim
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is not None and dtype != self.array.dtype:
+            return self.array.astype(dtype)
+        return self.array.copy() if copy else self.array
+
+class FramePool():
+    # Makes FrameBuffers.  A buffer wrapping a decoder frame shares the
+    # frame's memory.  A buffer holding a copy, such as a picture made by
+    # the analyzer to be shown in place of the stream, takes its array from
+    # a free list kept for each shape, and the array goes back on the list
+    # when the buffer is released, so steady streams stop allocating.
+    #
+    #   depth - spare arrays kept for each shape
+
+    def __init__(self, depth=4):
+        self.depth = depth
+        self.free = {}
+        self.lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+
+    def wrap(self, F):
+        return FrameBuffer(np.array(F, copy=False), source=F)
+
+    def copy(self, ary):
+        ary = np.asarray(ary)
+        key = (ary.shape, ary.dtype.str)
+        with self.lock:
+            spares = self.free.get(key)
+            array = spares.pop() if spares else None
+            if array is None:
+                self.allocated += 1
+            else:
+                self.reused += 1
+        if array is None:
+            array = np.empty(ary.shape, dtype=ary.dtype)
+        np.copyto(array, ary)
+        return FrameBuffer(array, pool=self)
+
+    def recycle(self, array):
+        key = (array.shape, array.dtype.str)
+        with self.lock:
+            spares = self.free.setdefault(key, [])
+            if len(spares) < self.depth:
+                spares.append(array)
+
+    def clear(self):
+        with self.lock:
+            self.free.clear()
+
+    def __str__(self):
+        return f'Frame pool {self.allocated} arrays allocated, {self.reused} reused'
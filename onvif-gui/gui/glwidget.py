@@ -18,13 +18,13 @@
 #*********************************************************************/
 
 from PyQt6.QtOpenGLWidgets import QOpenGLWidget
-from PyQt6.QtGui import QPainter, QImage, QColorConstants, QPen, QMovie, QIcon
-from PyQt6.QtCore import QSize, QPointF, QRectF, QTimer, QObject, pyqtSignal, QSettings
+from PyQt6.QtGui import QPainter, QImage, QColorConstants, QPen, QMovie, QIcon, QPolygonF
+from PyQt6.QtCore import Qt, QSize, QPoint, QPointF, QRect, QRectF, QTimer, QObject, pyqtSignal, QSettings
 from PyQt6.QtWidgets import QMessageBox
-import numpy as np
 from datetime import datetime
 import time
 from gui.enums import StreamState, ProxyType
+from gui.textures import TextureRenderer, hardware_context
 from loguru import logger
 #import psutil
 
@@ -48,6 +48,10 @@ class GLWidget(QOpenGLWidget):
         self.alarm_recording.start()
 
         self.buffer = None
+        self.tiles = None
+        self.overlays = []
+        self.layout_version = -1
+        self.renderer = None
 
         self.signals = GLWidgetSignals()
         self.signals.mouseClick.connect(self.handleMouseClick)
@@ -57,83 +61,101 @@ class GLWidget(QOpenGLWidget):
         refreshInterval = self.mw.settingsPanel.general.spnDisplayRefresh.value()
         self.timer.start(refreshInterval)
 
+        # decode sizes follow the tiles once the layout has settled
+        self.decodeTimer = QTimer()
+        self.decodeTimer.setSingleShot(True)
+        self.decodeTimer.setInterval(1000)
+        self.decodeTimer.timeout.connect(self.mw.refreshDecodeSizes)
+
         self.last_alarm_check = time.time()
         self.alarms = {}
     
     def renderCallback(self, F, player):
+        # the decoded frame is shared with the analyzer and the player as a FrameBuffer,
+        # the reference made here is released when the callback returns
+        frame = None
         try :
-            self.mw.pm.lock()
-
-            if self.mw.settingsPanel.proxy.generateAlarmsLocally():
-                if self.mw.videoConfigure:
-                    if player.analyze_video and self.mw.videoConfigure.initialized:
-                        F = self.mw.pyVideoCallback(F, player)
-                    else:
-                        # clear the video panel alarm display
-                        if player.uri == self.focused_uri:
-                            if self.mw.videoWorker:
-                                self.mw.videoWorker(None, None)
-            else:
-                player.loadRemoteDetections()
-
-            ary = np.array(F, copy = False) 
-
-            if len(ary.shape) < 2:
-                return
-            h = ary.shape[0]
-            w = ary.shape[1]
-            d = 1
-            if ary.ndim > 2:
-                d = ary.shape[2]
-
-            w_s = w
-            h_s = h
-            # the aspect ratios are multiplied by 100 and converted to int for comparison purpose
-            actual_ratio = int(100.0 * float(w) / float(h))
-            if actual_ratio and player.desired_aspect:
-                if actual_ratio != player.desired_aspect:
-                    if player.desired_aspect > 1:
-                        w_s = int(h * player.desired_aspect / 100)
-                    else:
-                        h_s = int(w *100 / player.desired_aspect)
-
-            self.mw.pm.sizes[player.uri] = QSize(w_s, h_s)
-
-            player.lock()
-
-            if d > 1:
-                player.image = QImage(ary.data, w, h, d * w, QImage.Format.Format_RGB888)
-            else:
-                player.image = QImage(ary.data, w, h, w, QImage.Format.Format_Grayscale8)
+            frame = self.mw.framePool.wrap(F)
+            with self.mw.pm.thread_lock:
+                shown = frame
+                if self.mw.settingsPanel.proxy.generateAlarmsLocally():
+                    if self.mw.videoConfigure:
+                        if player.analyze_video and self.mw.videoConfigure.initialized:
+                            self.mw.analysisPool.submit(frame, player)
+                            with player.thread_lock:
+                                if player.analysis_frame is not None:
+                                    shown = player.analysis_frame.acquire()
+                        else:
+                            with player.thread_lock:
+                                if player.analysis_frame is not None:
+                                    player.analysis_frame.release()
+                                    player.analysis_frame = None
+                            # clear the video panel alarm display
+                            if player.uri == self.focused_uri:
+                                if self.mw.videoWorker:
+                                    self.mw.videoWorker(None, None)
+                else:
+                    player.loadRemoteDetections()
+
+                if shown is frame:
+                    frame.acquire()
+
+                if shown.ndim < 2:
+                    shown.release()
+                    return
+                h = shown.shape[0]
+                w = shown.shape[1]
+
+                w_s = w
+                h_s = h
+                # the aspect ratios are multiplied by 100 and converted to int for comparison purpose
+                actual_ratio = int(100.0 * float(w) / float(h))
+                if actual_ratio and player.desired_aspect:
+                    if actual_ratio != player.desired_aspect:
+                        if player.desired_aspect > 1:
+                            w_s = int(h * player.desired_aspect / 100)
+                        else:
+                            h_s = int(w *100 / player.desired_aspect)
 
-            if player.save_image_filename:
-                player.image.save(player.save_image_filename)
-                player.save_image_filename = None
+                self.mw.pm.setSize(player.uri, QSize(w_s, h_s))
 
-            if player.packet_drop_frame_counter > 0:
-                player.packet_drop_frame_counter -= 1
-            else:
-                player.packet_drop_frame_counter = 0
+                with player.thread_lock:
+                    # the player keeps the buffer it shows until the next one replaces it
+                    previous = player.frame
+                    player.frame = shown
+                    player.image = shown.image
+                    if previous is not None:
+                        previous.release()
 
-            player.unlock()
+                    if player.save_image_filename:
+                        player.image.save(player.save_image_filename)
+                        player.save_image_filename = None
 
-            if current := self.mw.cameraPanel.getCurrentPlayer():
-                if player.uri == current.uri:
-                    self.mw.cameraPanel.tabVideo.updateCacheSize(player.getCacheSize())
+                    if player.packet_drop_frame_counter > 0:
+                        player.packet_drop_frame_counter -= 1
+                    else:
+                        player.packet_drop_frame_counter = 0
 
-            self.mw.pm.unlock()
+                if current := self.mw.cameraPanel.getCurrentPlayer():
+                    if player.uri == current.uri:
+                        self.mw.cameraPanel.tabVideo.updateCacheSize(player.getCacheSize())
 
         except BaseException as ex:
             logger.error(f'GLWidget render callback exception: {str(ex)}')
+        finally:
+            if frame is not None:
+                frame.release()
 
     def timerCallback(self):
         if len(self.mw.pm.players) or len(self.mw.timers):
-            self.create()
+            # with textures the pictures are not in the buffer, so new frames need a paint
+            if self.create() or self.renderer:
+                self.update()
         else:
             if self.buffer:
                 self.buffer.fill(QColorConstants.Black)
-
-        self.update()
+            self.tiles = None
+            self.update()
 
     def alarmBroadcast(self):
         proxyPanel = self.mw.settingsPanel.proxy
@@ -232,6 +254,54 @@ class GLWidget(QOpenGLWidget):
                     result = True
         return result
     
+    def initializeGL(self):
+        self.createRenderer(self.mw.settingsPanel.general.chkHardwareRender.isChecked())
+
+    def createRenderer(self, enabled):
+        # needs the context to be current
+        try:
+            if enabled and self.renderer is None:
+                if hardware_context():
+                    self.renderer = TextureRenderer()
+                else:
+                    logger.debug("OpenGL is not hardware accelerated, frames are drawn with QPainter")
+            if not enabled and self.renderer:
+                self.renderer.destroy()
+                self.renderer = None
+        except Exception as ex:
+            logger.error(f'Unable to initialize texture rendering, frames are drawn with QPainter : {ex}')
+            self.renderer = None
+        self.tiles = None
+
+    def setTextureRendering(self, enabled):
+        # frames are uploaded to gl textures when enabled and the gpu supports it,
+        # otherwise they are drawn into the buffer with QPainter
+        if self.context() is None:
+            return
+        self.makeCurrent()
+        self.createRenderer(enabled)
+        self.doneCurrent()
+
+    def drawTextures(self, painter):
+        # the pictures go from the frames to textures, the buffer holds only the overlays
+        viewport = QRect(QPoint(0, 0), self.size())
+        uris = set()
+        with self.mw.pm.thread_lock:
+            for player in self.mw.pm.players:
+                if player.disable_video or player.hidden:
+                    continue
+                with player.thread_lock:
+                    if player.image is None:
+                        continue
+                    rect = self.mw.pm.displayRect(player.uri, self.size())
+                    uris.add(player.uri)
+                    painter.beginNativePainting()
+                    drawn = self.renderer.draw(player.uri, player.image, rect, viewport)
+                    painter.endNativePainting()
+                    if not drawn:
+                        painter.drawImage(rect, player.image)
+        self.renderer.prune(uris)
+
     def paintGL(self):
         try:
             if self.buffer:
@@ -239,157 +309,179 @@ class GLWidget(QOpenGLWidget):
                     painter = QPainter(self)
                     painter.setRenderHint(QPainter.RenderHint.Antialiasing)
                     painter.fillRect(self.rect(), QColorConstants.Black)
+                    if self.renderer and not self.model_loading:
+                        try:
+                            self.drawTextures(painter)
+                        except Exception as ex:
+                            logger.error(f'Texture rendering failed, frames are drawn with QPainter : {ex}')
+                            self.renderer = None
+                            self.tiles = None
                     painter.drawImage(self.rect(), self.buffer)
         except Exception as ex:
             logger.error(f'GLWidget render callback exception: {str(ex)}')
 
+    def clearRect(self, painter, rect):
+        # with textures the buffer is laid over the pictures, so it is cleared to transparent
+        if self.renderer:
+            painter.save()
+            painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Clear)
+            painter.fillRect(rect, QColorConstants.Transparent)
+            painter.restore()
+        else:
+            painter.fillRect(rect, QColorConstants.Black)
+
+    def tileState(self, player, camera, rect):
+        # everything shown in the tile of a player, the tile is redrawn only when this changes
+        blinker = None
+        if camera:
+            if camera.isRecording():
+                if camera.isAlarming():
+                    blinker = self.alarm_recording
+                elif not player.systemTabSettings.record_always:
+                    blinker = self.plain_recording
+            elif camera.isAlarming():
+                blinker = "image:alarm_plain.png"
+        if not player.isCameraStream() and player.alarm_state:
+            blinker = "image:alarm_plain.png"
+        frame = blinker.currentFrameNumber() if isinstance(blinker, QMovie) else None
+
+        show = False
+        if self.mw.settingsPanel.proxy.generateAlarmsLocally():
+            if player.videoModelSettings:
+                show = player.videoModelSettings.show
+
+        return (rect, None if self.renderer else player.image.cacheKey(), self.isFocusedURI(player.uri), player.packet_drop_frame_counter > 0,
+                blinker, frame, show, player.analyze_video, id(getattr(player.videoModelSettings, "regions", None)),
+                id(getattr(player.videoModelSettings, "zones", None)), tuple(level > 1.0 for level in player.zone_levels),
+                id(player.boxes), len(player.boxes))
+
     def create(self):
+        # The buffer is kept between timer ticks and only the tiles whose picture or
+        # overlays changed are painted again.  The whole buffer is cleared when the
+        # widget size, the layout or the set of visible streams changes.  Returns
+        # True if anything was painted.
         try:
-            self.buffer = QImage(self.size(), QImage.Format.Format_ARGB32)
+            if self.buffer is None or self.buffer.size() != self.size():
+                self.buffer = QImage(self.size(), QImage.Format.Format_ARGB32)
+                self.tiles = None
+                self.decodeTimer.start()
             if self.buffer.isNull():
-                return
+                return False
             painter = QPainter(self.buffer)
             if not painter.isActive():
-                return
+                return False
             painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-            painter.fillRect(self.rect(), QColorConstants.Black)
 
             #self.mw.settingsPanel.general.lblMemory.setText(f'{self.process.memory_info().rss:_}')
  
             if self.model_loading:
+                painter.fillRect(self.rect(), QColorConstants.Black)
                 rectSpinner = QRectF(0, 0, 40, 40)
                 rectSpinner.moveCenter(QPointF(self.rect().center()))
                 painter.drawImage(rectSpinner, self.spinner.currentImage())
-                return
-
-            self.mw.pm.lock()
-            for player in self.mw.pm.players:
-                '''
-                #
-                # RECONNECT CYCLING stress testing for streams
-                #
-
-                if not player.last_render:
-                    player.last_render = datetime.now()
-                uri = player.uri
-                if player.isCameraStream() and player.running and player.last_render:
-                    interval = datetime.now() - player.last_render
-                    if interval.total_seconds() > 30:
+                self.tiles = None
+                return True
+
+            changed = False
+            with self.mw.pm.thread_lock:
+                visible = set(player.uri for player in self.mw.pm.players if not player.disable_video and not player.hidden)
+                if self.tiles is None or self.tiles.keys() != visible or self.layout_version != self.mw.pm.layout_version:
+                    if self.layout_version != self.mw.pm.layout_version:
+                        self.decodeTimer.start()
+                    self.clearRect(painter, QRectF(self.rect()))
+                    self.tiles = dict.fromkeys(visible)
+                    self.layout_version = self.mw.pm.layout_version
+                    self.overlays = []
+                    changed = True
+
+                # the disconnect messages drawn on the last tick may reach into other tiles
+                cleared = self.overlays
+                for region in cleared:
+                    self.clearRect(painter, region)
+                    changed = True
+                self.overlays = []
+
+                for player in self.mw.pm.players:
+                    '''
+                    #
+                    # RECONNECT CYCLING stress testing for streams
+                    #
+
+                    if not player.last_render:
                         player.last_render = datetime.now()
-                        player.requestShutdown(reconnect=True)
+                    uri = player.uri
+                    if player.isCameraStream() and player.running and player.last_render:
+                        interval = datetime.now() - player.last_render
+                        if interval.total_seconds() > 30:
+                            player.last_render = datetime.now()
+                            player.requestShutdown(reconnect=True)
+                            continue
+                    #'''
+
+                    if self.mw.last_alarm:
+                        interval = datetime.now() - self.mw.last_alarm
+                        if interval.total_seconds() > 10:
+                            self.mw.alarm_states = []
+
+                    if player.pipe_output_start_time:
+                        interval = datetime.now() - player.pipe_output_start_time
+                        if interval.total_seconds() > self.mw.STD_FILE_DURATION:
+                            d = self.mw.settingsPanel.storage.dirArchive.txtDirectory.text()
+                            if self.mw.settingsPanel.storage.chkManageDiskUsage.isChecked():
+                                player.manageDirectory(d)
+
+                            filename = player.getPipeOutFilename(d)
+                            if filename:
+                                player.startFileBreakPipe(filename)
+
+                    if player.disable_video or player.hidden:
                         continue
-                #'''
-
-                if self.mw.last_alarm:
-                    interval = datetime.now() - self.mw.last_alarm
-                    if interval.total_seconds() > 10:
-                        self.mw.alarm_states = []
 
-                if player.pipe_output_start_time:
-                    interval = datetime.now() - player.pipe_output_start_time
-                    if interval.total_seconds() > self.mw.STD_FILE_DURATION:
-                        d = self.mw.settingsPanel.storage.dirArchive.txtDirectory.text()
-                        if self.mw.settingsPanel.storage.chkManageDiskUsage.isChecked():
-                            player.manageDirectory(d)
+                    camera = self.mw.cameraPanel.getCamera(player.uri)
+
+                    if player.image is None:
+                        rect = self.mw.pm.displayRect(player.uri, self.size())
+                        state = (rect, self.spinner.currentFrameNumber(), self.isFocusedURI(player.uri))
+                        if state != self.tiles.get(player.uri) or any(rect.intersects(region) for region in cleared):
+                            self.tiles[player.uri] = state
+                            changed = True
+                            self.clearRect(painter, rect)
+                            rectSpinner = QRectF(0, 0, 40, 40)
+                            rectSpinner.moveCenter(rect.center())
+                            painter.drawImage(rectSpinner, self.spinner.currentImage())
+
+                            if self.isFocusedURI(player.uri):
+                                if rect.isValid():
+                                    painter.setPen(QColorConstants.White)
+                                    painter.drawRect(rect.adjusted(1, 1, -2, -2))
+
+                        if camera:
+                            camera.setIcon(QIcon(self.spinner.currentPixmap()))
+                            if camera.isCurrent():
+                                self.mw.cameraPanel.setTabsEnabled(False)
 
-                        filename = player.getPipeOutFilename(d)
-                        if filename:
-                            player.startFileBreakPipe(filename)
+                        continue
 
-                if player.disable_video or player.hidden:
-                    continue
+                    with player.thread_lock:
+                        rect = self.mw.pm.displayRect(player.uri, self.size())
+                        if not player.analyze_video and player.alarm_state:
+                            player.setAlarmState(0)
 
-                camera = self.mw.cameraPanel.getCamera(player.uri)
+                        state = self.tileState(player, camera, rect)
+                        if state != self.tiles.get(player.uri) or any(rect.intersects(region) for region in cleared):
+                            self.tiles[player.uri] = state
+                            changed = True
+                            painter.save()
+                            painter.setClipRect(rect)
+                            self.drawTile(painter, player, rect, state)
+                            painter.restore()
 
-                if player.image is None:
-                    rect = self.mw.pm.displayRect(player.uri, self.size())
-                    rectSpinner = QRectF(0, 0, 40, 40)
-                    rectSpinner.moveCenter(rect.center())
-                    painter.drawImage(rectSpinner, self.spinner.currentImage())
                     if camera:
-                        camera.setIcon(QIcon(self.spinner.currentPixmap()))
                         if camera.isCurrent():
-                            self.mw.cameraPanel.setTabsEnabled(False)
-
-                    if self.isFocusedURI(player.uri):
-                        if rect.isValid():
-                            painter.setPen(QColorConstants.White)
-                            painter.drawRect(rect.adjusted(1, 1, -2, -2))
-
-                    continue
-
-                player.lock()
-
-                rect = self.mw.pm.displayRect(player.uri, self.size())
-                x = rect.x()
-                y = rect.y()
-                w = rect.width()
-                h = rect.height()
-
-                painter.drawImage(rect, player.image)
-                if not player.analyze_video and player.alarm_state:
-                    player.setAlarmState(0)
-
-                b = 26
-                rectBlinker = QRectF(0, 0, b, b)
-                rectBlinker.moveCenter(QPointF(x+w-b, y+h-b))
-                if camera:
-                    if camera.isRecording():
-                        if camera.isAlarming():
-                            painter.drawImage(rectBlinker, self.alarm_recording.currentImage())
-                        else:
-                            if not player.systemTabSettings.record_always:
-                                painter.drawImage(rectBlinker, self.plain_recording.currentImage())
-                    else:
-                        if camera.isAlarming():
-                            painter.drawImage(rectBlinker, QImage("image:alarm_plain.png"))
-
-                if not player.isCameraStream() and player.alarm_state:
-                    painter.drawImage(rectBlinker, QImage("image:alarm_plain.png"))
-
-                if self.isFocusedURI(player.uri):
-                    painter.setPen(QColorConstants.White)
-                    painter.drawRect(rect.adjusted(1, 1, -2, -2))
+                            self.mw.cameraPanel.setTabsEnabled(True)
 
-                if player.packet_drop_frame_counter > 0:
-                    pen = QPen(QColorConstants.Yellow)
-                    pen.setWidth(3)
-                    painter.setPen(pen)
-                    painter.drawRect(rect.adjusted(3, 3, -5, -5))
-
-                show = False
-                if self.mw.settingsPanel.proxy.generateAlarmsLocally():
-                    if player.videoModelSettings:
-                        show = player.videoModelSettings.show
-
-                if show and len(player.boxes) and player.analyze_video:
-                    if player.remote_width:
-                        scalex = w / player.remote_width
-                    else:
-                        scalex = w / player.image.rect().width()
-
-                    if player.remote_height:
-                        scaley = h / player.remote_height
-                    else:
-                        scaley = h / player.image.rect().height()
-
-                    painter.setPen(QColorConstants.Red)
-                    for box in player.boxes:
-                        p = (box[0] * scalex + x)
-                        q = (box[1] * scaley + y)
-                        r = (box[2] - box[0]) * scalex
-                        s = (box[3] - box[1]) * scaley
-                        painter.drawRect(QRectF(p, q, r, s))
-
-                player.unlock()
-
-                if camera:
-                    if camera.isCurrent():
-                        self.mw.cameraPanel.setTabsEnabled(True)
-
-                    if player.image:
-                        camera.setIconOn()
-            self.mw.pm.unlock()
+                        if player.image:
+                            camera.setIconOn()
 
             for timer in self.mw.timers.values():
 
@@ -409,42 +501,118 @@ class GLWidget(QOpenGLWidget):
                                     if timer.uri == recordProfile.uri():
                                         continue
                     
-                    timer.lock()
-                    rect = self.mw.pm.displayRect(timer.uri, self.size())
-                    painter.setPen(QColorConstants.LightGray)
-                    rectSpinner = QRectF(0, 0, 40, 40)
-                    rectSpinner.moveCenter(rect.center())
-                    painter.drawImage(rectSpinner, self.spinner.currentImage())
-
-                    day = timer.disconnected_time.strftime("%m/%d/%Y")
-                    if day == datetime.now().strftime("%m/%d/%Y"):
-                        day = "today"
-
-                    text = f'{self.mw.getCameraName(timer.uri)}'
-                    rectText = self.getTextRect(painter, text)
-                    rectText.moveCenter(QPointF(rect.center().x(), rectSpinner.top()-3*rectText.height()))
-                    painter.drawText(rectText, text)
-
-                    text = f'Disconnected {day} at {timer.disconnected_time.strftime("%H:%M:%S")} ({self.interval2string(datetime.now() - timer.disconnected_time)})'
-                    rectText = self.getTextRect(painter, text)
-                    rectText.moveCenter(QPointF(rect.center().x(), rectSpinner.top()-2*rectText.height()))
-                    painter.drawText(rectText, text)
-
-                    text = f'Next reconnect attempt in {int(timer.remainingTime()/1000)} seconds'
-                    rectText = self.getTextRect(painter, text)
-                    rectText.moveCenter(QPointF(rectSpinner.center().x(), rectSpinner.top()-rectText.height()))
-                    painter.drawText(rectText, text)
-
-                    if self.isFocusedURI(timer.uri) and rect.isValid():
-                        painter.setPen(QColorConstants.White)
-                        painter.drawRect(rect.adjusted(1, 1, -2, -2))
-
-                    timer.unlock()
+                    with timer.thread_lock:
+                        changed = True
+                        rect = self.mw.pm.displayRect(timer.uri, self.size())
+                        self.clearRect(painter, rect)
+                        region = QRectF(rect)
+                        painter.setPen(QColorConstants.LightGray)
+                        rectSpinner = QRectF(0, 0, 40, 40)
+                        rectSpinner.moveCenter(rect.center())
+                        painter.drawImage(rectSpinner, self.spinner.currentImage())
+
+                        day = timer.disconnected_time.strftime("%m/%d/%Y")
+                        if day == datetime.now().strftime("%m/%d/%Y"):
+                            day = "today"
+
+                        text = f'{self.mw.getCameraName(timer.uri)}'
+                        rectText = self.getTextRect(painter, text)
+                        rectText.moveCenter(QPointF(rect.center().x(), rectSpinner.top()-3*rectText.height()))
+                        painter.drawText(rectText, text)
+                        region = region.united(rectText)
+
+                        text = f'Disconnected {day} at {timer.disconnected_time.strftime("%H:%M:%S")} ({self.interval2string(datetime.now() - timer.disconnected_time)})'
+                        rectText = self.getTextRect(painter, text)
+                        rectText.moveCenter(QPointF(rect.center().x(), rectSpinner.top()-2*rectText.height()))
+                        painter.drawText(rectText, text)
+                        region = region.united(rectText)
+
+                        text = f'Next reconnect attempt in {int(timer.remainingTime()/1000)} seconds'
+                        rectText = self.getTextRect(painter, text)
+                        rectText.moveCenter(QPointF(rectSpinner.center().x(), rectSpinner.top()-rectText.height()))
+                        painter.drawText(rectText, text)
+                        region = region.united(rectText)
+
+                        if self.isFocusedURI(timer.uri) and rect.isValid():
+                            painter.setPen(QColorConstants.White)
+                            painter.drawRect(rect.adjusted(1, 1, -2, -2))
+
+                        self.overlays.append(region.adjusted(-1, -1, 1, 1))
 
             self.alarmBroadcast()
+            return changed
         
         except BaseException as ex:
             logger.error(f'GLWidget onPaint exception: {str(ex)}')
+            self.tiles = None
+            return True
+
+    def drawTile(self, painter, player, rect, state):
+        x = rect.x()
+        y = rect.y()
+        w = rect.width()
+        h = rect.height()
+
+        self.clearRect(painter, rect)
+        if not self.renderer:
+            painter.drawImage(rect, player.image)
+
+        blinker = state[4]
+        b = 26
+        rectBlinker = QRectF(0, 0, b, b)
+        rectBlinker.moveCenter(QPointF(x+w-b, y+h-b))
+        if isinstance(blinker, QMovie):
+            painter.drawImage(rectBlinker, blinker.currentImage())
+        elif blinker:
+            painter.drawImage(rectBlinker, QImage(blinker))
+
+        if self.isFocusedURI(player.uri):
+            painter.setPen(QColorConstants.White)
+            painter.drawRect(rect.adjusted(1, 1, -2, -2))
+
+        if player.packet_drop_frame_counter > 0:
+            pen = QPen(QColorConstants.Yellow)
+            pen.setWidth(3)
+            painter.setPen(pen)
+            painter.drawRect(rect.adjusted(3, 3, -5, -5))
+
+        show = state[6]
+
+        # detector regions of interest are kept in fractions of the frame
+        regions = getattr(player.videoModelSettings, "regions", None)
+        if show and regions and player.analyze_video:
+            pen = QPen(QColorConstants.DarkYellow)
+            pen.setStyle(Qt.PenStyle.DashLine)
+            painter.setPen(pen)
+            for rx, ry, rw, rh in regions:
+                painter.drawRect(QRectF(x + rx * w, y + ry * h, rw * w, rh * h))
+
+        # motion zones are outlined in red while their level is over the alarm limit
+        zones = getattr(player.videoModelSettings, "zones", None)
+        if zones and player.analyze_video:
+            for i, zone in enumerate(zones):
+                alarming = i < len(player.zone_levels) and player.zone_levels[i] > 1.0
+                painter.setPen(QColorConstants.Red if alarming else QColorConstants.DarkCyan)
+                painter.drawPolygon(QPolygonF([QPointF(x + zx * w, y + zy * h) for zx, zy in zone]))
+
+        if show and len(player.boxes) and player.analyze_video:
+            if player.remote_width:
+                scalex = w / player.remote_width
+            else:
+                scalex = w / player.image.rect().width()
+
+            if player.remote_height:
+                scaley = h / player.remote_height
+            else:
+                scaley = h / player.image.rect().height()
+
+            painter.setPen(QColorConstants.Red)
+            for box in player.boxes:
+                p = (box[0] * scalex + x)
+                q = (box[1] * scaley + y)
+                r = (box[2] - box[0]) * scalex
+                s = (box[3] - box[1]) * scaley
+                painter.drawRect(QRectF(p, q, r, s))
 
     def getTextRect(self, painter, text):
         # to get exact bounding box, first estimate
@@ -0,0 +1,99 @@
+#/********************************************************************
+# libonvif/onvif-gui/gui/locks.py 
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import time
+import threading
+import weakref
+
+class TimedLock():
+    # Lock that keeps count of how often it had to be waited for and for how
+    # long.  The uncontended path is a single non blocking acquire, only a
+    # thread that finds the lock taken reads the clock.  Use as a context
+    # manager, or acquire and release in a try / finally.
+    #
+    #   name      - shown in the statistics
+    #   reentrant - the owning thread may acquire the lock again
+    #   timeout   - default seconds to wait in acquire, -1 waits forever
+
+    locks = weakref.WeakSet()
+
+    def __init__(self, name, reentrant=False, timeout=-1):
+        self.name = name
+        self.timeout = timeout
+        self.mutex = threading.RLock() if reentrant else threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        TimedLock.locks.add(self)
+
+    def acquire(self, timeout=None):
+        # returns False if the lock could not be taken within the timeout
+        if self.mutex.acquire(blocking=False):
+            self.acquisitions += 1
+            return True
+
+        start = time.monotonic()
+        if not self.mutex.acquire(timeout=self.timeout if timeout is None else timeout):
+            self.timeouts += 1
+            return False
+        wait = time.monotonic() - start
+        self.acquisitions += 1
+        self.contended += 1
+        self.wait_time += wait
+        self.max_wait = max(self.max_wait, wait)
+        return True
+
+    def release(self):
+        self.mutex.release()
+
+    def __enter__(self):
+        self.acquire(-1)
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def reset(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    def __str__(self):
+        result = f'{self.name}: {self.acquisitions} acquired, {self.contended} contended'
+        if self.contended:
+            result += f', wait {1000 * self.wait_time / self.contended:.2f} ms average {1000 * self.max_wait:.2f} ms max'
+        if self.timeouts:
+            result += f', {self.timeouts} timed out'
+        return result
+
+def lock_stats(contended_only=True):
+    # one line per lock, locks of the same name are added together
+    totals = {}
+    for lock in list(TimedLock.locks):
+        total = totals.setdefault(lock.name, TimedLock(lock.name))
+        total.acquisitions += lock.acquisitions
+        total.contended += lock.contended
+        total.timeouts += lock.timeouts
+        total.wait_time += lock.wait_time
+        total.max_wait = max(total.max_wait, lock.max_wait)
+    return "\n".join([str(total) for total in totals.values() if total.contended or not contended_only])
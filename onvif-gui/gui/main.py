@@ -51,6 +51,9 @@ from gui.manager import Manager
 from gui.player import Player
 from gui.onvif import StreamState
 from gui.protocols import ServerProtocols, ClientProtocols, ListenProtocols
+from gui.analysis import AnalysisPool, AudioPool
+from gui.locks import TimedLock, lock_stats
+from gui.framebuffer import FramePool
 import avio
 import kankakee
 import platform
@@ -78,7 +81,7 @@ class Timer(QTimer):
         self.size = None
         self.attempting_reconnect = False
         self.disconnected_time = None
-        self.thread_lock = False
+        self.thread_lock = TimedLock("timer")
         self.timeout.connect(self.createPlayer)
         self.signals.timeoutPlayer.connect(mw.playMedia)
         self.start(10000)
@@ -90,14 +93,12 @@ class Timer(QTimer):
         s += "\nisActive: " + str(self.isActive())
         return s
     
-    def lock(self):
+    def lock(self, timeout=None):
         # lock protects timer spinner render
-        while self.thread_lock:
-            sleep(0.001)
-        self.thread_lock = True
+        return self.thread_lock.acquire(timeout)
 
     def unlock(self):
-        self.thread_lock = False
+        self.thread_lock.release()
         
     def createPlayer(self):
         self.signals.timeoutPlayer.emit(self.uri)
@@ -139,6 +140,7 @@ class MainWindowSignals(QObject):
     progress = pyqtSignal(float, str)
     error = pyqtSignal(str)
     reconnect = pyqtSignal(str)
+    restart = pyqtSignal(str, float)
     stopReconnect = pyqtSignal(str)
     setTabIndex = pyqtSignal(int)
     showWaitDialog = pyqtSignal()
@@ -162,7 +164,6 @@ class MainWindow(QMainWindow):
         self.focus_window = None
         self.external_windows = []
         self.audioStatus = avio.AudioStatus.UNINITIALIZED
-        self.audioLock = False
         self.mediamtx_process = None
         self.viewer_cameras_filled = False
         self.alarm_ordinals = {}
@@ -187,6 +188,9 @@ class MainWindow(QMainWindow):
 
         self.pm = Manager(self)
         self.timers = {}
+        self.analysisPool = AnalysisPool(self)
+        self.audioPool = AudioPool(self)
+        self.framePool = FramePool()
 
         self.proxies = {}
         self.proxy = None
@@ -216,6 +220,7 @@ class MainWindow(QMainWindow):
         self.audioPanel = AudioPanel(self)
         self.signals.error.connect(self.onError)
         self.signals.reconnect.connect(self.startReconnectTimer)
+        self.signals.restart.connect(self.restartMedia)
         self.signals.stopReconnect.connect(self.stopReconnectTimer)
         self.signals.showWaitDialog.connect(self.showWaitDialog)
         self.signals.hideWaitDialog.connect(self.hideWaitDialog)
@@ -317,13 +322,12 @@ class MainWindow(QMainWindow):
                 if player.isCameraStream():
                     player.clearCache()
 
+        result = None
         if self.videoWorker:
             # motion detector has the option to return the diff frame for viewing
             result = self.videoWorker(frame, player)
-            if result is not None:
-                frame = result
 
-        return frame
+        return result
 
     def loadAudioConfigure(self, workerName):
         spec = importlib.util.spec_from_file_location("AudioConfigure", self.audioPanel.stdLocation + "/" + workerName)
@@ -337,27 +341,8 @@ class MainWindow(QMainWindow):
     
     def pyAudioCallback(self, frame, player):
         if player.analyze_audio:
-
-            while self.audioLock:
-                sleep(0.001)
-            self.audioLock = True
-
-            if self.audioWorkerHook is None:
-                workerName = self.audioPanel.cmbWorker.currentText()
-                spec = importlib.util.spec_from_file_location("AudioWorker", self.audioPanel.stdLocation + "/" + workerName)
-                self.audioWorkerHook = importlib.util.module_from_spec(spec)
-                sys.modules["AudioWorker"] = self.audioWorkerHook
-                spec.loader.exec_module(self.audioWorkerHook)
-                self.audioWorker = None
-
-            if self.audioWorkerHook:
-                if not self.audioWorker:
-                    self.audioWorker = self.audioWorkerHook.AudioWorker(self)
-                
-            if self.audioWorker:
-                self.audioWorker(frame, player)
-            
-            self.audioLock = False
+            # analysis runs on the audio pool, the decoder thread returns right away
+            self.audioPool.submit(frame, player)
 
         else:
             if player.uri == self.glWidget.focused_uri:
@@ -365,6 +350,22 @@ class MainWindow(QMainWindow):
                     self.audioWorker(None, None)
 
         return frame
+
+    def pyAudioAnalysis(self, frame, player):
+        if self.audioWorkerHook is None:
+            workerName = self.audioPanel.cmbWorker.currentText()
+            spec = importlib.util.spec_from_file_location("AudioWorker", self.audioPanel.stdLocation + "/" + workerName)
+            self.audioWorkerHook = importlib.util.module_from_spec(spec)
+            sys.modules["AudioWorker"] = self.audioWorkerHook
+            spec.loader.exec_module(self.audioWorkerHook)
+            self.audioWorker = None
+
+        if self.audioWorkerHook:
+            if not self.audioWorker:
+                self.audioWorker = self.audioWorkerHook.AudioWorker(self)
+
+        if self.audioWorker:
+            self.audioWorker(frame, player)
     
     def playMedia(self, uri, alarm_sound=False, file_start_from_seek=-1.0):
 
@@ -389,7 +390,6 @@ class MainWindow(QMainWindow):
         player.file_start_from_seek = file_start_from_seek
 
         player.pyAudioCallback = self.pyAudioCallback
-        player.video_filter = "format=rgb24"
         player.packetDrop = self.packetDrop
         player.renderCallback = self.glWidget.renderCallback
         player.mediaPlayingStarted = self.mediaPlayingStarted
@@ -438,8 +438,55 @@ class MainWindow(QMainWindow):
                 player.analyze_audio = self.filePanel.getAnalyzeAudio()
                 player.progressCallback = self.mediaProgress
 
+        player.decode_size = self.decodeSize(player)
+        player.video_filter = self.videoFilter(player.decode_size)
         self.pm.startPlayer(player)
 
+    def restartMedia(self, uri, file_start_from_seek):
+        self.playMedia(uri, file_start_from_seek=file_start_from_seek)
+
+    def decodeSize(self, player):
+        # With decode scaling the decoder scales each stream to the size of its tile, so the
+        # rgb conversion and every copy after it handle the smaller picture.  Returns the bound
+        # on the picture in device pixels, or None to decode at the source size.  Analysis
+        # modules that need the full picture set full_resolution on their configure panel,
+        # files they analyze and all cameras are then left at the source size, a camera is
+        # not restarted when its analysis is switched on.
+        if not self.settingsPanel.general.chkDecodeScale.isChecked() or player.disable_video:
+            return None
+        if getattr(self.videoConfigure, "full_resolution", False):
+            if player.analyze_video or player.isCameraStream():
+                return None
+
+        num_cells = len(self.pm.getUniqueOrdinals())
+        if not any(uri in self.pm.ordinals for uri in [player.uri] + self.pm.getStreamPairURIs(player.uri)):
+            num_cells += 1
+        size = self.pm.cellSize(self.glWidget.size(), num_cells) * self.glWidget.devicePixelRatioF()
+        return max(size.width() // 2 * 2, 2), max(size.height() // 2 * 2, 2)
+
+    def videoFilter(self, decode_size):
+        if decode_size is None:
+            return "format=rgb24"
+        # the size is a bound, the picture keeps its aspect ratio and is never enlarged
+        w, h = decode_size
+        return f"scale=w='min(iw,{w})':h='min(ih,{h})':force_original_aspect_ratio=decrease:force_divisible_by=2,format=rgb24"
+
+    def refreshDecodeSizes(self):
+        # The filter of a player is fixed when it starts, so a file whose tile or analysis
+        # changed is started again from where it was.  Small changes are let go, as the
+        # size of a scaled stream feeds back into the layout.  Cameras keep their size
+        # until they reconnect rather than drop their connection.
+        for player in self.pm.players:
+            if player.isCameraStream() or not player.running or player.request_reconnect:
+                continue
+            size = self.decodeSize(player)
+            if size == player.decode_size:
+                continue
+            if size and player.decode_size:
+                if all(abs(a - b) <= 0.1 * b for a, b in zip(size, player.decode_size)):
+                    continue
+            player.requestShutdown(reconnect=True)
+
     def keyPressEvent(self, event):
         match event.key():
             case Qt.Key.Key_Escape:
@@ -523,8 +570,7 @@ class MainWindow(QMainWindow):
                         logger.debug(f'{name} was removed from the list after failing orderly shutdown')
                     break
 
-            self.pm.ordinals.clear()
-            self.pm.sizes.clear()
+            self.pm.clearKeys()
 
             if not self.closing:
                 self.cameraPanel.syncGUI()
@@ -539,6 +585,12 @@ class MainWindow(QMainWindow):
         try:
             self.closing = True
             self.closeAllStreams()
+            self.analysisPool.stop()
+            self.audioPool.stop()
+            if stats := lock_stats():
+                logger.debug(f'Lock contention\n{stats}')
+            if self.audioPool.dropped:
+                logger.debug(str(self.audioPool))
             self.stopProxyServer()
             self.stopOnvifServer()
 
@@ -613,18 +665,22 @@ class MainWindow(QMainWindow):
 
     def stopReconnectTimer(self, uri):
         if timer := self.timers.get(uri, None):
-            timer.lock()
-            timer.stop()
-            timer.unlock()
+            with timer.thread_lock:
+                timer.stop()
 
     def mediaPlayingStopped(self, uri):
         if player := self.pm.getPlayer(uri):
             self.pm.removePlayer(uri)
+            self.analysisPool.discard(player)
+            self.audioPool.discard(player)
+            player.releaseFrames()
 
             if player.request_reconnect:
                 if camera := self.cameraPanel.getCamera(uri):
                     logger.debug(f'Camera stream closed with reconnect requested {self.getCameraName(uri)}')
                     self.signals.reconnect.emit(uri)
+                elif not self.isCameraStreamURI(uri):
+                    self.signals.restart.emit(uri, player.file_progress)
             else:
                 if self.isCameraStreamURI(uri):
                     logger.debug(f'Stream closed {self.getCameraName(uri)}')
@@ -17,100 +17,139 @@
 #
 #*********************************************************************/
 
+import math
 from time import sleep
 from loguru import logger
+from gui.locks import TimedLock
 from PyQt6.QtCore import QRectF, QSize, Qt, QSizeF, QPointF
 import sys
 
 class Manager():
+    # Players are kept in dictionaries by uri and by camera serial number,
+    # and the uris of each display ordinal are indexed alongside the ordinals,
+    # so lookups cost the same for any number of streams.  The players
+    # property is a tuple rebuilt only when a player is added or removed,
+    # painters can iterate it while other threads change the registry.
+
     def __init__(self, mw):
-        self.players = []
+        self.player_map = {}
+        self.serial_map = {}
+        self.serials = {}
+        self.snapshot = ()
         self.ordinals = {}
+        self.ordinal_map = {}
         self.sizes = {}
-        self.thread_lock = False
+        self.layout = (None, {})
+        self.layout_version = 0
+        self.thread_lock = TimedLock("players")
         self.mw = mw
         self.auto_start_mode = False
 
-    def lock(self):
+    def lock(self, timeout=None):
         # the lock protects the player list
-        while self.thread_lock:
-            sleep(0.001)
-        self.thread_lock = True
+        return self.thread_lock.acquire(timeout)
 
     def unlock(self):
-        self.thread_lock = False
+        self.thread_lock.release()
+
+    @property
+    def players(self):
+        return self.snapshot
+
+    def register(self, player):
+        self.player_map[player.uri] = player
+        if player.isCameraStream():
+            if camera := self.mw.cameraPanel.getCamera(player.uri):
+                self.serials[player.uri] = camera.serial_number()
+                self.serial_map.setdefault(camera.serial_number(), {})[player.uri] = player
+        self.snapshot = tuple(self.player_map.values())
+
+    def unregister(self, uri):
+        player = self.player_map.pop(uri, None)
+        if (serial_number := self.serials.pop(uri, None)) is not None:
+            if players := self.serial_map.get(serial_number):
+                players.pop(uri, None)
+                if not players:
+                    del self.serial_map[serial_number]
+        self.snapshot = tuple(self.player_map.values())
+        return player
+
+    def setOrdinal(self, uri, ordinal):
+        if (current := self.ordinals.get(uri)) is not None:
+            self.dropOrdinal(uri, current)
+        self.ordinals[uri] = ordinal
+        self.ordinal_map.setdefault(ordinal, {})[uri] = True
+        self.layout_version += 1
+
+    def dropOrdinal(self, uri, ordinal):
+        if uris := self.ordinal_map.get(ordinal):
+            uris.pop(uri, None)
+            if not uris:
+                del self.ordinal_map[ordinal]
 
     def startPlayer(self, player):
-        self.lock()
-        if not player.disable_video:
-            if not player.uri in self.ordinals.keys():
-                ordinal = self.getOrdinal()
-                if player.isCameraStream():
-                    camera = self.mw.cameraPanel.getCamera(player.uri)
-                    if camera:
-                        if self.auto_start_mode and camera.ordinal > -1:
-                            duplicate = False
-                            keys = self.ordinals.keys()
-                            for key in keys:
-                                c = self.mw.cameraPanel.getCamera(key)
-                                if camera.ordinal == self.ordinals[key] and camera.serial_number() != c.serial_number():
-                                    duplicate = True
-                            if duplicate:
-                                camera.ordinal = ordinal
+        with self.thread_lock:
+            if not player.disable_video:
+                if not player.uri in self.ordinals.keys():
+                    ordinal = self.getOrdinal()
+                    if player.isCameraStream():
+                        camera = self.mw.cameraPanel.getCamera(player.uri)
+                        if camera:
+                            if self.auto_start_mode and camera.ordinal > -1:
+                                duplicate = False
+                                keys = self.ordinals.keys()
+                                for key in keys:
+                                    c = self.mw.cameraPanel.getCamera(key)
+                                    if camera.ordinal == self.ordinals[key] and camera.serial_number() != c.serial_number():
+                                        duplicate = True
+                                if duplicate:
+                                    camera.ordinal = ordinal
+                                else:
+                                    ordinal = camera.ordinal
                             else:
-                                ordinal = camera.ordinal
-                        else:
-                            comp_uri = camera.companionURI(player.uri)
-                            if comp_uri:
-                                if comp_uri in self.ordinals.keys():
-                                    ordinal = self.ordinals[comp_uri]
-                            camera.setOrdinal(ordinal)
+                                comp_uri = camera.companionURI(player.uri)
+                                if comp_uri:
+                                    if comp_uri in self.ordinals.keys():
+                                        ordinal = self.ordinals[comp_uri]
+                                camera.setOrdinal(ordinal)
 
-                self.ordinals[player.uri] = ordinal
+                    self.setOrdinal(player.uri, ordinal)
 
-        self.players.append(player)
-        player.start()
-        self.unlock()
+            self.register(player)
+            player.start()
 
     def getUniqueOrdinals(self):
-        result = []
-        values = self.ordinals.values()
-        for value in values:
-            if value not in result:
-                result.append(value)
-        return result
+        return list(self.ordinal_map.keys())
 
     def getOrdinal(self):
         ordinal = -1
 
-        values = self.getUniqueOrdinals()
-        for i in range(len(values)):
-            if not i in values:
+        count = len(self.ordinal_map)
+        for i in range(count):
+            if not i in self.ordinal_map:
                 ordinal = i
                 break
 
         if ordinal == -1:
-            ordinal = len(values)
+            ordinal = count
 
         return ordinal
         
     def getPlayer(self, uri):
-        result = None
-        if uri:
-            for player in self.players:
-                if player.uri == uri:
-                    result = player
-                    break
-        return result
+        if not uri:
+            return None
+        return self.player_map.get(uri)
     
     def getPlayerByOrdinal(self, ordinal):
         result = None
-        for key, value in self.ordinals.items():
-            if value == ordinal:
-                result = self.getPlayer(key)
+        for uri in list(self.ordinal_map.get(ordinal, ())):
+            if result := self.player_map.get(uri):
                 break
         return result
 
+    def getPlayersBySerialNumber(self, serial_number):
+        return list(self.serial_map.get(serial_number, {}).values())
+
     def getCurrentPlayer(self):
         return self.getPlayer(self.mw.glWidget.focused_uri)
     
@@ -156,26 +195,31 @@ class Manager():
     
     def removeKeys(self, uri):
         if uri in self.ordinals.keys():
-            del self.ordinals[uri]
+            self.dropOrdinal(uri, self.ordinals.pop(uri))
         if uri in self.sizes.keys():
             del self.sizes[uri]
+        self.layout_version += 1
+
+    def clearKeys(self):
+        self.ordinals.clear()
+        self.ordinal_map.clear()
+        self.sizes.clear()
+        self.layout_version += 1
+
+    def setSize(self, uri, size):
+        # the layout only has to be recomputed when a stream changes size
+        if self.sizes.get(uri) != size:
+            self.sizes[uri] = size
+            self.layout_version += 1
     
     def removePlayer(self, uri):
-        self.lock()
-
-        remove_idx = -1
-        for idx, player in enumerate(self.players):
-            if player.uri == uri:
-                remove_idx = idx
-                break
-        if remove_idx > -1:
-            if not self.players[remove_idx].request_reconnect:
-                self.removeKeys(uri)
-            while self.players[remove_idx].thread_lock:
-                sleep(0.001)
-            self.players.pop(idx)
-
-        self.unlock()
+        with self.thread_lock:
+            if player := self.player_map.get(uri):
+                if not player.request_reconnect:
+                    self.removeKeys(uri)
+                # wait for anyone still working on the player image
+                with player.thread_lock:
+                    self.unregister(uri)
 
     def playerShutdownWait(self, uri):
         player = self.getPlayer(uri)
@@ -211,16 +255,18 @@ class Manager():
 
         return highest_count_key
     
-    def computeRowsCols(self, size_canvas, aspect_ratio):
+    def computeRowsCols(self, size_canvas, aspect_ratio, num_cells=None):
 
-        num_cells = len(self.getUniqueOrdinals())
+        if num_cells is None:
+            num_cells = len(self.getUniqueOrdinals())
 
+        # for i rows the only column count that fits without a spare column is
+        # ceil(num_cells / i), the layout is kept if it has no spare row either
         valid_layouts = []
         for i in range(1, num_cells+1):
-            for j in range(num_cells, 0, -1):
-                if ((i * j) >= num_cells):
-                    if (((i-1)*j) < num_cells) and ((i*(j-1)) < num_cells):
-                        valid_layouts.append(QSize(i, j))
+            j = -(-num_cells // i)
+            if ((i-1)*j) < num_cells:
+                valid_layouts.append(QSize(i, j))
 
         index = -1
         min_ratio = 0
@@ -243,24 +289,52 @@ class Manager():
         
         return valid_layouts[index].width(), valid_layouts[index].height()
 
+    def cellSize(self, canvas_size, num_cells):
+        # size of a grid cell when the canvas holds num_cells streams
+        ar = self.getMostCommonAspectRatio()
+        if ar <= 0:
+            ar = 1778
+        num_rows, num_cols = self.computeRowsCols(canvas_size, ar / 1000, num_cells)
+        if num_cols == 0:
+            return QSize(canvas_size)
+        composite_size = QSizeF(num_cols * ar / 1000, num_rows)
+        composite_size.scale(QSizeF(canvas_size), Qt.AspectRatioMode.KeepAspectRatio)
+        return QSize(math.ceil(composite_size.width() / num_cols), math.ceil(composite_size.height() / num_rows))
+
     def displayRect(self, uri, canvas_size):
+        # The rects of all tiles are computed together and kept until the canvas size,
+        # the ordinals or the stream sizes change, so a paint looks each tile up.  The
+        # render callbacks, the analysis workers and the gui thread all call in here, a
+        # new layout is built aside and published with its key in a single assignment,
+        # so a reader sees either the old layout or the complete new one.
+        key, rects = self.layout
+        if key != (canvas_size.width(), canvas_size.height(), self.layout_version):
+            rects = self.buildLayout(canvas_size)
+            # tileRect may move ordinals, the layout is keyed on the version it ended with
+            self.layout = ((canvas_size.width(), canvas_size.height(), self.layout_version), rects)
+        if rect := rects.get(uri):
+            return QRectF(rect)
+        return QRectF(QPointF(0, 0), QSizeF(canvas_size))
+
+    def buildLayout(self, canvas_size):
+        rects = {}
         ar = self.getMostCommonAspectRatio()
         num_rows, num_cols = self.computeRowsCols(canvas_size, ar / 1000)
         if num_cols == 0:
-            return QRectF(QPointF(0, 0), QSizeF(canvas_size))
+            return rects
 
-        ordinal = -1
-        if uri in self.ordinals.keys():
-            ordinal = self.ordinals[uri]
-        else:
-            return QRectF(QPointF(0, 0), QSizeF(canvas_size))
+        for uri in list(self.ordinals.keys()):
+            rects[uri] = self.tileRect(uri, canvas_size, ar, num_rows, num_cols)
+        return rects
 
+    def tileRect(self, uri, canvas_size, ar, num_rows, num_cols):
+        ordinal = self.ordinals[uri]
         if ordinal > num_rows * num_cols - 1:
             ordinal = self.getOrdinal()
             uris = self.getStreamPairURIs(uri)
             for u in uris:
                 if u in self.ordinals.keys():
-                    self.ordinals[u] = ordinal
+                    self.setOrdinal(u, ordinal)
         
         col = ordinal % num_cols
         row = int(ordinal / num_cols)
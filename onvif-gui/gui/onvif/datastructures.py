@@ -139,14 +139,14 @@ class Camera(QListWidgetItem):
 
     def isRunning(self):
         result = False
-        players = self.mw.pm.getStreamPairPlayers(self.uri())
+        players = self.mw.pm.getPlayersBySerialNumber(self.serial_number())
         if len(players):
             result = True
         return result
     
     def isRecording(self):
         result = False
-        players = self.mw.pm.getStreamPairPlayers(self.uri())
+        players = self.mw.pm.getPlayersBySerialNumber(self.serial_number())
         for player in players:
             if player.isRecording():
                 result = True
@@ -154,7 +154,7 @@ class Camera(QListWidgetItem):
     
     def isAlarming(self):
         result = False
-        players = self.mw.pm.getStreamPairPlayers(self.uri())
+        players = self.mw.pm.getPlayersBySerialNumber(self.serial_number())
         for player in players:
             if player.alarm_state:
                 result = True
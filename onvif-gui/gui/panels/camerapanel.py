@@ -29,6 +29,7 @@ from loguru import logger
 import libonvif as onvif
 import pathlib
 from gui.enums import ProxyType
+from gui.locks import TimedLock
 
 class CameraList(QListWidget):
     def __init__(self, mw):
@@ -83,6 +84,7 @@ class CameraList(QListWidget):
                     camera = self.takeItem(row)
                     for profile in camera.profiles:
                         self.mw.proxies.pop(profile.stream_uri(), None)
+                    self.mw.cameraPanel.indexCameras()
 
                     if self.mw.settingsPanel.proxy.proxyType == ProxyType.SERVER:
                         self.mw.settingsPanel.proxy.setMediaMTXProxies()
@@ -153,7 +155,12 @@ class CameraPanel(QWidget):
         self.mw = mw
         self.dlgLogin = LoginDialog(self)
         self.fillers = []
-        self.sync_lock = False
+        # reentrant, a nested call from the gui thread must not block itself
+        self.sync_lock = TimedLock("sync", reentrant=True)
+        self.uri_index = {}
+        self.serial_index = {}
+        self.xaddrs_index = {}
+        self.index_misses = set()
 
         self.autoTimeSyncer = None
         self.enableAutoTimeSync(self.mw.settingsPanel.general.chkAutoTimeSync.isChecked())
@@ -423,6 +430,7 @@ class CameraPanel(QWidget):
                 self.mw.addCameraProxy(camera)
                 self.lstCamera.addItem(camera)
                 self.lstCamera.sortItems()
+                self.indexCameras()
                 camera.setDisplayProfile(camera.getDisplayProfileSetting())
                 logger.debug(f'Discovery completed for Camera: {onvif_data.alias}, Stream URI: {onvif_data.stream_uri()}, xaddrs: {onvif_data.xaddrs()}')
 
@@ -456,6 +464,7 @@ class CameraPanel(QWidget):
                 existing.onvif_data.setXAddrs(onvif_data.xaddrs())
                 for profile in existing.profiles:
                     profile.setXAddrs(onvif_data.xaddrs())
+                self.indexCameras()
                 existing.onvif_data.startFill(synchronizeTime)
         else:
             camera = Camera(onvif_data, self.mw)
@@ -465,6 +474,7 @@ class CameraPanel(QWidget):
             
             self.lstCamera.addItem(camera)
             self.lstCamera.sortItems()
+            self.indexCameras()
             camera.setDisplayProfile(camera.getDisplayProfileSetting())
             self.saveCameraList()
             logger.debug(f'Discovery completed for Camera: {onvif_data.alias}, Stream URI: {onvif_data.stream_uri()}, xaddrs: {onvif_data.xaddrs()}, {onvif_data.camera_name()}')
@@ -486,6 +496,7 @@ class CameraPanel(QWidget):
             if camera.manual_fill:
                 camera.assignData(onvif_data)
                 self.mw.addCameraProxy(camera)
+                self.indexCameras()
                 camera.setDisplayProfile(camera.getDisplayProfileSetting())
 
             if self.lstCamera is not None:
@@ -679,81 +690,76 @@ class CameraPanel(QWidget):
 
     def syncGUI(self):
 
-        while (self.sync_lock):
-            sleep(0.001)
-        self.sync_lock = True
-        
-        if camera := self.getCurrentCamera():
-            self.btnStop.setEnabled(True)
-            if player := self.mw.pm.getPlayer(camera.uri()):
-                self.btnStop.setStyleSheet(self.getButtonStyle("stop"))
-                if player.running:
-                    self.tabVideo.btnSnapshot.setEnabled(True)
-
-                if ps := player.systemTabSettings:
-                    self.btnRecord.setEnabled(not (ps.record_enable and ps.record_always))
-
-                if player.hasAudio() and not player.disable_audio:
-                    self.btnMute.setEnabled(True)
-                    self.sldVolume.setEnabled(True)
-                    self.sldVolume.setValue(camera.volume)
-                    if camera.mute:
-                        self.btnMute.setStyleSheet(self.getButtonStyle("mute"))
-                    else:
-                        self.btnMute.setStyleSheet(self.getButtonStyle("audio"))
-                else:
-                    self.btnMute.setEnabled(False)
-                    self.sldVolume.setEnabled(False)
-
-                self.btnRecord.setEnabled(True)
-                if camera.isRecording():
-                    self.btnRecord.setStyleSheet(self.getButtonStyle("recording"))
-                    record_always = player.systemTabSettings.record_always if player.systemTabSettings else False
-                    record_alarm = player.systemTabSettings.record_alarm if player.systemTabSettings else False
-                    record_enable = player.systemTabSettings.record_enable if player.systemTabSettings else False
-                    if record_enable and ((camera.isAlarming() and record_alarm) or record_always):
-                        self.btnRecord.setEnabled(False)
-                else:
-                    self.btnRecord.setStyleSheet(self.getButtonStyle("record"))
-            else:
-                reconnecting = False
-                self.tabVideo.btnSnapshot.setEnabled(False)
-                timers = self.mw.pm.getStreamPairTimers(camera.uri())
-                for timer in timers:
-                    if timer.isActive():
-                        reconnecting = True
-                
-                if reconnecting:
+        with self.sync_lock:
+            if camera := self.getCurrentCamera():
+                self.btnStop.setEnabled(True)
+                if player := self.mw.pm.getPlayer(camera.uri()):
                     self.btnStop.setStyleSheet(self.getButtonStyle("stop"))
-                else:
-                    self.btnStop.setStyleSheet(self.getButtonStyle("play"))
-                    self.setTabsEnabled(True)
+                    if player.running:
+                        self.tabVideo.btnSnapshot.setEnabled(True)
 
-                if profile := camera.getProfile(camera.uri()):
-                    if camera.mute:
-                        self.btnMute.setStyleSheet(self.getButtonStyle("mute"))
-                    else:
-                        self.btnMute.setStyleSheet(self.getButtonStyle("audio"))
+                    if ps := player.systemTabSettings:
+                        self.btnRecord.setEnabled(not (ps.record_enable and ps.record_always))
 
-                    if profile.audio_bitrate() and not profile.getDisableAudio():
+                    if player.hasAudio() and not player.disable_audio:
                         self.btnMute.setEnabled(True)
                         self.sldVolume.setEnabled(True)
+                        self.sldVolume.setValue(camera.volume)
+                        if camera.mute:
+                            self.btnMute.setStyleSheet(self.getButtonStyle("mute"))
+                        else:
+                            self.btnMute.setStyleSheet(self.getButtonStyle("audio"))
                     else:
                         self.btnMute.setEnabled(False)
                         self.sldVolume.setEnabled(False)
 
+                    self.btnRecord.setEnabled(True)
+                    if camera.isRecording():
+                        self.btnRecord.setStyleSheet(self.getButtonStyle("recording"))
+                        record_always = player.systemTabSettings.record_always if player.systemTabSettings else False
+                        record_alarm = player.systemTabSettings.record_alarm if player.systemTabSettings else False
+                        record_enable = player.systemTabSettings.record_enable if player.systemTabSettings else False
+                        if record_enable and ((camera.isAlarming() and record_alarm) or record_always):
+                            self.btnRecord.setEnabled(False)
+                    else:
+                        self.btnRecord.setStyleSheet(self.getButtonStyle("record"))
+                else:
+                    reconnecting = False
+                    self.tabVideo.btnSnapshot.setEnabled(False)
+                    timers = self.mw.pm.getStreamPairTimers(camera.uri())
+                    for timer in timers:
+                        if timer.isActive():
+                            reconnecting = True
+                
+                    if reconnecting:
+                        self.btnStop.setStyleSheet(self.getButtonStyle("stop"))
+                    else:
+                        self.btnStop.setStyleSheet(self.getButtonStyle("play"))
+                        self.setTabsEnabled(True)
+
+                    if profile := camera.getProfile(camera.uri()):
+                        if camera.mute:
+                            self.btnMute.setStyleSheet(self.getButtonStyle("mute"))
+                        else:
+                            self.btnMute.setStyleSheet(self.getButtonStyle("audio"))
+
+                        if profile.audio_bitrate() and not profile.getDisableAudio():
+                            self.btnMute.setEnabled(True)
+                            self.sldVolume.setEnabled(True)
+                        else:
+                            self.btnMute.setEnabled(False)
+                            self.sldVolume.setEnabled(False)
+
+                    self.btnRecord.setStyleSheet(self.getButtonStyle("record"))
+                    self.btnRecord.setEnabled(False)
+            else:
+                self.sldVolume.setEnabled(False)
+                self.btnMute.setStyleSheet(self.getButtonStyle("audio"))
+                self.btnMute.setEnabled(False)
                 self.btnRecord.setStyleSheet(self.getButtonStyle("record"))
                 self.btnRecord.setEnabled(False)
-        else:
-            self.sldVolume.setEnabled(False)
-            self.btnMute.setStyleSheet(self.getButtonStyle("audio"))
-            self.btnMute.setEnabled(False)
-            self.btnRecord.setStyleSheet(self.getButtonStyle("record"))
-            self.btnRecord.setEnabled(False)
-            self.btnStop.setStyleSheet(self.getButtonStyle("play"))
-            self.btnStop.setEnabled(False)
-
-        self.sync_lock = False
+                self.btnStop.setStyleSheet(self.getButtonStyle("play"))
+                self.btnStop.setEnabled(False)
 
 
     def getButtonStyle(self, name):
@@ -772,7 +778,41 @@ class CameraPanel(QWidget):
                 result = self.mw.pm.getPlayer(camera.uri())
         return result
 
+    def indexCameras(self):
+        # Rebuilds the lookup tables, called whenever cameras are added, removed or
+        # filled, or their stream uris change.  Earlier entries win, as in a scan.
+        uris, serials, xaddrs = {}, {}, {}
+        if self.lstCamera:
+            cameras = [self.lstCamera.item(x) for x in range(self.lstCamera.count())]
+            for camera in cameras:
+                for profile in camera.profiles:
+                    uris.setdefault(profile.uri(), camera)
+                uris.setdefault(camera.uri(), camera)
+                serials.setdefault(camera.serial_number(), camera)
+                xaddrs.setdefault(camera.xaddrs(), camera)
+        self.uri_index = uris
+        self.serial_index = serials
+        self.xaddrs_index = xaddrs
+        self.index_misses = set()
+
     def getCamera(self, uri):
+        # profile uris follow the proxy settings, an index entry is checked before it is
+        # trusted and a uri the index does not know is looked for in the list, only file
+        # uris are remembered as misses, a stream uri may belong to a camera not yet indexed
+        if camera := self.uri_index.get(uri):
+            if camera.uri() == uri or any(profile.uri() == uri for profile in camera.profiles):
+                return camera
+        elif uri in self.index_misses:
+            return None
+
+        camera = self.scanCamera(uri)
+        if camera:
+            self.indexCameras()
+        elif not self.mw.isCameraStreamURI(uri):
+            self.index_misses.add(uri)
+        return camera
+
+    def scanCamera(self, uri):
         result = None
         if self.lstCamera:
             cameras = [self.lstCamera.item(x) for x in range(self.lstCamera.count())]
@@ -794,24 +834,18 @@ class CameraPanel(QWidget):
         return result
     
     def getCameraBySerialNumber(self, serial_number):
-        result = None
-        if self.lstCamera:
-            cameras = [self.lstCamera.item(x) for x in range(self.lstCamera.count())]
-            for camera in cameras:
-                if camera.serial_number() == serial_number:
-                    result = camera
-                    break
-        return result
+        camera = self.serial_index.get(serial_number)
+        if camera and camera.serial_number() != serial_number:
+            self.indexCameras()
+            camera = self.serial_index.get(serial_number)
+        return camera
     
     def getCameraByXAddrs(self, xaddrs):
-        result = None
-        if self.lstCamera:
-            cameras = [self.lstCamera.item(x) for x in range(self.lstCamera.count())]
-            for camera in cameras:
-                if camera.xaddrs() == xaddrs:
-                    result = camera
-                    break
-        return result
+        camera = self.xaddrs_index.get(xaddrs)
+        if camera and camera.xaddrs() != xaddrs:
+            self.indexCameras()
+            camera = self.xaddrs_index.get(xaddrs)
+        return camera
     
     def getProfile(self, uri):
         result = None
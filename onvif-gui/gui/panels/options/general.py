@@ -309,8 +309,11 @@ class GeneralOptions(QWidget):
         self.alarmSoundVolumeKey = "settings/alarmSoundVolume"
         self.displayRefreshKey = "settings/displayRefresh"
         self.cacheMaxSizeKey = "settings/cacheMaxSize"
+        self.analysisLoadKey = "settings/analysisLoad"
         self.audioDriverIndexKey = "settings/audioDriverIndex"
         self.appearanceKey = "settings/appearance"
+        self.hardwareRenderKey = "settings/hardwareRender"
+        self.decodeScaleKey = "settings/decodeScale"
 
         decoders = ["NONE"]
         if sys.platform == "win32":
@@ -362,10 +365,20 @@ class GeneralOptions(QWidget):
         self.chkAutoTimeSync.setChecked(bool(int(mw.settings.value(self.autoTimeSyncKey, 0))))
         self.chkAutoTimeSync.stateChanged.connect(self.autoTimeSyncChecked)
 
+        self.chkHardwareRender = QCheckBox("Hardware Rendering")
+        self.chkHardwareRender.setChecked(bool(int(mw.settings.value(self.hardwareRenderKey, 1))))
+        self.chkHardwareRender.stateChanged.connect(self.hardwareRenderChecked)
+
+        self.chkDecodeScale = QCheckBox("Decode Streams at Tile Size")
+        self.chkDecodeScale.setChecked(bool(int(mw.settings.value(self.decodeScaleKey, 0))))
+        self.chkDecodeScale.stateChanged.connect(self.decodeScaleChecked)
+
         pnlChecks = QWidget()
         lytChecks = QGridLayout(pnlChecks)
         lytChecks.addWidget(self.chkStartFullScreen,  0, 0, 1, 1)
         lytChecks.addWidget(self.chkAutoTimeSync,     0, 1, 1, 1)
+        lytChecks.addWidget(self.chkHardwareRender,   0, 2, 1, 1)
+        lytChecks.addWidget(self.chkDecodeScale,      1, 0, 1, 2)
 
         self.spnDisplayRefresh = QSpinBox()
         self.spnDisplayRefresh.setMinimum(1)
@@ -386,6 +399,15 @@ class GeneralOptions(QWidget):
         self.spnCacheMax.valueChanged.connect(self.spnCacheMaxChanged)
         lblCacheMax = QLabel("Maximum Input Stream Cache Size")
 
+        self.spnAnalysisLoad = QSpinBox()
+        self.spnAnalysisLoad.setMinimum(10)
+        self.spnAnalysisLoad.setMaximum(100)
+        self.spnAnalysisLoad.setMaximumWidth(80)
+        self.spnAnalysisLoad.setValue(int(self.mw.settings.value(self.analysisLoadKey, 80)))
+        self.spnAnalysisLoad.valueChanged.connect(self.spnAnalysisLoadChanged)
+        self.mw.analysisPool.controller.target = self.spnAnalysisLoad.value() / 100
+        lblAnalysisLoad = QLabel("Analysis Load Target (%)")
+
         self.btnCloseAll = QPushButton("Start All")
         self.btnCloseAll.clicked.connect(self.btnCloseAllClicked)
 
@@ -425,6 +447,8 @@ class GeneralOptions(QWidget):
         lytBuffer.addWidget(self.spnDisplayRefresh, 4, 3, 1, 1)
         lytBuffer.addWidget(lblCacheMax,            5, 0, 1, 3)
         lytBuffer.addWidget(self.spnCacheMax,       5, 3, 1, 1)
+        lytBuffer.addWidget(lblAnalysisLoad,        6, 0, 1, 3)
+        lytBuffer.addWidget(self.spnAnalysisLoad,   6, 3, 1, 1)
         lytBuffer.setContentsMargins(0, 0, 0, 0)
 
         pnlButtons = QWidget()
@@ -495,6 +519,14 @@ class GeneralOptions(QWidget):
         self.mw.settings.setValue(self.autoTimeSyncKey, state)
         self.mw.cameraPanel.enableAutoTimeSync(state)
 
+    def hardwareRenderChecked(self, state):
+        self.mw.settings.setValue(self.hardwareRenderKey, state)
+        self.mw.glWidget.setTextureRendering(self.chkHardwareRender.isChecked())
+
+    def decodeScaleChecked(self, state):
+        self.mw.settings.setValue(self.decodeScaleKey, state)
+        self.mw.refreshDecodeSizes()
+
     def spnDisplayRefreshChanged(self, i):
         self.mw.settings.setValue(self.displayRefreshKey, i)
         self.mw.glWidget.timer.setInterval(i)
@@ -502,6 +534,10 @@ class GeneralOptions(QWidget):
     def spnCacheMaxChanged(self, i):
         self.mw.settings.setValue(self.cacheMaxSizeKey, i)
 
+    def spnAnalysisLoadChanged(self, i):
+        self.mw.settings.setValue(self.analysisLoadKey, i)
+        self.mw.analysisPool.controller.target = i / 100
+
     def cmbInterfacesChanged(self, network):
         self.mw.settings.setValue(self.interfaceKey, network)
 
@@ -265,6 +265,7 @@ class ProxyOptions(QWidget):
                         profile.nullifyGetProxyURI()
                     else:
                         profile.getProxyURI = self.mw.getProxyURI
+            self.mw.cameraPanel.indexCameras()
 
         if type == ProxyType.CLIENT:
             self.manageAnalyzers(self.chkListen.isChecked())
@@ -275,6 +276,7 @@ class ProxyOptions(QWidget):
                     return
                 self.mw.closeAllStreams()
                 self.mw.cameraPanel.lstCamera.clear()
+                self.mw.cameraPanel.indexCameras()
                 self.mw.cameraPanel.btnDiscoverClicked()
         else:
             self.manageAnalyzers(False)
@@ -343,6 +345,7 @@ class ProxyOptions(QWidget):
                 cameras = [lstCamera.item(x) for x in range(lstCamera.count())]
                 for camera in cameras:
                     self.mw.addCameraProxy(camera)
+                self.mw.cameraPanel.indexCameras()
 
             self.mw.startListener(self.getInterfaces())
 
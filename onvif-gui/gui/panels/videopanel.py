@@ -20,7 +20,7 @@
 import os
 from PyQt6.QtWidgets import QGridLayout, QWidget, QCheckBox, \
     QLabel, QComboBox, QVBoxLayout
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from gui.enums import MediaSource
 
 class VideoPanel(QWidget):
@@ -34,6 +34,7 @@ class VideoPanel(QWidget):
         self.stdLocation = mw.getLocation() + "/modules/video"
 
         self.lblCamera = QLabel("Please select a camera to enable this panel")
+        self.lblAnalysis = QLabel()
 
         self.cmbWorker = QComboBox()
         self.fillModules()
@@ -51,13 +52,26 @@ class VideoPanel(QWidget):
         lytFixed.addWidget(self.cmbWorker,     2, 1, 1, 1)
         lytFixed.addWidget(self.chkEnableFile, 3, 0, 1, 1)
         lytFixed.addWidget(self.lblCamera,     4, 0, 1, 2, Qt.AlignmentFlag.AlignCenter)
+        lytFixed.addWidget(self.lblAnalysis,   5, 0, 1, 2, Qt.AlignmentFlag.AlignCenter)
         lytFixed.setColumnStretch(1, 10)
         self.layout.addWidget(fixedPanel)
 
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.updateAnalysisStats)
+        self.timer.start(1000)
+
     def showEvent(self, event):
         self.lblCamera.setFocus()
         super().showEvent(event)
 
+    def updateAnalysisStats(self):
+        text = ""
+        if self.isVisible():
+            if player := self.mw.pm.getCurrentPlayer():
+                if player.analyze_video:
+                    text = f'{player.mailbox}\nAnalysis load {self.mw.analysisPool.controller.load:.0%}'
+        self.lblAnalysis.setText(text)
+
     def fillModules(self):
         d = self.stdLocation
         workers = [f for f in os.listdir(d) if os.path.isfile(os.path.join(d, f))]
@@ -115,11 +129,13 @@ class VideoPanel(QWidget):
                 self.mw.videoConfigure.setFile(player.uri)
 
         self.mw.settings.setValue(self.workerKey, worker)
+        self.mw.refreshDecodeSizes()
 
     def chkEnableFileChanged(self, state):
         self.mw.filePanel.setAnalyzeVideo(state)
         for player in self.mw.pm.players:
             if not player.isCameraStream():
                 player.analyze_video = bool(state)
+        self.mw.refreshDecodeSizes()
         if self.mw.videoConfigure.source == MediaSource.FILE:
             self.mw.videoConfigure.enableControls(state)
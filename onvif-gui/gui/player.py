@@ -6,7 +6,8 @@ from collections import deque
 import shutil
 import avio
 from loguru import logger
-import time
+from gui.analysis import FrameMailbox
+from gui.locks import TimedLock
 
 class PlayerSignals(QObject):
     start = pyqtSignal()
@@ -26,11 +27,20 @@ class Player(avio.Player):
         self.audioModelSettings = None
         self.detection_count = deque()
         self.last_image = None
+        self.motion_model = None
+        self.zone_map = None
+        self.zone_levels = []
+        self.audio_window = None
+        self.decode_size = None
+        self.analysis_frame = None
+        self.frames_released = False
+        self.frame = None
+        self.mailbox = FrameMailbox(self)
         self.last_render = None
         self.timer = None
         self.remote_width = 0
         self.remote_height = 0
-        self.thread_lock = False
+        self.thread_lock = TimedLock("player")
 
         self.boxes = []
         self.labels = []
@@ -56,14 +66,24 @@ class Player(avio.Player):
             self.signals.start.connect(self.timer.start)
             self.signals.stop.connect(self.timer.stop)
 
-    def lock(self):
-        # the lock protects the image
-        if self.thread_lock:
-            time.sleep(0.001)
-        self.thread_lock = True
+    def lock(self, timeout=None):
+        # the lock protects the image and detections
+        return self.thread_lock.acquire(timeout)
 
     def unlock(self):
-        self.thread_lock = False
+        self.thread_lock.release()
+
+    def releaseFrames(self):
+        # gives the shown and analyzed pictures back once the stream has stopped
+        with self.thread_lock:
+            frames = [self.frame, self.analysis_frame]
+            self.frame = None
+            self.analysis_frame = None
+            self.frames_released = True
+            self.image = None
+        for frame in frames:
+            if frame is not None:
+                frame.release()
 
     def requestShutdown(self, reconnect=False):
         self.setAlarmState(0)
@@ -1,5 +1,5 @@
 from loguru import logger
-from time import sleep
+from gui.locks import TimedLock
 from datetime import datetime
 
 class Detection():
@@ -14,7 +14,7 @@ class ListenProtocols():
     def __init__(self, mw):
         self.mw = mw
         self.cameras = {}
-        self.thread_lock = False
+        self.thread_lock = TimedLock("detections")
         self.detections = {}
         self.last_timestamp = ""
 
@@ -22,25 +22,19 @@ class ListenProtocols():
         if msg.find("WSACancelBlockingCall") < 0:
             logger.error(msg)
 
-    def lock(self):
-        while self.thread_lock:
-            sleep(0.001)
-        self.thread_lock = True
+    def lock(self, timeout=None):
+        return self.thread_lock.acquire(timeout)
 
     def unlock(self):
-        self.thread_lock = False
+        self.thread_lock.release()
 
     def getDetection(self, uri):
-        result = None
-        self.lock()
-        result = self.detections.get(uri)
-        self.unlock()
-        return result
+        with self.thread_lock:
+            return self.detections.get(uri)
     
     def setDetection(self, uri, detection):
-        self.lock()
-        self.detections[uri] = detection
-        self.unlock()
+        with self.thread_lock:
+            self.detections[uri] = detection
 
     def callback(self, msg):
         arguments = msg.split("\n\n")
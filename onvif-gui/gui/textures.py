@@ -0,0 +1,144 @@
+#/********************************************************************
+# libonvif/onvif-gui/gui/textures.py
+#
+# Copyright (c) 2024  Stephen Rhodes
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+#*********************************************************************/
+
+import ctypes
+from PyQt6.QtOpenGL import QOpenGLTexture, QOpenGLBuffer, QOpenGLTextureBlitter, \
+    QOpenGLPixelTransferOptions, QOpenGLVersionFunctionsFactory, QOpenGLVersionProfile
+from PyQt6.QtGui import QOpenGLContext, QImage
+from PyQt6 import sip
+from loguru import logger
+
+GL_RENDERER = 0x1F01
+SOFTWARE_RENDERERS = ("llvmpipe", "softpipe", "swrast", "software", "gdi generic")
+
+def hardware_context():
+    # True if the current context is rendered by a gpu, mesa and windows
+    # software renderers are slower at uploading textures than a QPainter blit
+    context = QOpenGLContext.currentContext()
+    if context is None or not context.isValid():
+        return False
+    try:
+        if not context.isOpenGLES():
+            profile = QOpenGLVersionProfile()
+            profile.setVersion(2, 0)
+            if functions := QOpenGLVersionFunctionsFactory.get(profile, context):
+                renderer = str(functions.glGetString(GL_RENDERER)).lower()
+                logger.debug(f'OpenGL renderer: {renderer}')
+                return not any(name in renderer for name in SOFTWARE_RENDERERS)
+    except Exception as ex:
+        logger.debug(f'Unable to query the OpenGL renderer : {ex}')
+    return True
+
+class FrameTexture():
+    # Texture holding the picture of one stream.  Frames are copied into one
+    # of two pixel buffers in turn and the texture is filled from that buffer,
+    # so the driver can transfer the last frame while the next one is copied.
+    # A frame already uploaded, known by its QImage cacheKey, is not copied
+    # again.
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.key = None
+        self.index = 0
+
+        self.texture = QOpenGLTexture(QOpenGLTexture.Target.Target2D)
+        self.texture.setSize(width, height)
+        self.texture.setFormat(QOpenGLTexture.TextureFormat.RGB8_UNorm)
+        self.texture.setMinMagFilters(QOpenGLTexture.Filter.Linear, QOpenGLTexture.Filter.Linear)
+        self.texture.setWrapMode(QOpenGLTexture.WrapMode.ClampToEdge)
+        self.texture.allocateStorage(QOpenGLTexture.PixelFormat.RGB, QOpenGLTexture.PixelType.UInt8)
+
+        self.buffers = []
+        for i in range(2):
+            buffer = QOpenGLBuffer(QOpenGLBuffer.Type.PixelUnpackBuffer)
+            buffer.setUsagePattern(QOpenGLBuffer.UsagePattern.StreamDraw)
+            if not buffer.create():
+                raise RuntimeError("unable to create pixel buffer")
+            self.buffers.append(buffer)
+
+    def upload(self, image):
+        if image.cacheKey() == self.key:
+            return
+
+        count = image.sizeInBytes()
+        buffer = self.buffers[self.index]
+        self.index ^= 1
+        buffer.bind()
+        try:
+            # allocating again lets the driver hand out fresh storage instead of
+            # waiting for a transfer still reading the old one
+            buffer.allocate(count)
+            data = buffer.map(QOpenGLBuffer.Access.WriteOnly)
+            if data is None:
+                raise RuntimeError("unable to map pixel buffer")
+            ctypes.memmove(int(data), int(image.constBits()), count)
+            buffer.unmap()
+
+            options = QOpenGLPixelTransferOptions()
+            options.setAlignment(1)
+            options.setRowLength(image.bytesPerLine() // 3)
+            self.texture.setData(0, 0, 0, self.width, self.height, 1, QOpenGLTexture.PixelFormat.RGB,
+                                 QOpenGLTexture.PixelType.UInt8, sip.voidptr(0), options)
+        finally:
+            buffer.release()
+        self.key = image.cacheKey()
+
+    def destroy(self):
+        self.texture.destroy()
+        for buffer in self.buffers:
+            buffer.destroy()
+
+class TextureRenderer():
+    # Draws the stream pictures as textured quads.  Must be created and used
+    # while the gl context of the widget is current, in practice from inside
+    # paintGL.  Only RGB888 frames are uploaded, draw returns False for other
+    # formats so the caller can paint them with QPainter instead.
+
+    def __init__(self):
+        self.textures = {}
+        self.blitter = QOpenGLTextureBlitter()
+        if not self.blitter.create():
+            raise RuntimeError("unable to create texture blitter")
+
+    def draw(self, uri, image, rect, viewport):
+        if image.format() != QImage.Format.Format_RGB888:
+            return False
+
+        texture = self.textures.get(uri)
+        if texture is None or texture.width != image.width() or texture.height != image.height():
+            if texture:
+                texture.destroy()
+            texture = self.textures[uri] = FrameTexture(image.width(), image.height())
+        texture.upload(image)
+
+        self.blitter.bind()
+        self.blitter.blit(texture.texture.textureId(), QOpenGLTextureBlitter.targetTransform(rect, viewport),
+                          QOpenGLTextureBlitter.Origin.OriginTopLeft)
+        self.blitter.release()
+        return True
+
+    def prune(self, uris):
+        # frees the textures of streams no longer shown
+        for uri in [uri for uri in self.textures if uri not in uris]:
+            self.textures.pop(uri).destroy()
+
+    def destroy(self):
+        self.prune(())
+        self.blitter.destroy()
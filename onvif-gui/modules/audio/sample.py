@@ -18,7 +18,6 @@
 #*********************************************************************/
 
 import numpy as np
-from numpy.fft import fft
 import math
 import os
 from loguru import logger
@@ -26,7 +25,8 @@ from PyQt6.QtWidgets import QGridLayout, QWidget, QSlider, QLabel, QWidget, QChe
     QGroupBox, QRadioButton
 from PyQt6.QtGui import QPainter, QColorConstants, QColor
 from PyQt6.QtCore import QPointF, Qt, QRectF
-from gui.components import WarningBar, Indicator
+from gui.components import WarningBar, Indicator, ComboSelector
+from gui.analysis import rms, magnitudes, band_level, AudioWindow, WINDOW_FUNCTIONS
 from gui.enums import MediaSource
 
 MODULE_NAME = "sample"
@@ -355,12 +355,26 @@ class AudioConfigure(QWidget):
             self.pnlAmplitude.setMinimumHeight(200)
             self.pnlFrequency.setMinimumHeight(200)
 
+            # samples are analyzed in overlapping windows rather than one decoder frame at a time
+            self.cmbWindowSize = ComboSelector(mw, "Window Size", ("1024", "2048", "4096", "8192"), "4096", MODULE_NAME)
+            self.cmbWindowOverlap = ComboSelector(mw, "Overlap", ("0%", "25%", "50%", "75%"), "50%", MODULE_NAME)
+            self.cmbWindowFunction = ComboSelector(mw, "Window", tuple(WINDOW_FUNCTIONS.keys()), "Rectangular", MODULE_NAME)
+            grpWindow = QGroupBox("System wide analysis window")
+            grpWindow.setToolTip("Each window is one decision, so the cost follows the number of windows per second.  "
+                                 "4096 samples or more at 50% overlap costs less than analyzing every decoder frame, "
+                                 "2048 at 50% costs a little more and 75% overlap or 1024 sample windows cost up to twice as much")
+            lytWindow = QGridLayout(grpWindow)
+            lytWindow.addWidget(self.cmbWindowSize,      0, 0, 1, 1)
+            lytWindow.addWidget(self.cmbWindowOverlap,   0, 1, 1, 1)
+            lytWindow.addWidget(self.cmbWindowFunction,  1, 0, 1, 2)
+
             lytMain = QGridLayout(self)
             lytMain.addWidget(self.pnlAmplitude,      0, 0, 1, 4)
             lytMain.addWidget(self.pnlFrequency,      1, 0, 1, 4)
             lytMain.addWidget(self.grpAlarmCondition, 2, 0, 1, 3)
-            lytMain.addWidget(QLabel(),               3, 0, 1, 4)
-            lytMain.setRowStretch(3, 3)
+            lytMain.addWidget(grpWindow,              3, 0, 1, 4)
+            lytMain.addWidget(QLabel(),               4, 0, 1, 4)
+            lytMain.setRowStretch(4, 3)
 
             self.enableControls(False)
 
@@ -496,11 +510,18 @@ class AudioConfigure(QWidget):
     def isModelSettings(self, arg):
         return type(arg) == SampleSettings
 
+    def windowParameters(self):
+        size = int(self.cmbWindowSize.currentText())
+        hop = int(size * (1 - int(self.cmbWindowOverlap.currentText().rstrip("%")) / 100))
+        return size, hop, self.cmbWindowFunction.currentText()
+
 class AudioWorker:
     def __init__(self, mw):
         try:
             self.mw = mw
             self.last_error = ""
+            # the analysis window is kept on the player, so streams can be analyzed in parallel
+            self.thread_safe = True
         except:
             logger.exception("sample worker failed to load")
 
@@ -512,7 +533,7 @@ class AudioWorker:
                 self.mw.audioConfigure.clearIndicators()
                 return
 
-            samples = np.array(F, copy=True)
+            samples = np.array(F, copy=False)
             if F.channels() > 1:
                 samples = samples[::F.channels()]
 
@@ -533,87 +554,14 @@ class AudioWorker:
             if not player.audioModelSettings:
                 raise Exception("Unable to set audio model parameters for player")
 
-            spectrum = None
-            if player.audioModelSettings.frequencyEnabled and samples.size:
-                spectrum = fft(samples)
-
-            if player.audioModelSettings.amplitudeEnabled:
-                samples *= math.exp(0.2 * (player.audioModelSettings.amplitudeGain - 50))
-                rms = 0
-                if samples.size:
-                    for s in samples:
-                        rms += s * s
-                    rms = math.sqrt(rms/samples.size)
-
-                alarmState = False
-                if player.audioModelSettings.alarmLimitOver:
-                    if rms > 1:
-                        alarmState = True
-                else:
-                    if rms < 0.005:
-                        alarmState = True
-
-                '''
-                focused = False
-                if player.isCameraStream():
-                    if camera:
-                        if camera.isFocus():
-                            focused = True
-                else:
-                    if player.uri == self.mw.glWidget.focused_uri:
-                        focused = True
-                if focused:
-                '''
-                if player.uri == self.mw.glWidget.focused_uri:
-                    self.mw.audioConfigure.barAmplitude.setLevel(rms)
-                    self.mw.audioConfigure.dspAmplitude.setData(samples)
-                    if alarmState:
-                        self.mw.audioConfigure.indAmplitude.setState(1)
-
-                player.handleAlarm(alarmState)
-
-            if player.audioModelSettings.frequencyEnabled and spectrum is not None:
-                half_length = int(len(spectrum)/2)
-                frequencies = np.abs(spectrum[:half_length])
-                frequencies *= math.exp(0.05 * (player.audioModelSettings.frequencyGain - 50))
-
-                highPass = player.audioModelSettings.frequencyPctHighPass * frequencies.size
-                lowPass = player.audioModelSettings.frequencyPctLowPass * frequencies.size
-                sph = 0
-                for i, f in enumerate(frequencies):
-                    if highPass < lowPass:
-                        if i > highPass and i < lowPass:
-                            sph += f
-                    else:
-                        if i > highPass or i < lowPass:
-                            sph += f
-                sph /= (frequencies.size * player.audioModelSettings.frequencyPctCoverage)
-
-                alarmState = False
-                if player.audioModelSettings.alarmLimitOver:
-                    if sph > 1:
-                        alarmState = True
-                else:
-                    if sph < 0.005:
-                        alarmState = True
-                '''
-                focused = False
-                if player.isCameraStream():
-                    if camera:
-                        if camera.isFocus():
-                            focused = True
-                else:
-                    if player.uri == self.mw.glWidget.focused_uri:
-                        focused = True
-                if focused:
-                '''
-                if player.uri == self.mw.glWidget.focused_uri:
-                    self.mw.audioConfigure.barFrequency.setLevel(sph)
-                    self.mw.audioConfigure.dspFrequency.setData(frequencies)
-                    if alarmState:
-                        self.mw.audioConfigure.indFrequency.setState(1)
-
-                player.handleAlarm(alarmState)
+            # the window keeps its own copy of the samples, the frame is not held
+            size, hop, function = self.mw.audioConfigure.windowParameters()
+            window = player.audio_window
+            if window is None or not window.matches(size, hop, function):
+                window = player.audio_window = AudioWindow(size, hop, function)
+            window.push(samples)
+            for block in window:
+                self.analyze(block, window.weights, player)
 
         except BaseException as err:
             if str(err) != self.last_error:
@@ -622,3 +570,71 @@ class AudioWorker:
                 print("Error during audio analysis:", str(err))
             self.last_error = str(err)
 
+    def analyze(self, samples, weights, player):
+        frequencies = None
+        if player.audioModelSettings.frequencyEnabled and samples.size:
+            frequencies = magnitudes(samples, weights)
+
+        if player.audioModelSettings.amplitudeEnabled:
+            samples = samples * math.exp(0.2 * (player.audioModelSettings.amplitudeGain - 50))
+            level = rms(samples)
+
+            alarmState = False
+            if player.audioModelSettings.alarmLimitOver:
+                if level > 1:
+                    alarmState = True
+            else:
+                if level < 0.005:
+                    alarmState = True
+
+            '''
+            focused = False
+            if player.isCameraStream():
+                if camera:
+                    if camera.isFocus():
+                        focused = True
+            else:
+                if player.uri == self.mw.glWidget.focused_uri:
+                    focused = True
+            if focused:
+            '''
+            if player.uri == self.mw.glWidget.focused_uri:
+                self.mw.audioConfigure.barAmplitude.setLevel(level)
+                self.mw.audioConfigure.dspAmplitude.setData(samples)
+                if alarmState:
+                    self.mw.audioConfigure.indAmplitude.setState(1)
+
+            player.handleAlarm(alarmState)
+
+        if player.audioModelSettings.frequencyEnabled and frequencies is not None:
+            frequencies *= math.exp(0.05 * (player.audioModelSettings.frequencyGain - 50))
+            sph = band_level(frequencies, player.audioModelSettings.frequencyPctHighPass,
+                             player.audioModelSettings.frequencyPctLowPass,
+                             player.audioModelSettings.frequencyPctCoverage)
+
+            alarmState = False
+            if player.audioModelSettings.alarmLimitOver:
+                if sph > 1:
+                    alarmState = True
+            else:
+                if sph < 0.005:
+                    alarmState = True
+            '''
+            focused = False
+            if player.isCameraStream():
+                if camera:
+                    if camera.isFocus():
+                        focused = True
+            else:
+                if player.uri == self.mw.glWidget.focused_uri:
+                    focused = True
+            if focused:
+            '''
+            if player.uri == self.mw.glWidget.focused_uri:
+                self.mw.audioConfigure.barFrequency.setLevel(sph)
+                self.mw.audioConfigure.dspFrequency.setData(frequencies)
+                if alarmState:
+                    self.mw.audioConfigure.indFrequency.setState(1)
+
+            player.handleAlarm(alarmState)
+
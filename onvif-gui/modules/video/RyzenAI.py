@@ -25,7 +25,10 @@ try:
     import cv2
     from loguru import logger
     import numpy as np
-    from gui.components import ComboSelector, FileSelector, ThresholdSlider, TargetSelector
+    from gui.components import ComboSelector, FileSelector, ThresholdSlider, TargetSelector, ReuseSelector, GateSelector, \
+        RegionSelector
+    from gui.analysis import Letterbox, DetectionCache, MotionGate, model_cache, decode_yolox, nms, \
+        parse_regions, format_regions, region_crops, RegionResult
     from gui.enums import MediaSource
     from PyQt6.QtWidgets import QWidget, QGridLayout, QLabel, QCheckBox, QMessageBox, \
         QGroupBox, QDialog, QSpinBox
@@ -76,9 +79,9 @@ class RyzenAISettings():
         self.limit = self.getModelOutputLimit()
         self.confidence = self.getModelConfidence()
         self.show = self.getModelShowBoxes()
-        self.skipFrames = self.getSkipFrames()
-        self.skipCounter = 0
         self.sampleSize = self.getSampleSize()
+        self.regions = self.getRegions()
+        self.tileRegions = self.getTileRegions()
         self.orig_img = None
 
     def getTargets(self):
@@ -130,15 +133,6 @@ class RyzenAISettings():
         self.show = value
         self.mw.settings.setValue(key, int(value))
 
-    def getSkipFrames(self):
-        key = f'{self.id}/{MODULE_NAME}/SkipFrames'
-        return int(self.mw.settings.value(key, 0))
-
-    def setSkipFrames(self, value):
-        key = f'{self.id}/{MODULE_NAME}/SkipFrames'
-        self.skipFrames = int(value)
-        self.mw.settings.setValue(key, int(value))
-
     def getSampleSize(self):
         key = f'{self.id}/{MODULE_NAME}/SampleSize'
         return int(self.mw.settings.value(key, 1))
@@ -148,6 +142,24 @@ class RyzenAISettings():
         self.sampleSize = int(value)
         self.mw.settings.setValue(key, int(value))        
 
+    def getRegions(self):
+        key = f'{self.id}/{MODULE_NAME}/Regions'
+        return parse_regions(self.mw.settings.value(key, ""))
+
+    def setRegions(self, regions):
+        key = f'{self.id}/{MODULE_NAME}/Regions'
+        self.regions = list(regions)
+        self.mw.settings.setValue(key, format_regions(self.regions))
+
+    def getTileRegions(self):
+        key = f'{self.id}/{MODULE_NAME}/TileRegions'
+        return bool(int(self.mw.settings.value(key, 0)))
+
+    def setTileRegions(self, value):
+        key = f'{self.id}/{MODULE_NAME}/TileRegions'
+        self.tileRegions = bool(value)
+        self.mw.settings.setValue(key, int(value))
+
 class RyzenAISignals(QObject):
     showWaitDialog = pyqtSignal()
     hideWaitDialog = pyqtSignal()
@@ -163,6 +175,7 @@ class VideoConfigure(QWidget):
             self.source = None
             self.media = None
             self.initialized = False
+            self.full_resolution = True
             self.autoKey = "Module/" + MODULE_NAME + "/autoDownload"
 
             if len(IMPORT_ERROR):
@@ -193,11 +206,7 @@ class VideoConfigure(QWidget):
 
             self.sldConfThre = ThresholdSlider(mw, "Confidence", MODULE_NAME)
             self.selTargets = TargetSelector(self.mw, MODULE_NAME)
-
-            self.spnSkipFrames = QSpinBox()
-            self.lblSkipFrames = QLabel("Skip Frames")
-            self.spnSkipFrames.setValue(0)
-            self.spnSkipFrames.valueChanged.connect(self.spnSkipFramesChanged)
+            self.selRegions = RegionSelector(self.mw, MODULE_NAME)
 
             self.spnSampleSize = QSpinBox()
             self.lblSampleSize = QLabel("Sample Size")
@@ -205,6 +214,9 @@ class VideoConfigure(QWidget):
             self.spnSampleSize.setValue(1)
             self.spnSampleSize.valueChanged.connect(self.spnSampleSizeChanged)
 
+            self.selReuse = ReuseSelector(mw, MODULE_NAME)
+            self.selGate = GateSelector(mw, MODULE_NAME)
+
             grpSystem = QGroupBox("System wide model parameters")
             lytSystem = QGridLayout(grpSystem)
             lytSystem.addWidget(self.chkAuto,       0, 0, 1, 4)
@@ -214,15 +226,15 @@ class VideoConfigure(QWidget):
             lytSystem.addWidget(self.cmbAPI,        3, 0, 1, 2)
             lytSystem.addWidget(self.cmbDevice,     3, 2, 1, 2)
             lytSystem.addWidget(self.txtConfigFile, 4, 0, 1, 4)
+            lytSystem.addWidget(self.selReuse,      5, 0, 1, 4)
+            lytSystem.addWidget(self.selGate,       6, 0, 1, 4)
 
             self.grpCamera = QGroupBox("Check camera video alarm to enable")
             lytCamera = QGridLayout(self.grpCamera)
             lytCamera.addWidget(self.sldConfThre,    0, 0, 1, 4)
-            lytCamera.addWidget(self.lblSkipFrames,  1, 0, 1, 1)
-            lytCamera.addWidget(self.spnSkipFrames,  1, 1, 1, 1)
-            lytCamera.addWidget(self.lblSampleSize,  1, 2, 1, 1)
-            lytCamera.addWidget(self.spnSampleSize,  1, 3, 1, 1)
-            lytCamera.addWidget(QLabel(),            2, 0, 1, 4)
+            lytCamera.addWidget(self.lblSampleSize,  1, 0, 1, 1)
+            lytCamera.addWidget(self.spnSampleSize,  1, 1, 1, 1)
+            lytCamera.addWidget(self.selRegions,     2, 0, 1, 4)
             lytCamera.addWidget(self.selTargets,     3, 0, 1, 4)
 
             lytMain = QGridLayout(self)
@@ -250,15 +262,6 @@ class VideoConfigure(QWidget):
         self.mw.settings.setValue(self.autoKey, state)
         self.txtFilename.setEnabled(not self.chkAuto.isChecked())
 
-    def spnSkipFramesChanged(self, value):
-        if self.source == MediaSource.CAMERA:
-            if self.media:
-                if self.media.videoModelSettings:
-                    self.media.videoModelSettings.setSkipFrames(value)
-        if self.source == MediaSource.FILE:
-            if self.mw.filePanel.videoModelSettings:
-                self.mw.filePanel.videoModelSettings.setSkipFrames(value)
-
     def spnSampleSizeChanged(self, value):
         if self.source == MediaSource.CAMERA:
             if self.media:
@@ -286,9 +289,9 @@ class VideoConfigure(QWidget):
                 camera.videoModelSettings = RyzenAISettings(self.mw, camera)
             self.mw.videoPanel.lblCamera.setText(f'Camera - {camera.name()}')
             self.sldConfThre.setValue(camera.videoModelSettings.confidence)
-            self.spnSkipFrames.setValue(camera.videoModelSettings.skipFrames)
             self.spnSampleSize.setValue(camera.videoModelSettings.sampleSize)
             self.selTargets.setModelParameters(camera.videoModelSettings)
+            self.selRegions.setModelParameters(camera.videoModelSettings)
             if profile := self.mw.cameraPanel.getProfile(camera.uri()):
                 self.enableControls(profile.getAnalyzeVideo())
 
@@ -304,9 +307,9 @@ class VideoConfigure(QWidget):
                 file_dir = "Directory"
             self.mw.videoPanel.lblCamera.setText(f'{file_dir} - {os.path.split(file)[1]}')
             self.sldConfThre.setValue(self.mw.filePanel.videoModelSettings.confidence)
-            self.spnSkipFrames.setValue(self.mw.filePanel.videoModelSettings.skipFrames)
             self.spnSampleSize.setValue(self.mw.filePanel.videoModelSettings.sampleSize)
             self.selTargets.setModelParameters(self.mw.filePanel.videoModelSettings)
+            self.selRegions.setModelParameters(self.mw.filePanel.videoModelSettings)
             self.enableControls(self.mw.videoPanel.chkEnableFile.isChecked())
 
     def isModelSettings(self, arg):
@@ -331,6 +334,9 @@ class VideoWorker:
         try:
             self.mw = mw
             self.last_ex = ""
+            self.letterbox = None
+            self.detection_cache = DetectionCache(self.mw.videoConfigure.selReuse.maxAge())
+            self.motion_gate = MotionGate()
             self.api = self.mw.videoConfigure.cmbAPI.currentText()
 
             if self.mw.videoConfigure.name != MODULE_NAME or len(IMPORT_ERROR) > 0 or self.mw.glWidget.model_loading:
@@ -369,9 +375,15 @@ class VideoWorker:
             if not len(vaip_config):
                 raise(Exception("VAIP setting is required"))
 
-            providers = ["VitisAIExecutionProvider"]
-            provider_options = [{"config_file": vaip_config}]
-            self.session = ort.InferenceSession(self.ckpt_file, providers=providers, provider_options=provider_options)
+            cache_key = (MODULE_NAME, str(self.ckpt_file), vaip_config)
+            self.session = model_cache.get(cache_key)
+            if not self.session:
+                providers = ["VitisAIExecutionProvider"]
+                provider_options = [{"config_file": vaip_config,
+                                     "cacheDir": model_cache.compile_dir(MODULE_NAME),
+                                     "cacheKey": Path(self.ckpt_file).stem}]
+                self.session = ort.InferenceSession(self.ckpt_file, providers=providers, provider_options=provider_options)
+                model_cache.put(cache_key, self.session)
 
         except Exception as ex:
             logger.exception(MODULE_NAME + " initialization failure")
@@ -379,103 +391,20 @@ class VideoWorker:
 
         self.mw.glWidget.model_loading = False
      
-    def preprocess(self, img, input_shape, swap=(2, 0, 1)):
-        if len(img.shape) == 3:
-            padded_img = np.ones((input_shape[0], input_shape[1], 3), dtype=np.uint8) * 114
-        else:
-            padded_img = np.ones(input_shape, dtype=np.uint8) * 114
-        ratio = min(input_shape[0] / img.shape[0], input_shape[1] / img.shape[1])
-        resized_img = cv2.resize(
-            img,
-            (int(img.shape[1] * ratio), int(img.shape[0] * ratio)),
-            interpolation=cv2.INTER_LINEAR,
-        ).astype(np.uint8)
-        padded_img[: int(img.shape[0] * ratio), : int(img.shape[1] * ratio)] = resized_img
-        padded_img = padded_img.transpose(swap)
-        padded_img = np.ascontiguousarray(padded_img, dtype=np.float32)
-        return padded_img, ratio
+    def preprocess(self, img, input_shape):
+        # the session takes NHWC input with unscaled pixel values
+        if self.letterbox is None or self.letterbox.size != tuple(input_shape):
+            self.letterbox = Letterbox(input_shape, center=False, scale=1.0, channels_first=False)
+        tensor, ratios, _ = self.letterbox(img)
+        return tensor, ratios[0]
     
     def postprocess(self, outputs, input_shape, ratio, player):
-        outputs = [out.reshape(*out.shape[:2], -1).transpose(0,2,1) for out in outputs]
-        outputs = np.concatenate(outputs, axis=1)
-        outputs[..., 4:] = self.sigmoid(outputs[..., 4:])
-        predictions = self.demo_postprocess(outputs, input_shape, p6=False)[0]
-        boxes = predictions[:, :4]
-        scores = predictions[:, 4:5] * predictions[:, 5:]
-        boxes_xyxy = np.ones_like(boxes)
-        boxes_xyxy[:, 0] = boxes[:, 0] - boxes[:, 2]/2.
-        boxes_xyxy[:, 1] = boxes[:, 1] - boxes[:, 3]/2.
-        boxes_xyxy[:, 2] = boxes[:, 0] + boxes[:, 2]/2.
-        boxes_xyxy[:, 3] = boxes[:, 1] + boxes[:, 3]/2.
-        boxes_xyxy /= ratio
+        # the NHWC output of each stride flattens directly into anchors in grid order
+        pred = np.concatenate([out.reshape(-1, out.shape[-1]) for out in outputs])
         confthre = player.videoModelSettings.confidence / 100
-        dets = self.multiclass_nms_class_agnostic(player, boxes_xyxy, scores, nms_thr=0.45, score_thr=confthre)
-        return dets
-
-    def multiclass_nms_class_agnostic(self, player, boxes, scores, nms_thr, score_thr):
-        """Multiclass NMS implemented in Numpy. Class-agnostic version."""
-        cls_inds = scores.argmax(1)
-        cls_scores = scores[np.arange(len(cls_inds)), cls_inds]
-        valid_score_mask = cls_scores > score_thr
-        if valid_score_mask.sum() == 0:
-            return None
-        valid_scores = cls_scores[valid_score_mask]
-        valid_boxes = boxes[valid_score_mask]
-        valid_cls_inds = cls_inds[valid_score_mask]
-        keep = self.nms(valid_boxes, valid_scores, nms_thr)
-        if keep:
-            dets = np.concatenate(
-                [valid_boxes[keep], valid_scores[keep, None], valid_cls_inds[keep, None]], 1
-            )
-        return dets
-
-    def nms(self, boxes, scores, nms_thr):
-        """Single class NMS implemented in Numpy."""
-        x1 = boxes[:, 0]
-        y1 = boxes[:, 1]
-        x2 = boxes[:, 2]
-        y2 = boxes[:, 3]
-        areas = (x2 - x1 + 1) * (y2 - y1 + 1)
-        order = scores.argsort()[::-1]
-        keep = []
-        while order.size > 0:
-            i = order[0]
-            keep.append(i)
-            xx1 = np.maximum(x1[i], x1[order[1:]])
-            yy1 = np.maximum(y1[i], y1[order[1:]])
-            xx2 = np.minimum(x2[i], x2[order[1:]])
-            yy2 = np.minimum(y2[i], y2[order[1:]])
-            w = np.maximum(0.0, xx2 - xx1 + 1)
-            h = np.maximum(0.0, yy2 - yy1 + 1)
-            inter = w * h
-            ovr = inter / (areas[i] + areas[order[1:]] - inter)
-            inds = np.where(ovr <= nms_thr)[0]
-            order = order[inds + 1]
-        return keep
-
-    def sigmoid(self, x):
-        return 1.0 / (1.0 + np.exp(-x))
-
-    def demo_postprocess(self, outputs, img_size, p6=False):
-        grids = []
-        expanded_strides = []
-        if not p6:
-            strides = [8, 16, 32]
-        else:
-            strides = [8, 16, 32, 64]
-        hsizes = [img_size[0] // stride for stride in strides]
-        wsizes = [img_size[1] // stride for stride in strides]
-        for hsize, wsize, stride in zip(hsizes, wsizes, strides):
-            xv, yv = np.meshgrid(np.arange(wsize), np.arange(hsize))
-            grid = np.stack((xv, yv), 2).reshape(1, -1, 2)
-            grids.append(grid)
-            shape = grid.shape[:2]
-            expanded_strides.append(np.full((*shape, 1), stride))
-        grids = np.concatenate(grids, 1)
-        expanded_strides = np.concatenate(expanded_strides, 1)
-        outputs[..., :2] = (outputs[..., :2] + grids) * expanded_strides
-        outputs[..., 2:4] = np.exp(outputs[..., 2:4]) * expanded_strides
-        return outputs
+        boxes, scores, cls = decode_yolox(pred, input_shape, confthre)
+        keep = nms(boxes, scores, 0.45)
+        return np.column_stack((boxes[keep] / ratio, scores[keep], cls[keep]))
     
     def get_auto_ckpt_filename(self):
         return Path(f'{torch.hub.get_dir()}/checkpoints/yolox-s-int8.onnx').absolute()
@@ -505,34 +434,39 @@ class VideoWorker:
             if not player.videoModelSettings:
                 raise Exception("Unable to set video model parameters for player")
 
-            if player.videoModelSettings.skipCounter < player.videoModelSettings.skipFrames:
-                player.videoModelSettings.skipCounter += 1
-                return
-            player.videoModelSettings.skipCounter = 0
-
-            player.lock()
             player.videoModelSettings.orig_img = np.array(F, copy=False)
 
-            res = int(self.mw.videoConfigure.cmbRes.currentText())
-            input_shape = [res, res]
             input_img = np.array(F, copy=False)
-            img, ratio = self.preprocess(input_img, input_shape)
-            ort_inputs = {self.session.get_inputs()[0].name: np.transpose(img[None, :, :, :], (0, 2 ,3, 1))}
-
-            outputs = self.session.run(None, ort_inputs)
-
-            outputs = [np.transpose(out, (0, 3, 1, 2)) for out in outputs]
-            dets = self.postprocess(outputs, input_shape, ratio, player)
-            boxes = []
-            if dets is not None:
-                final_boxes, final_scores, final_cls_inds = dets[:, :4], dets[:, 4], dets[:, 5]
-                for i in range(len(final_cls_inds)):
-                    if int(final_cls_inds[i]) in player.videoModelSettings.targets:
-                        boxes.append(final_boxes[i])
-            player.boxes = boxes
-
-            result = player.processModelOutput()
-            alarmState = result >= player.videoModelSettings.limit if result else False
+            boxes, sig = None, None
+            if not self.motion_gate.check(self.mw.videoConfigure.selGate, player, input_img):
+                boxes = []
+            elif self.mw.videoConfigure.selReuse.isChecked():
+                self.detection_cache.max_age = self.mw.videoConfigure.selReuse.maxAge()
+                boxes, sig = self.detection_cache.lookup(player.uri, input_img)
+
+            if boxes is None:
+                res = int(self.mw.videoConfigure.cmbRes.currentText())
+                input_shape = [res, res]
+                # the frame is cut into its regions of interest and the detections
+                # of the pieces are put back together in full frame coordinates
+                tile = res * 2 if player.videoModelSettings.tileRegions else 0
+                crops = region_crops(input_img, player.videoModelSettings.regions, tile)
+                regions = RegionResult(player, input_img, len(crops))
+                for crop, origin in crops:
+                    img, ratio = self.preprocess(crop, input_shape)
+                    ort_inputs = {self.session.get_inputs()[0].name: img}
+
+                    outputs = self.session.run(None, ort_inputs)
+
+                    dets = regions.add(self.postprocess(outputs, input_shape, ratio, player), origin)
+
+                boxes = dets[np.isin(dets[:, 5], player.videoModelSettings.targets), :4]
+                self.detection_cache.store(player.uri, sig, boxes)
+            # alarm handling may start players, it is kept outside the player lock
+            with player.thread_lock:
+                player.boxes = boxes
+                count = player.processModelOutput()
+            alarmState = count >= player.videoModelSettings.limit if count else False
             player.handleAlarm(alarmState)
 
             show_alarm = False
@@ -545,9 +479,9 @@ class VideoWorker:
             if show_alarm:
                 level = 0
                 if player.videoModelSettings.limit:
-                    level = result / player.videoModelSettings.limit
+                    level = count / player.videoModelSettings.limit
                 else:
-                    if result:
+                    if count:
                         level = 1.0
 
                 self.mw.videoConfigure.selTargets.barLevel.setLevel(level)
@@ -559,5 +493,3 @@ class VideoWorker:
             if self.last_ex != str(ex) and self.mw.videoConfigure.name == MODULE_NAME:
                 logger.exception(f'{MODULE_NAME} runtime error - {ex}')
             self.last_ex = str(ex)
-
-        player.unlock()
@@ -21,10 +21,11 @@ import math
 import numpy as np
 import cv2
 import os
-from PyQt6.QtWidgets import QGridLayout, QWidget, QSlider, QCheckBox, QGroupBox, QLabel
-from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QGridLayout, QWidget, QSlider, QCheckBox, QGroupBox, QLabel, QSpinBox
+from PyQt6.QtCore import Qt, QObject, pyqtSignal
 from loguru import logger
-from gui.components import WarningBar, Indicator
+from gui.components import WarningBar, Indicator, ComboSelector, ZoneSelector
+from gui.analysis import BackgroundModel, ZoneMap, parse_zones, format_zones
 from gui.enums import MediaSource
 
 MODULE_NAME = "motion"
@@ -38,6 +39,7 @@ class MotionSettings():
             self.id = camera.serial_number()
         self.show = False
         self.gain = self.getModelOutputGain()
+        self.zones = self.getZones()
 
     def getModelOutputGain(self):
         key = f'{self.id}/{MODULE_NAME}/MotionGain'
@@ -48,15 +50,31 @@ class MotionSettings():
         self.gain = value
         self.mw.settings.setValue(key, value)
 
+    def getZones(self):
+        key = f'{self.id}/{MODULE_NAME}/Zones'
+        return parse_zones(self.mw.settings.value(key, ""))
+
+    def setZones(self, zones):
+        key = f'{self.id}/{MODULE_NAME}/Zones'
+        self.zones = [list(zone) for zone in zones]
+        self.mw.settings.setValue(key, format_zones(self.zones))
+
+class MotionSignals(QObject):
+    zoneLevels = pyqtSignal(str)
+
 class VideoConfigure(QWidget):
     def __init__(self, mw):
         try:
             super().__init__()
             self.mw = mw
+            self.signals = MotionSignals()
+            self.signals.zoneLevels.connect(self.showZoneLevels)
             self.name = MODULE_NAME
             self.source = None
             self.media = None
             self.initialized = False
+            self.scaleWidthKey = "Module/" + MODULE_NAME + "/scaleWidth"
+            self.learningRateKey = "Module/" + MODULE_NAME + "/learningRate"
             
             self.chkShow = QCheckBox("Show Diff Image")
             self.barLevel = WarningBar()
@@ -75,10 +93,47 @@ class VideoConfigure(QWidget):
             lytSlide.addWidget(QLabel(),       0, 2, 1, 1)
             lytSlide.setRowStretch(1, 10)
             
+            # the background model works on a reduced copy of the frame
+            self.cmbEngine = ComboSelector(mw, "Engine", ("Frame Difference", "Background Model"), "Frame Difference", MODULE_NAME)
+            self.cmbEngine.cmbBox.currentTextChanged.connect(self.cmbEngineChanged)
+
+            self.spnScaleWidth = QSpinBox()
+            self.lblScaleWidth = QLabel("Scale Width")
+            self.spnScaleWidth.setRange(80, 1920)
+            self.spnScaleWidth.setSingleStep(80)
+            self.spnScaleWidth.setValue(int(self.mw.settings.value(self.scaleWidthKey, 320)))
+            self.spnScaleWidth.valueChanged.connect(self.spnScaleWidthChanged)
+
+            self.spnLearningRate = QSpinBox()
+            self.lblLearningRate = QLabel("Learning Rate (%)")
+            self.spnLearningRate.setRange(1, 50)
+            self.spnLearningRate.setValue(int(self.mw.settings.value(self.learningRateKey, 5)))
+            self.spnLearningRate.valueChanged.connect(self.spnLearningRateChanged)
+
+            grpEngine = QGroupBox("System wide motion parameters")
+            lytEngine = QGridLayout(grpEngine)
+            lytEngine.addWidget(self.cmbEngine,       0, 0, 1, 4)
+            lytEngine.addWidget(self.lblScaleWidth,   1, 0, 1, 1)
+            lytEngine.addWidget(self.spnScaleWidth,   1, 1, 1, 1)
+            lytEngine.addWidget(self.lblLearningRate, 1, 2, 1, 1)
+            lytEngine.addWidget(self.spnLearningRate, 1, 3, 1, 1)
+            self.cmbEngineChanged(self.cmbEngine.currentText())
+
+            # per camera zones, the level is the highest zone score when zones are set
+            self.selZones = ZoneSelector(mw, MODULE_NAME)
+            self.lblZoneLevels = QLabel()
+            self.lblZoneLevels.setWordWrap(True)
+            grpCamera = QGroupBox("Camera motion parameters")
+            lytCamera = QGridLayout(grpCamera)
+            lytCamera.addWidget(self.selZones,       0, 0, 1, 1)
+            lytCamera.addWidget(self.lblZoneLevels,  1, 0, 1, 1)
+
             lytMain = QGridLayout(self)
-            lytMain.addWidget(self.chkShow,  0, 0, 1, 1)
-            lytMain.addWidget(grpSlide,      0, 1, 1, 1)
-            lytMain.addWidget(QLabel(),      1, 0, 1, 2)
+            lytMain.addWidget(grpEngine,     0, 0, 1, 2)
+            lytMain.addWidget(grpCamera,     1, 0, 1, 2)
+            lytMain.addWidget(self.chkShow,  2, 0, 1, 1)
+            lytMain.addWidget(grpSlide,      2, 1, 1, 1)
+            lytMain.addWidget(QLabel(),      3, 0, 1, 2)
 
             self.enableControls(False)
             if camera := self.mw.cameraPanel.getCurrentCamera():
@@ -91,6 +146,20 @@ class VideoConfigure(QWidget):
         except:
             logger.exception("sample configuration failed to load")
 
+    def cmbEngineChanged(self, text):
+        background = text == "Background Model"
+        self.spnScaleWidth.setEnabled(background)
+        self.spnLearningRate.setEnabled(background)
+
+    def spnScaleWidthChanged(self, value):
+        self.mw.settings.setValue(self.scaleWidthKey, value)
+
+    def spnLearningRateChanged(self, value):
+        self.mw.settings.setValue(self.learningRateKey, value)
+
+    def showZoneLevels(self, text):
+        self.lblZoneLevels.setText(text)
+
     def sldGainValueChanged(self, value):
         match self.source:
             case MediaSource.CAMERA:
@@ -108,6 +177,8 @@ class VideoConfigure(QWidget):
                 camera.videoModelSettings = MotionSettings(self.mw, camera)
             self.mw.videoPanel.lblCamera.setText(f'Camera - {camera.name()}')
             self.sldGain.setValue(camera.videoModelSettings.gain)
+            self.selZones.setModelParameters(camera.videoModelSettings)
+            self.lblZoneLevels.setText("")
             self.barLevel.setLevel(0)
             self.indAlarm.setState(0)
             profile = self.mw.cameraPanel.getProfile(camera.uri())
@@ -122,6 +193,8 @@ class VideoConfigure(QWidget):
                 self.mw.filePanel.videoModelSettings = MotionSettings(self.mw)
             self.mw.videoPanel.lblCamera.setText(f'File - {os.path.split(file)[1]}')
             self.sldGain.setValue(self.mw.filePanel.videoModelSettings.gain)
+            self.selZones.setModelParameters(self.mw.filePanel.videoModelSettings)
+            self.lblZoneLevels.setText("")
             self.barLevel.setLevel(0)
             self.indAlarm.setState(0)
             self.enableControls(self.mw.videoPanel.chkEnableFile.isChecked())
@@ -130,7 +203,9 @@ class VideoConfigure(QWidget):
         return type(arg) == MotionSettings
     
     def enableControls(self, state):
-        self.setEnabled(bool(state))
+        self.chkShow.setEnabled(bool(state))
+        self.sldGain.setEnabled(bool(state))
+        self.selZones.setEnabled(bool(state))
 
 class VideoWorker:
     def __init__(self, mw):
@@ -141,6 +216,8 @@ class VideoWorker:
             self.first_pass = True
             self.kernel = np.array((9, 9), dtype=np.uint8)
             self.last_alarm_state = False
+            # all state is kept on the player, so streams can be analyzed in parallel
+            self.thread_safe = True
 
         except:
             logger.exception("sample worker failed to load")
@@ -156,7 +233,6 @@ class VideoWorker:
                 return
 
             img = np.array(F, copy = False)
-            img = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
 
             if not self.mw.videoConfigure.isModelSettings(player.videoModelSettings):
                 if player.isCameraStream():
@@ -174,23 +250,56 @@ class VideoWorker:
                 raise Exception("Unable to set video model parameters for player")
 
             level = 0
-            diff = img
-            if player.last_image is not None:
-                diff = cv2.subtract(img, player.last_image)
-                diff = cv2.medianBlur(diff, 3)
-                diff = cv2.adaptiveThreshold(diff, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 3)
-                diff = cv2.medianBlur(diff, 3)
-                diff = cv2.morphologyEx(diff, cv2.MORPH_CLOSE, self.kernel, iterations=1)
+            motion = None
+            if self.mw.videoConfigure.cmbEngine.currentText() == "Background Model":
+                model = player.motion_model
+                if model is None:
+                    model = player.motion_model = BackgroundModel()
+                width = self.mw.videoConfigure.spnScaleWidth.value()
+                if model.width != width:
+                    model.width = width
+                    model.size = None
+                model.alpha = self.mw.videoConfigure.spnLearningRate.value() / 100
 
-                motion = diff.sum() / (diff.shape[0] * diff.shape[1])
-                level = math.exp(0.2 * (player.videoModelSettings.gain - 50)) * motion
+                # scaled the same as the frame difference so the gain setting carries over
+                diff = model.apply(img)
+                motion = 255 * cv2.countNonZero(diff) / diff.size
+                player.last_image = None
+            else:
+                player.motion_model = None
+                img = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+                diff = img
+                if player.last_image is not None:
+                    diff = cv2.subtract(img, player.last_image)
+                    diff = cv2.medianBlur(diff, 3)
+                    diff = cv2.adaptiveThreshold(diff, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 3)
+                    diff = cv2.medianBlur(diff, 3)
+                    diff = cv2.morphologyEx(diff, cv2.MORPH_CLOSE, self.kernel, iterations=1)
+
+                    motion = diff.sum() / (diff.shape[0] * diff.shape[1])
 
-            player.last_image = img
+                player.last_image = img
+
+            if motion is not None:
+                gain = math.exp(0.2 * (player.videoModelSettings.gain - 50))
+                level = gain * motion
+                # zone scores are the mean of the mask inside each zone, on the same scale as the
+                # whole frame, so motion outside the zones never raises the alarm
+                if zones := player.videoModelSettings.zones:
+                    if player.zone_map is None or player.zone_map.zones != zones:
+                        player.zone_map = ZoneMap(zones)
+                    player.zone_levels = (gain * player.zone_map(diff)).tolist()
+                    level = max(player.zone_levels)
+                else:
+                    player.zone_map = None
+                    player.zone_levels = []
 
             alarmState = level > 1.0
 
             if player.uri == self.mw.glWidget.focused_uri:
                 self.mw.videoConfigure.barLevel.setLevel(level)
+                if len(player.zone_levels):
+                    self.mw.videoConfigure.signals.zoneLevels.emit("  ".join([f'Zone {i + 1}: {zone_level:.2f}' for i, zone_level in enumerate(player.zone_levels)]))
                 if alarmState:
                     self.mw.videoConfigure.indAlarm.setState(1)
 
@@ -27,6 +27,7 @@
 #**********************************************************************/
 
 IMPORT_ERROR = ""
+TORCH_ERROR = ""
 MODULE_NAME = "yolov8"
 
 try:
@@ -37,19 +38,27 @@ try:
     from typing import Tuple
     import numpy as np
     from pathlib import Path
-    from gui.components import ComboSelector, FileSelector, ThresholdSlider, TargetSelector
+    from gui.components import ComboSelector, FileSelector, ThresholdSlider, TargetSelector, ReuseSelector, GateSelector, \
+        RegionSelector
+    from gui.analysis import InferenceBatcher, Letterbox, ResultSequencer, DetectionCache, MotionGate, model_cache, \
+        postprocess_yolov8, parse_regions, format_regions, region_crops, RegionResult
     from gui.onvif.datastructures import MediaSource
     from PyQt6.QtWidgets import QWidget, QGridLayout, QLabel, QCheckBox, QMessageBox, \
         QGroupBox, QSpinBox, QDialog
     from PyQt6.QtCore import Qt, QSize, QObject, pyqtSignal
     from PyQt6.QtGui import QMovie
-    import cv2
-    import torch
-    from torchvision.transforms import functional
-    from ultralytics import YOLO
-    from ultralytics.utils import ops
     if sys.platform != "darwin":
         import openvino as ov
+    try:
+        import torch
+        from ultralytics import YOLO
+        from ultralytics.utils import ops
+    except ModuleNotFoundError as ex:
+        # an exported OpenVINO model can be run without torch
+        if sys.platform == "darwin":
+            raise ex
+        torch = None
+        TORCH_ERROR = str(ex)
 
 except ModuleNotFoundError as ex:
     IMPORT_ERROR = str(ex)
@@ -90,9 +99,9 @@ class YoloV8Settings():
         self.limit = self.getModelOutputLimit()
         self.confidence = self.getModelConfidence()
         self.show = self.getModelShowBoxes()
-        self.skipFrames = self.getSkipFrames()
-        self.skipCounter = 0
         self.sampleSize = self.getSampleSize()
+        self.regions = self.getRegions()
+        self.tileRegions = self.getTileRegions()
         self.orig_img = None
         self.input_hw = None
 
@@ -145,15 +154,6 @@ class YoloV8Settings():
         self.show = value
         self.mw.settings.setValue(key, int(value))
 
-    def getSkipFrames(self):
-        key = f'{self.id}/{MODULE_NAME}/SkipFrames'
-        return int(self.mw.settings.value(key, 0))
-
-    def setSkipFrames(self, value):
-        key = f'{self.id}/{MODULE_NAME}/SkipFrames'
-        self.skipFrames = int(value)
-        self.mw.settings.setValue(key, int(value))
-
     def getSampleSize(self):
         key = f'{self.id}/{MODULE_NAME}/SampleSize'
         return int(self.mw.settings.value(key, 1))
@@ -163,9 +163,28 @@ class YoloV8Settings():
         self.sampleSize = int(value)
         self.mw.settings.setValue(key, int(value))        
 
+    def getRegions(self):
+        key = f'{self.id}/{MODULE_NAME}/Regions'
+        return parse_regions(self.mw.settings.value(key, ""))
+
+    def setRegions(self, regions):
+        key = f'{self.id}/{MODULE_NAME}/Regions'
+        self.regions = list(regions)
+        self.mw.settings.setValue(key, format_regions(self.regions))
+
+    def getTileRegions(self):
+        key = f'{self.id}/{MODULE_NAME}/TileRegions'
+        return bool(int(self.mw.settings.value(key, 0)))
+
+    def setTileRegions(self, value):
+        key = f'{self.id}/{MODULE_NAME}/TileRegions'
+        self.tileRegions = bool(value)
+        self.mw.settings.setValue(key, int(value))
+
 class YoloV8Signals(QObject):
     showWaitDialog = pyqtSignal()
     hideWaitDialog = pyqtSignal()
+    batchStats = pyqtSignal(str)
 
 class VideoConfigure(QWidget):
     def __init__(self, mw):
@@ -176,7 +195,11 @@ class VideoConfigure(QWidget):
             self.source = None
             self.media = None
             self.initialized = False
+            self.full_resolution = True
             self.autoKey = "Module/" + MODULE_NAME + "/autoDownload"
+            self.batchSizeKey = "Module/" + MODULE_NAME + "/batchSize"
+            self.batchWaitKey = "Module/" + MODULE_NAME + "/batchWait"
+            self.inferRequestsKey = "Module/" + MODULE_NAME + "/inferRequests"
 
             if len(IMPORT_ERROR):
                 self.mw.videoPanel.lblCamera.setText(f'Configuration error - {IMPORT_ERROR}')
@@ -186,6 +209,7 @@ class VideoConfigure(QWidget):
             self.signals = YoloV8Signals()
             self.signals.showWaitDialog.connect(self.showWaitDialog)
             self.signals.hideWaitDialog.connect(self.hideWaitDialog)
+            self.signals.batchStats.connect(self.showBatchStats)
             
             self.chkAuto = QCheckBox("Automatically download model")
             self.chkAuto.setChecked(int(self.mw.settings.value(self.autoKey, 1)))
@@ -197,23 +221,26 @@ class VideoConfigure(QWidget):
             self.model_names = {"nano" : "yolov8n.pt", "small" : "yolov8s.pt", "medium" : "yolov8m.pt", "large" : "yolov8l.pt", "XL" : "yolov8x.pt"}
             self.cmbModelName = ComboSelector(mw, "Name", self.model_names.keys(), "small", MODULE_NAME)
 
-            apis = ["PyTorch"]
+            apis = []
+            if torch:
+                apis.append("PyTorch")
             if sys.platform != "darwin":
                 apis.append("OpenVINO")
             
             self.cmbAPI = ComboSelector(mw, "API", apis, "PyTorch", MODULE_NAME)
             self.cmbAPI.cmbBox.currentTextChanged.connect(self.cmbAPIChanged)
+
+            postprocessors = ["NumPy"]
+            if torch:
+                postprocessors.append("PyTorch")
+            self.cmbPostprocess = ComboSelector(mw, "Postprocess", postprocessors, "NumPy", MODULE_NAME)
             self.fixRes()
 
             self.cmbDevice = ComboSelector(mw, "Device", self.getDevices(self.cmbAPI.currentText()), "AUTO", MODULE_NAME)
 
             self.sldConfThre = ThresholdSlider(mw, "Confidence", MODULE_NAME)
             self.selTargets = TargetSelector(self.mw, MODULE_NAME)
-
-            self.spnSkipFrames = QSpinBox()
-            self.lblSkipFrames = QLabel("Skip Frames")
-            self.spnSkipFrames.setValue(0)
-            self.spnSkipFrames.valueChanged.connect(self.spnSkipFramesChanged)
+            self.selRegions = RegionSelector(self.mw, MODULE_NAME)
 
             self.spnSampleSize = QSpinBox()
             self.lblSampleSize = QLabel("Sample Size")
@@ -221,6 +248,31 @@ class VideoConfigure(QWidget):
             self.spnSampleSize.setValue(1)
             self.spnSampleSize.valueChanged.connect(self.spnSampleSizeChanged)
 
+            self.spnBatchSize = QSpinBox()
+            self.lblBatchSize = QLabel("Batch Size")
+            self.spnBatchSize.setMinimum(1)
+            self.spnBatchSize.setMaximum(32)
+            self.spnBatchSize.setValue(int(self.mw.settings.value(self.batchSizeKey, 8)))
+            self.spnBatchSize.valueChanged.connect(self.spnBatchSizeChanged)
+
+            self.spnBatchWait = QSpinBox()
+            self.lblBatchWait = QLabel("Batch Wait (ms)")
+            self.spnBatchWait.setMaximum(1000)
+            self.spnBatchWait.setValue(int(self.mw.settings.value(self.batchWaitKey, 20)))
+            self.spnBatchWait.valueChanged.connect(self.spnBatchWaitChanged)
+
+            self.spnInferRequests = QSpinBox()
+            self.lblInferRequests = QLabel("Infer Requests")
+            self.spnInferRequests.setMaximum(32)
+            self.spnInferRequests.setSpecialValueText("Auto")
+            self.spnInferRequests.setValue(int(self.mw.settings.value(self.inferRequestsKey, 0)))
+            self.spnInferRequests.valueChanged.connect(self.spnInferRequestsChanged)
+
+            self.selReuse = ReuseSelector(mw, MODULE_NAME)
+            self.selGate = GateSelector(mw, MODULE_NAME)
+
+            self.lblBatchStats = QLabel()
+
             grpSystem = QGroupBox("System wide model parameters")
             lytSystem = QGridLayout(grpSystem)
             lytSystem.addWidget(self.chkAuto,      0, 0, 1, 4)
@@ -229,15 +281,23 @@ class VideoConfigure(QWidget):
             lytSystem.addWidget(self.cmbRes,       2, 2, 1, 2)
             lytSystem.addWidget(self.cmbAPI,       3, 0, 1, 2)
             lytSystem.addWidget(self.cmbDevice,    3, 2, 1, 2)
+            lytSystem.addWidget(self.lblBatchSize, 4, 0, 1, 1)
+            lytSystem.addWidget(self.spnBatchSize, 4, 1, 1, 1)
+            lytSystem.addWidget(self.lblBatchWait, 4, 2, 1, 1)
+            lytSystem.addWidget(self.spnBatchWait, 4, 3, 1, 1)
+            lytSystem.addWidget(self.lblInferRequests, 5, 0, 1, 1)
+            lytSystem.addWidget(self.spnInferRequests, 5, 1, 1, 1)
+            lytSystem.addWidget(self.cmbPostprocess, 5, 2, 1, 2)
+            lytSystem.addWidget(self.selReuse,     6, 0, 1, 4)
+            lytSystem.addWidget(self.selGate,      7, 0, 1, 4)
+            lytSystem.addWidget(self.lblBatchStats, 8, 0, 1, 4)
 
             self.grpCamera = QGroupBox("Check camera video alarm to enable")
             lytCamera = QGridLayout(self.grpCamera)
             lytCamera.addWidget(self.sldConfThre,    0, 0, 1, 4)
-            lytCamera.addWidget(self.lblSkipFrames,  1, 0, 1, 1)
-            lytCamera.addWidget(self.spnSkipFrames,  1, 1, 1, 1)
-            lytCamera.addWidget(self.lblSampleSize,  1, 2, 1, 1)
-            lytCamera.addWidget(self.spnSampleSize,  1, 3, 1, 1)
-            lytCamera.addWidget(QLabel(),            2, 0, 1, 4)
+            lytCamera.addWidget(self.lblSampleSize,  1, 0, 1, 1)
+            lytCamera.addWidget(self.spnSampleSize,  1, 1, 1, 1)
+            lytCamera.addWidget(self.selRegions,     2, 0, 1, 4)
             lytCamera.addWidget(self.selTargets,     3, 0, 1, 4)
 
             lytMain = QGridLayout(self)
@@ -264,14 +324,17 @@ class VideoConfigure(QWidget):
         self.mw.settings.setValue(self.autoKey, state)
         self.txtFilename.setEnabled(not self.chkAuto.isChecked())
 
-    def spnSkipFramesChanged(self, value):
-        if self.source == MediaSource.CAMERA:
-            if self.media:
-                if self.media.videoModelSettings:
-                    self.media.videoModelSettings.setSkipFrames(value)
-        if self.source == MediaSource.FILE:
-            if self.mw.filePanel.videoModelSettings:
-                self.mw.filePanel.videoModelSettings.setSkipFrames(value)
+    def spnBatchSizeChanged(self, value):
+        self.mw.settings.setValue(self.batchSizeKey, value)
+
+    def spnBatchWaitChanged(self, value):
+        self.mw.settings.setValue(self.batchWaitKey, value)
+
+    def spnInferRequestsChanged(self, value):
+        self.mw.settings.setValue(self.inferRequestsKey, value)
+
+    def showBatchStats(self, text):
+        self.lblBatchStats.setText(text)
 
     def spnSampleSizeChanged(self, value):
         if self.source == MediaSource.CAMERA:
@@ -287,7 +350,7 @@ class VideoConfigure(QWidget):
         devices = []
         if api == "OpenVINO" and sys.platform != "darwin":
             devices = ["AUTO"] + ov.Core().available_devices
-        if api == "PyTorch":
+        if api == "PyTorch" and torch:
             devices = ["auto", "cpu"]
             if torch.cuda.is_available():
                 devices.append("cuda")
@@ -308,6 +371,8 @@ class VideoConfigure(QWidget):
             self.cmbRes.cmbBox.setEnabled(False)
         else:
             self.cmbRes.cmbBox.setEnabled(True)
+        # the post processing choice only applies to the raw OpenVINO output
+        self.cmbPostprocess.setEnabled(api == "OpenVINO")
 
     def setCamera(self, camera):
         self.source = MediaSource.CAMERA
@@ -318,9 +383,9 @@ class VideoConfigure(QWidget):
                 camera.videoModelSettings = YoloV8Settings(self.mw, camera)
             self.mw.videoPanel.lblCamera.setText(f'Camera - {camera.name()}')
             self.sldConfThre.setValue(camera.videoModelSettings.confidence)
-            self.spnSkipFrames.setValue(camera.videoModelSettings.skipFrames)
             self.spnSampleSize.setValue(camera.videoModelSettings.sampleSize)
             self.selTargets.setModelParameters(camera.videoModelSettings)
+            self.selRegions.setModelParameters(camera.videoModelSettings)
             if profile := self.mw.cameraPanel.getProfile(camera.uri()):
                 self.enableControls(profile.getAnalyzeVideo())
 
@@ -336,9 +401,9 @@ class VideoConfigure(QWidget):
                 file_dir = "Directory"
             self.mw.videoPanel.lblCamera.setText(f'{file_dir} - {os.path.split(file)[1]}')
             self.sldConfThre.setValue(self.mw.filePanel.videoModelSettings.confidence)
-            self.spnSkipFrames.setValue(self.mw.filePanel.videoModelSettings.skipFrames)
             self.spnSampleSize.setValue(self.mw.filePanel.videoModelSettings.sampleSize)
             self.selTargets.setModelParameters(self.mw.filePanel.videoModelSettings)
+            self.selRegions.setModelParameters(self.mw.filePanel.videoModelSettings)
             self.enableControls(self.mw.videoPanel.chkEnableFile.isChecked())
 
     def isModelSettings(self, arg):
@@ -368,6 +433,10 @@ class VideoWorker:
             self.mw = mw
             self.last_ex = ""
 
+            if batcher := getattr(self, "batcher", None):
+                batcher.stop()
+            self.batcher = None
+
             if self.mw.videoConfigure.name != MODULE_NAME or len(IMPORT_ERROR) > 0 or self.mw.glWidget.model_loading:
                 return
             
@@ -381,6 +450,7 @@ class VideoWorker:
             self.mw.videoConfigure.selTargets.barLevel.setLevel(0)
 
             self.model = None
+            self.postprocessor = self.mw.videoConfigure.cmbPostprocess.currentText()
             self.torch_device_name = None
             self.ov_device = None
             self.compiled_model = None
@@ -388,8 +458,15 @@ class VideoWorker:
 
             self.api = self.mw.videoConfigure.cmbAPI.currentText()
             self.res = int(self.mw.videoConfigure.cmbRes.currentText())
-            initializer_data = torch.rand(1, 3, self.res, self.res)
+            initializer_data = np.random.rand(1, 3, self.res, self.res).astype(np.float32)
             self.model_name = self.mw.videoConfigure.getModelName()
+            self.batch_size = self.mw.videoConfigure.spnBatchSize.value()
+            self.letterbox = Letterbox(self.res, self.batch_size)
+            self.sequencer = ResultSequencer()
+            self.detection_cache = DetectionCache(self.mw.videoConfigure.selReuse.maxAge())
+            self.motion_gate = MotionGate()
+            # zero lets the device pick its optimal number of requests
+            self.infer_requests = self.mw.videoConfigure.spnInferRequests.value()
 
             self.api = self.mw.videoConfigure.cmbAPI.currentText()
             if self.api == "PyTorch":
@@ -397,10 +474,19 @@ class VideoWorker:
             if self.api == "OpenVINO":
                 self.ov_device = self.mw.videoConfigure.cmbDevice.currentText()
 
-            if self.api == "OpenVINO" and Path(self.get_ov_model_filename()).is_file() and sys.platform != "darwin":
+            custom_file = "" if self.mw.videoConfigure.chkAuto.isChecked() else self.mw.videoConfigure.txtFilename.text()
+            cache_key = (MODULE_NAME, self.model_name, custom_file, self.res, self.api, 
+                         self.mw.videoConfigure.cmbDevice.currentText(), self.batch_size)
+            if cached := model_cache.get(cache_key):
+                self.model, self.compiled_model, self.torch_device_name = cached
+                ov_model = self.compiled_model
+
+            if self.api == "OpenVINO" and not ov_model and Path(self.get_ov_model_filename()).is_file() and sys.platform != "darwin":
                 ov_model = ov.Core().read_model(self.get_ov_model_filename())
             
-            if (self.api == "OpenVINO" and not ov_model) or self.api == "PyTorch":
+            if (self.api == "OpenVINO" and not ov_model) or (self.api == "PyTorch" and not self.model):
+                if not torch:
+                    raise Exception(f'No exported OpenVINO model was found, export requires {TORCH_ERROR}')
                 self.torch_device_name = "cpu"
                 if self.api == "PyTorch":
                     if torch.cuda.is_available():
@@ -425,55 +511,117 @@ class VideoWorker:
                             torch.hub.download_url_to_file(link, self.ckpt_file)
                         self.mw.videoConfigure.signals.hideWaitDialog.emit()
                 else:
-                    self.ckpt_file = self.configure.txtFilename.text()
+                    self.ckpt_file = self.mw.videoConfigure.txtFilename.text()
 
                 self.model = YOLO(Path(self.ckpt_file))
-                self.model.predict(initializer_data, stream=True, verbose=False, device=self.torch_device_name)
+                self.model.predict(torch.from_numpy(initializer_data), stream=True, verbose=False, device=self.torch_device_name)
 
-            if self.api == "OpenVINO" and sys.platform != "darwin":
+            if self.api == "OpenVINO" and sys.platform != "darwin" and not self.compiled_model:
                 if not ov_model:
                     self.model.export(format='openvino')
                     ov_path = Path(self.get_ov_model_filename()).absolute()
                     if ov_path.exists():
                         core = ov.Core()
                         ov_model = core.read_model(ov_path)
-                        if self.ov_device != "CPU":
-                            ov_model.reshape({0: [1, 3, self.res, self.res]})
 
-                ov_config = {}
+                # frames from several cameras are stacked into a single input tensor
+                ov_model.reshape({0: [ov.Dimension(1, self.batch_size), 3, self.res, self.res]})
+
+                ov_config = {"CACHE_DIR": model_cache.compile_dir(MODULE_NAME)}
                 if "GPU" in self.ov_device or ("AUTO" in self.ov_device and "GPU" in ov.Core().available_devices):
-                    ov_config = {"GPU_DISABLE_WINOGRAD_CONVOLUTION": "YES"}
+                    ov_config["GPU_DISABLE_WINOGRAD_CONVOLUTION"] = "YES"
 
                 self.compiled_model = ov.compile_model(ov_model, self.ov_device, ov_config)
                 self.compiled_model(initializer_data)
-                self.infer_queue = ov.AsyncInferQueue(self.compiled_model)
+
+            model_cache.put(cache_key, (self.model, self.compiled_model, self.torch_device_name))
+
+            if self.compiled_model:
+                self.infer_queue = ov.AsyncInferQueue(self.compiled_model, self.infer_requests)
                 self.infer_queue.set_callback(self.callback)
 
+            self.batcher = InferenceBatcher(self.run_batch, self.batch_size, self.mw.videoConfigure.spnBatchWait.value() / 1000)
+            self.batcher.statsCallback = self.batch_stats
+
         except Exception as ex:
             logger.exception(MODULE_NAME + " initialization failure")
             self.mw.signals.error.emit(f'{MODULE_NAME} initialization failure - {ex}')
 
         self.mw.glWidget.model_loading = False
 
-    def callback(self, infer_request, player):
+    def callback(self, infer_request, batch):
         try:
             if self.mw.glWidget.model_loading:
                 return
-            
-            player.lock()
+
             results = infer_request.get_output_tensor(0).data
+            for i, (result, crop, origin, sig, ratio, offset) in enumerate(batch):
+                conf_thre = result.player.videoModelSettings.confidence / 100
+                if self.postprocessor == "PyTorch" and torch:
+                    detections = self.postprocess(pred_boxes=results[i:i+1], input_hw=[self.res, self.res], 
+                                                  orig_img=crop, min_conf_threshold=conf_thre)[0]['det']
+                    detections = detections.cpu().numpy() if len(detections) else np.empty((0, 6))
+                else:
+                    detections = postprocess_yolov8(results[i], ratio, offset, crop.shape, conf_thre)
+                self.collect(result, detections, origin, sig)
+
+        except Exception as ex:
+            logger.exception(f'{MODULE_NAME} callback error: {ex}')
+
+    def run_batch(self, batch):
+        if self.mw.glWidget.model_loading:
+            return
+
+        if self.api == "PyTorch":
+            batch = [item for item in batch if len(item[0].videoModelSettings.targets)]
+            if not len(batch):
+                return
 
-            boxes = []
-            detections = self.postprocess(pred_boxes=results, input_hw=[self.res, self.res], orig_img=player.videoModelSettings.orig_img)
-            detections = detections[0]['det']
-            if not isinstance(detections, list):
-                detections = detections.cpu().numpy()
-                for detection in detections:
-                    if detection[5] in player.videoModelSettings.targets:
-                        boxes.append(detection)
-
-            player.boxes = boxes
-            result = player.processModelOutput()
+        # frames are cut into their regions of interest, the pieces are run as one
+        # batch and put back together in full frame coordinates by the RegionResult
+        parts = []
+        for player, img, sig in batch:
+            tile = self.res * 2 if player.videoModelSettings.tileRegions else 0
+            crops = region_crops(img, player.videoModelSettings.regions, tile)
+            result = RegionResult(player, img, len(crops), self.sequencer.next(player.uri))
+            parts += [(result, crop, origin, sig) for crop, origin in crops]
+
+        if self.api == "PyTorch":
+            # the model runs once with the loosest settings, each player then keeps its own
+            conf_thre = min([player.videoModelSettings.confidence for player, _, _ in batch]) / 100
+            targets = sorted(set().union(*[player.videoModelSettings.targets for player, _, _ in batch]))
+            results = self.model.predict([crop for _, crop, _, _ in parts], stream=False, verbose=False,
+                                         classes=targets, conf=conf_thre,
+                                         imgsz=self.res, device=self.torch_device_name)
+
+            for (result, _, origin, sig), output in zip(parts, results):
+                self.collect(result, output.boxes.data.cpu().numpy(), origin, sig)
+
+        if self.api == "OpenVINO":
+            for i in range(0, len(parts), self.batch_size):
+                chunk = parts[i:i+self.batch_size]
+                input_tensor, ratios, offsets = self.letterbox([crop for _, crop, _, _ in chunk])
+                userdata = [(result, crop, origin, sig, ratio, offset) 
+                            for (result, crop, origin, sig), ratio, offset in zip(chunk, ratios, offsets)]
+                self.infer_queue.start_async({0: input_tensor}, userdata, False)
+
+    def collect(self, result, detections, origin, sig):
+        # publishes once the last piece of a frame is in, unless a newer frame got there first
+        merged = result.add(detections, origin)
+        if merged is None or not self.sequencer.accept(result.player.uri, result.seq):
+            return
+        player = result.player
+        keep = np.isin(merged[:, 5], player.videoModelSettings.targets) & \
+               (merged[:, 4] >= player.videoModelSettings.confidence / 100)
+        self.detection_cache.store(player.uri, sig, merged[keep])
+        self.publish(player, merged[keep])
+
+    def publish(self, player, boxes):
+        try:
+            # alarm handling may start players, it is kept outside the player lock
+            with player.thread_lock:
+                player.boxes = boxes
+                result = player.processModelOutput()
             alarmState = result >= player.videoModelSettings.limit if result else False
             player.handleAlarm(alarmState)
 
@@ -490,9 +638,17 @@ class VideoWorker:
                         self.mw.videoConfigure.selTargets.indAlarm.setState(1)
 
         except Exception as ex:
-            logger.exception(f'{MODULE_NAME} callback error: {ex}')
-
-        player.unlock()
+            logger.exception(f'{MODULE_NAME} publish error: {ex}')
+
+    def batch_stats(self, batcher):
+        text = f'Average batch size: {batcher.average_batch_size:.1f}  (last {batcher.last_batch_size} of {batcher.max_batch_size})'
+        if self.compiled_model:
+            text += f'  Infer requests: {len(self.infer_queue)}'
+        if self.mw.videoConfigure.selReuse.isChecked():
+            text += f'  {self.detection_cache}'
+        if self.mw.videoConfigure.selGate.isChecked():
+            text += f'  {self.motion_gate}'
+        self.mw.videoConfigure.signals.batchStats.emit(text)
 
     def __call__(self, F, player):
         try:
@@ -518,48 +674,22 @@ class VideoWorker:
             if not player.videoModelSettings:
                 raise Exception("Unable to set video model parameters for player")
 
-            if player.videoModelSettings.skipCounter < player.videoModelSettings.skipFrames:
-                player.videoModelSettings.skipCounter += 1
-                return
-            player.videoModelSettings.skipCounter = 0
-
-            conf_thre = player.videoModelSettings.confidence / 100
-            targets = player.videoModelSettings.targets
-            res = int(self.mw.videoConfigure.cmbRes.currentText())
-
-            player.lock()
-            player.videoModelSettings.orig_img = np.array(F, copy=False)
-
-            if self.api == "PyTorch" and len(targets):
-                results = self.model.predict(player.videoModelSettings.orig_img, stream=True, verbose=False,
-                                         classes=targets, conf=conf_thre,
-                                         imgsz=res, device=self.torch_device_name)
-                for result in results:
-                    player.boxes = result.boxes.xyxy.cpu().numpy()
-            
-            if self.api == "OpenVINO":
-                preprocessed_image = self.preprocess_image(player.videoModelSettings.orig_img)
-                input_tensor = self.image_to_tensor(preprocessed_image)
-                player.videoModelSettings.input_hw = input_tensor.shape[2:]
-                self.infer_queue.wait_all()
-                self.infer_queue.start_async({0: input_tensor}, player, False)
-
-            if self.api == "PyTorch":
-                result = player.processModelOutput()
-                alarmState = result >= player.videoModelSettings.limit if result else False
-                player.handleAlarm(alarmState)
-
-                if camera:
-                    if camera.isFocus():
-                        level = 0
-                        if player.videoModelSettings.limit:
-                            level = result / player.videoModelSettings.limit
-                        else:
-                            if result:
-                                level = 1.0
-                        self.mw.videoConfigure.selTargets.barLevel.setLevel(level)
-                        if alarmState:
-                            self.mw.videoConfigure.selTargets.indAlarm.setState(1)
+            if self.batcher:
+                self.batcher.max_wait = self.mw.videoConfigure.spnBatchWait.value() / 1000
+                self.postprocessor = self.mw.videoConfigure.cmbPostprocess.currentText()
+                if self.api == "PyTorch":
+                    self.batcher.max_batch_size = self.mw.videoConfigure.spnBatchSize.value()
+                img = np.array(F, copy=False)
+                boxes, sig = None, None
+                if not self.motion_gate.check(self.mw.videoConfigure.selGate, player, img):
+                    boxes = []
+                elif self.mw.videoConfigure.selReuse.isChecked():
+                    self.detection_cache.max_age = self.mw.videoConfigure.selReuse.maxAge()
+                    boxes, sig = self.detection_cache.lookup(player.uri, img)
+                if boxes is not None:
+                    self.publish(player, boxes)
+                else:
+                    self.batcher.submit(player.uri, (player, img, sig))
 
             if self.parameters_changed():
                 self.__init__(self.mw)
@@ -569,14 +699,14 @@ class VideoWorker:
                 logger.exception(f'{MODULE_NAME} runtime error - {ex}')
             self.last_ex = str(ex)
 
-        player.unlock()
-
     def parameters_changed(self):
         result = False
 
         api = self.api == self.mw.videoConfigure.cmbAPI.currentText()
         name = self.model_name == self.mw.videoConfigure.getModelName()
         res = str(self.res) == self.mw.videoConfigure.cmbRes.currentText()
+        batch = self.api != "OpenVINO" or self.batch_size == self.mw.videoConfigure.spnBatchSize.value()
+        jobs = self.api != "OpenVINO" or self.infer_requests == self.mw.videoConfigure.spnInferRequests.value()
 
         dev = False
         if self.api == "PyTorch":
@@ -586,7 +716,7 @@ class VideoWorker:
         if self.api == "OpenVINO":
             dev = self.ov_device == self.mw.videoConfigure.cmbDevice.currentText()
 
-        if not api or not name or not res or not dev:
+        if not api or not name or not res or not dev or not batch or not jobs:
             result = True
 
         return result
@@ -620,55 +750,17 @@ class VideoWorker:
 
         return results
 
-    def image_to_tensor(self, image:np.ndarray):
-        input_tensor = image.astype(np.float32)
-        input_tensor /= 255.0
-        
-        if input_tensor.ndim == 3:
-            input_tensor = np.expand_dims(input_tensor, 0)
-        return input_tensor
-
-    def preprocess_image(self, img0: np.ndarray):
-        img = self.letterbox(img0)[0]
-        img = img.transpose(2, 0, 1)
-        img = np.ascontiguousarray(img)
-        return img
-
-    def letterbox(self, img: np.ndarray, new_shape:Tuple[int, int] = (640, 640), color:Tuple[int, int, int] = (114, 114, 114), auto:bool = False, scale_fill:bool = False, scaleup:bool = False, stride:int = 32):
-        shape = img.shape[:2]  # current shape [height, width]
-        if isinstance(new_shape, int):
-            new_shape = (new_shape, new_shape)
-
-        # Scale ratio (new / old)
-        r = min(new_shape[0] / shape[0], new_shape[1] / shape[1])
-        if not scaleup:  # only scale down, do not scale up (for better test mAP)
-            r = min(r, 1.0)
-
-        # Compute padding
-        ratio = r, r  # width, height ratios
-        new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
-        dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]  # wh padding
-        if auto:  # minimum rectangle
-            dw, dh = np.mod(dw, stride), np.mod(dh, stride)  # wh padding
-        elif scale_fill:  # stretch
-            dw, dh = 0.0, 0.0
-            new_unpad = (new_shape[1], new_shape[0])
-            ratio = new_shape[1] / shape[1], new_shape[0] / shape[0]  # width, height ratios
-
-        dw /= 2  # divide padding into 2 sides
-        dh /= 2
-
-        if shape[::-1] != new_unpad:  # resize
-            img = cv2.resize(img, new_unpad, interpolation=cv2.INTER_LINEAR)
-        top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
-        left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
-        img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)  # add border
-        return img, ratio, (dw, dh)
+    def get_hub_dir(self):
+        if torch:
+            return torch.hub.get_dir()
+        # same location torch.hub would use, so previously exported models are found
+        torch_home = os.getenv("TORCH_HOME", os.path.join(os.getenv("XDG_CACHE_HOME", "~/.cache"), "torch"))
+        return os.path.join(os.path.expanduser(torch_home), "hub")
 
     def get_ov_model_filename(self):
         model_name = Path(self.mw.videoConfigure.getModelName()).stem
-        return Path(f'{torch.hub.get_dir()}/checkpoints/{model_name}_openvino_model/{model_name}.xml').absolute() 
+        return Path(f'{self.get_hub_dir()}/checkpoints/{model_name}_openvino_model/{model_name}.xml').absolute() 
 
     def get_auto_ckpt_filename(self):
-        return Path(f'{torch.hub.get_dir()}/checkpoints/{self.mw.videoConfigure.getModelName()}').absolute()
+        return Path(f'{self.get_hub_dir()}/checkpoints/{self.mw.videoConfigure.getModelName()}').absolute()
 
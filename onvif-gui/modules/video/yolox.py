@@ -26,7 +26,10 @@ try:
     from loguru import logger
     import numpy as np
     from pathlib import Path
-    from gui.components import ComboSelector, FileSelector, ThresholdSlider, TargetSelector
+    from gui.components import ComboSelector, FileSelector, ThresholdSlider, TargetSelector, ReuseSelector, GateSelector, \
+        RegionSelector
+    from gui.analysis import Letterbox, ResultSequencer, DetectionCache, MotionGate, model_cache, \
+        parse_regions, format_regions, region_crops, RegionResult
     from gui.enums import MediaSource
     from PyQt6.QtWidgets import QWidget, QGridLayout, QLabel, QCheckBox, QMessageBox, \
         QGroupBox, QDialog, QSpinBox
@@ -34,7 +37,6 @@ try:
     from PyQt6.QtGui import QMovie
     import time
     import torch
-    from torchvision.transforms import functional
     import torch.nn as nn
     from yolox.models import YOLOX, YOLOPAFPN, YOLOXHead
     import yolox.utils
@@ -81,9 +83,9 @@ class YoloxSettings():
         self.limit = self.getModelOutputLimit()
         self.confidence = self.getModelConfidence()
         self.show = self.getModelShowBoxes()
-        self.skipFrames = self.getSkipFrames()
-        self.skipCounter = 0
         self.sampleSize = self.getSampleSize()
+        self.regions = self.getRegions()
+        self.tileRegions = self.getTileRegions()
         self.orig_img = None
 
     def getTargets(self):
@@ -135,15 +137,6 @@ class YoloxSettings():
         self.show = value
         self.mw.settings.setValue(key, int(value))
 
-    def getSkipFrames(self):
-        key = f'{self.id}/{MODULE_NAME}/SkipFrames'
-        return int(self.mw.settings.value(key, 0))
-
-    def setSkipFrames(self, value):
-        key = f'{self.id}/{MODULE_NAME}/SkipFrames'
-        self.skipFrames = int(value)
-        self.mw.settings.setValue(key, int(value))
-
     def getSampleSize(self):
         key = f'{self.id}/{MODULE_NAME}/SampleSize'
         return int(self.mw.settings.value(key, 1))
@@ -153,6 +146,24 @@ class YoloxSettings():
         self.sampleSize = int(value)
         self.mw.settings.setValue(key, int(value))        
 
+    def getRegions(self):
+        key = f'{self.id}/{MODULE_NAME}/Regions'
+        return parse_regions(self.mw.settings.value(key, ""))
+
+    def setRegions(self, regions):
+        key = f'{self.id}/{MODULE_NAME}/Regions'
+        self.regions = list(regions)
+        self.mw.settings.setValue(key, format_regions(self.regions))
+
+    def getTileRegions(self):
+        key = f'{self.id}/{MODULE_NAME}/TileRegions'
+        return bool(int(self.mw.settings.value(key, 0)))
+
+    def setTileRegions(self, value):
+        key = f'{self.id}/{MODULE_NAME}/TileRegions'
+        self.tileRegions = bool(value)
+        self.mw.settings.setValue(key, int(value))
+
 class YoloxSignals(QObject):
     showWaitDialog = pyqtSignal()
     hideWaitDialog = pyqtSignal()
@@ -166,7 +177,9 @@ class VideoConfigure(QWidget):
             self.source = None
             self.media = None
             self.initialized = False
+            self.full_resolution = True
             self.autoKey = "Module/" + MODULE_NAME + "/autoDownload"
+            self.inferRequestsKey = "Module/" + MODULE_NAME + "/inferRequests"
 
             if len(IMPORT_ERROR):
                 self.mw.videoPanel.lblCamera.setText(f'Configuration error - {IMPORT_ERROR}')
@@ -196,11 +209,7 @@ class VideoConfigure(QWidget):
 
             self.sldConfThre = ThresholdSlider(mw, "Confidence", MODULE_NAME)
             self.selTargets = TargetSelector(self.mw, MODULE_NAME)
-
-            self.spnSkipFrames = QSpinBox()
-            self.lblSkipFrames = QLabel("Skip Frames")
-            self.spnSkipFrames.setValue(0)
-            self.spnSkipFrames.valueChanged.connect(self.spnSkipFramesChanged)
+            self.selRegions = RegionSelector(self.mw, MODULE_NAME)
 
             self.spnSampleSize = QSpinBox()
             self.lblSampleSize = QLabel("Sample Size")
@@ -208,6 +217,16 @@ class VideoConfigure(QWidget):
             self.spnSampleSize.setValue(1)
             self.spnSampleSize.valueChanged.connect(self.spnSampleSizeChanged)
 
+            self.spnInferRequests = QSpinBox()
+            self.lblInferRequests = QLabel("Infer Requests")
+            self.spnInferRequests.setMaximum(32)
+            self.spnInferRequests.setSpecialValueText("Auto")
+            self.spnInferRequests.setValue(int(self.mw.settings.value(self.inferRequestsKey, 0)))
+            self.spnInferRequests.valueChanged.connect(self.spnInferRequestsChanged)
+
+            self.selReuse = ReuseSelector(mw, MODULE_NAME)
+            self.selGate = GateSelector(mw, MODULE_NAME)
+
             grpSystem = QGroupBox("System wide model parameters")
             lytSystem = QGridLayout(grpSystem)
             lytSystem.addWidget(self.chkAuto,      0, 0, 1, 4)
@@ -216,15 +235,17 @@ class VideoConfigure(QWidget):
             lytSystem.addWidget(self.cmbRes,       2, 2, 1, 2)
             lytSystem.addWidget(self.cmbAPI,       3, 0, 1, 2)
             lytSystem.addWidget(self.cmbDevice,    3, 2, 1, 2)
+            lytSystem.addWidget(self.lblInferRequests, 4, 0, 1, 1)
+            lytSystem.addWidget(self.spnInferRequests, 4, 1, 1, 1)
+            lytSystem.addWidget(self.selReuse,     5, 0, 1, 4)
+            lytSystem.addWidget(self.selGate,      6, 0, 1, 4)
 
             self.grpCamera = QGroupBox("Check camera video alarm to enable")
             lytCamera = QGridLayout(self.grpCamera)
             lytCamera.addWidget(self.sldConfThre,    0, 0, 1, 4)
-            lytCamera.addWidget(self.lblSkipFrames,  1, 0, 1, 1)
-            lytCamera.addWidget(self.spnSkipFrames,  1, 1, 1, 1)
-            lytCamera.addWidget(self.lblSampleSize,  1, 2, 1, 1)
-            lytCamera.addWidget(self.spnSampleSize,  1, 3, 1, 1)
-            lytCamera.addWidget(QLabel(),            2, 0, 1, 4)
+            lytCamera.addWidget(self.lblSampleSize,  1, 0, 1, 1)
+            lytCamera.addWidget(self.spnSampleSize,  1, 1, 1, 1)
+            lytCamera.addWidget(self.selRegions,     2, 0, 1, 4)
             lytCamera.addWidget(self.selTargets,     3, 0, 1, 4)
 
             lytMain = QGridLayout(self)
@@ -251,14 +272,8 @@ class VideoConfigure(QWidget):
         self.mw.settings.setValue(self.autoKey, state)
         self.txtFilename.setEnabled(not self.chkAuto.isChecked())
 
-    def spnSkipFramesChanged(self, value):
-        if self.source == MediaSource.CAMERA:
-            if self.media:
-                if self.media.videoModelSettings:
-                    self.media.videoModelSettings.setSkipFrames(value)
-        if self.source == MediaSource.FILE:
-            if self.mw.filePanel.videoModelSettings:
-                self.mw.filePanel.videoModelSettings.setSkipFrames(value)
+    def spnInferRequestsChanged(self, value):
+        self.mw.settings.setValue(self.inferRequestsKey, value)
 
     def spnSampleSizeChanged(self, value):
         if self.source == MediaSource.CAMERA:
@@ -295,9 +310,9 @@ class VideoConfigure(QWidget):
                 camera.videoModelSettings = YoloxSettings(self.mw, camera)
             self.mw.videoPanel.lblCamera.setText(f'Camera - {camera.name()}')
             self.sldConfThre.setValue(camera.videoModelSettings.confidence)
-            self.spnSkipFrames.setValue(camera.videoModelSettings.skipFrames)
             self.spnSampleSize.setValue(camera.videoModelSettings.sampleSize)
             self.selTargets.setModelParameters(camera.videoModelSettings)
+            self.selRegions.setModelParameters(camera.videoModelSettings)
             if profile := self.mw.cameraPanel.getProfile(camera.uri()):
                 self.enableControls(profile.getAnalyzeVideo())
 
@@ -313,9 +328,9 @@ class VideoConfigure(QWidget):
                 file_dir = "Directory"
             self.mw.videoPanel.lblCamera.setText(f'{file_dir} - {os.path.split(file)[1]}')
             self.sldConfThre.setValue(self.mw.filePanel.videoModelSettings.confidence)
-            self.spnSkipFrames.setValue(self.mw.filePanel.videoModelSettings.skipFrames)
             self.spnSampleSize.setValue(self.mw.filePanel.videoModelSettings.sampleSize)
             self.selTargets.setModelParameters(self.mw.filePanel.videoModelSettings)
+            self.selRegions.setModelParameters(self.mw.filePanel.videoModelSettings)
             self.enableControls(self.mw.videoPanel.chkEnableFile.isChecked())
 
     def isModelSettings(self, arg):
@@ -362,6 +377,12 @@ class VideoWorker:
 
             self.num_classes = 80
             self.res = int(self.mw.videoConfigure.cmbRes.currentText())
+            self.letterbox = Letterbox(self.res, center=False, scale=1.0)
+            self.sequencer = ResultSequencer()
+            self.detection_cache = DetectionCache(self.mw.videoConfigure.selReuse.maxAge())
+            self.motion_gate = MotionGate()
+            # zero lets the device pick its optimal number of requests
+            self.infer_requests = self.mw.videoConfigure.spnInferRequests.value()
             initializer_data = torch.rand(1, 3, self.res, self.res)
             self.model_name = self.mw.videoConfigure.cmbModelName.currentText()
 
@@ -370,10 +391,18 @@ class VideoWorker:
             if self.api == "OpenVINO":
                 self.ov_device = self.mw.videoConfigure.cmbDevice.currentText()
 
-            if self.api == "OpenVINO" and Path(self.get_ov_model_filename()).is_file() and sys.platform != "darwin":
+            self.model = None
+            custom_file = "" if self.mw.videoConfigure.chkAuto.isChecked() else self.mw.videoConfigure.txtFilename.text()
+            cache_key = (MODULE_NAME, self.model_name, custom_file, self.res, self.api, 
+                         self.mw.videoConfigure.cmbDevice.currentText())
+            if cached := model_cache.get(cache_key):
+                self.model, self.compiled_model, self.torch_device = cached
+                ov_model = self.compiled_model
+
+            if self.api == "OpenVINO" and not ov_model and Path(self.get_ov_model_filename()).is_file() and sys.platform != "darwin":
                 ov_model = ov.Core().read_model(self.get_ov_model_filename())
             
-            if (self.api == "OpenVINO" and not ov_model) or self.api == "PyTorch":
+            if (self.api == "OpenVINO" and not ov_model) or (self.api == "PyTorch" and not self.model):
                 self.torch_device_name = "cpu"
                 if self.api == "PyTorch":
                     if torch.cuda.is_available():
@@ -414,7 +443,7 @@ class VideoWorker:
                 self.model.load_state_dict(torch.load(self.ckpt_file, map_location="cpu")["model"])
                 self.model(initializer_data.to(self.torch_device))
 
-            if self.api == "OpenVINO" and sys.platform != "darwin":
+            if self.api == "OpenVINO" and sys.platform != "darwin" and not self.compiled_model:
                 if not ov_model:
                     ov_model = ov.convert_model(self.model, example_input=initializer_data)
                     ov.save_model(ov_model, self.get_ov_model_filename())
@@ -422,68 +451,69 @@ class VideoWorker:
                 self.ov_device = self.mw.videoConfigure.cmbDevice.currentText()
                 if self.ov_device != "CPU":
                     ov_model.reshape({0: [1, 3, self.res, self.res]})
-                ov_config = {}
+                ov_config = {"CACHE_DIR": model_cache.compile_dir(MODULE_NAME)}
                 if "GPU" in self.ov_device or ("AUTO" in self.ov_device and "GPU" in ov.Core().available_devices):
-                    ov_config = {"GPU_DISABLE_WINOGRAD_CONVOLUTION": "YES"}
+                    ov_config["GPU_DISABLE_WINOGRAD_CONVOLUTION"] = "YES"
 
                 self.compiled_model = ov.compile_model(ov_model, self.ov_device, ov_config)
                 self.compiled_model(initializer_data)
-                self.infer_queue = ov.AsyncInferQueue(self.compiled_model)
-                self.infer_queue.set_callback(self.callback)
 
             if not self.torch_device:
                 self.torch_device = torch.device("cpu")
 
+            model_cache.put(cache_key, (self.model, self.compiled_model, self.torch_device))
+
+            if self.compiled_model:
+                self.infer_queue = ov.AsyncInferQueue(self.compiled_model, self.infer_requests)
+                logger.debug(f'{MODULE_NAME} running {len(self.infer_queue)} infer requests')
+                self.infer_queue.set_callback(self.callback)
+
         except Exception as ex:
             logger.exception(MODULE_NAME + " initialization failure")
             self.mw.signals.error.emit(f'{MODULE_NAME} initialization failure - {ex}')
 
         self.mw.glWidget.model_loading = False
 
-    def preprocess(self, player):
-        h = player.videoModelSettings.orig_img.shape[0]
-        w = player.videoModelSettings.orig_img.shape[1]
-
-        test_size = (self.res, self.res)
-        ratio = min(test_size[0] / h, test_size[1] / w)
-        inf_shape = (int(h * ratio), int(w * ratio))
-        bottom = test_size[0] - inf_shape[0]
-        side = test_size[1] - inf_shape[1]
-        pad = (0, 0, side, bottom)
-
-        timg = functional.to_tensor(player.videoModelSettings.orig_img).to(self.torch_device)
-        timg *= 255
-        timg = functional.resize(timg, inf_shape)
-        timg = functional.pad(timg, pad, 114)
-        timg = timg.unsqueeze(0)
+    def preprocess(self, img):
+        # yolox expects unnormalized pixel values with the picture in the top left corner
+        timg, _, _ = self.letterbox(img)
         return timg
     
-    def postprocess(self, outputs, player):
+    def postprocess(self, outputs, player, img):
+        # returns rows of x1, y1, x2, y2, score, class in image coordinates
         confthre = player.videoModelSettings.confidence / 100
         nmsthre = 0.65
         if isinstance(outputs, np.ndarray):
             outputs = torch.from_numpy(outputs)
         outputs = yolox.utils.postprocess(outputs, self.num_classes, confthre, nmsthre)
-        output = None
-        boxes = []
+        if outputs[0] is None:
+            return np.empty((0, 6))
+
         test_size = (self.res, self.res)
-        h = player.videoModelSettings.orig_img.shape[0]
-        w = player.videoModelSettings.orig_img.shape[1]
+        h = img.shape[0]
+        w = img.shape[1]
         ratio = min(test_size[0] / h, test_size[1] / w)
 
-        if outputs[0] is not None:
-            output = outputs[0].cpu().numpy().astype(float)
-            output[:, 0:4] /= ratio
-            output[:, 4] *= output[:, 5]
-            output = np.delete(output, 5, 1)
-
-            labels = output[:, 5].astype(int)
-            for i in range(len(labels)):
-                if labels[i] in player.videoModelSettings.targets:
-                    boxes.append(output[i, 0:4])
-
-        player.boxes = boxes
-        result = player.processModelOutput()
+        output = outputs[0].cpu().numpy().astype(float)
+        output[:, 0:4] /= ratio
+        output[:, 4] *= output[:, 5]
+        return np.delete(output, 5, 1)
+
+    def collect(self, result, detections, origin, sig):
+        # publishes once the last piece of a frame is in, unless a newer frame got there first
+        merged = result.add(detections, origin)
+        if merged is None or not self.sequencer.accept(result.player.uri, result.seq):
+            return
+        player = result.player
+        boxes = merged[np.isin(merged[:, 5].astype(int), player.videoModelSettings.targets), 0:4]
+        self.detection_cache.store(player.uri, sig, boxes)
+        self.publish(player, boxes)
+
+    def publish(self, player, boxes):
+        # alarm handling may start players, it is kept outside the player lock
+        with player.thread_lock:
+            player.boxes = boxes
+            result = player.processModelOutput()
         alarmState = result >= player.videoModelSettings.limit if result else False
         player.handleAlarm(alarmState)
 
@@ -507,18 +537,16 @@ class VideoWorker:
             if alarmState:
                 self.mw.videoConfigure.selTargets.indAlarm.setState(1)
 
-    def callback(self, infer_request, player):
+    def callback(self, infer_request, userdata):
+        result, crop, origin, sig = userdata
         try:
             if not self.mw.glWidget.model_loading:
-                player.lock()
                 outputs = infer_request.get_output_tensor(0).data
-                self.postprocess(outputs, player)
+                self.collect(result, self.postprocess(outputs, result.player, crop), origin, sig)
 
         except Exception as ex:
             logger.exception(f'{MODULE_NAME} callback error: {ex}')
 
-        player.unlock()
-
     def __call__(self, F, player):
         try:
             if len(IMPORT_ERROR) or self.mw.glWidget.model_loading or not self.mw.videoConfigure:
@@ -543,26 +571,38 @@ class VideoWorker:
             if not player.videoModelSettings:
                 raise Exception("Unable to set video model parameters for player")
 
-            if player.videoModelSettings.skipCounter < player.videoModelSettings.skipFrames:
-                player.videoModelSettings.skipCounter += 1
+            img = np.array(F, copy=False)
+
+            boxes, sig = None, None
+            if not self.motion_gate.check(self.mw.videoConfigure.selGate, player, img):
+                boxes = []
+            elif self.mw.videoConfigure.selReuse.isChecked():
+                self.detection_cache.max_age = self.mw.videoConfigure.selReuse.maxAge()
+                boxes, sig = self.detection_cache.lookup(player.uri, img)
+
+            if boxes is not None:
+                self.publish(player, boxes)
+                if self.parameters_changed():
+                    self.__init__(self.mw)
                 return
-            player.videoModelSettings.skipCounter = 0
 
-            player.lock()
-            player.videoModelSettings.orig_img = np.array(F, copy=False)
+            # the frame is cut into its regions of interest, the detections of the
+            # pieces are put back together in full frame coordinates by the RegionResult
+            tile = self.res * 2 if player.videoModelSettings.tileRegions else 0
+            crops = region_crops(img, player.videoModelSettings.regions, tile)
+            result = RegionResult(player, img, len(crops), self.sequencer.next(player.uri))
 
             if self.api == "OpenVINO" and self.compiled_model:
-                timg = self.preprocess(player)
-                
-                self.infer_queue.wait_all()
-                self.infer_queue.start_async({0: timg}, player, False)
+                for crop, origin in crops:
+                    timg = self.preprocess(crop)
+                    self.infer_queue.start_async({0: timg}, (result, crop, origin, sig), False)
             
             if self.api == "PyTorch" and self.model:
-                timg = self.preprocess(player)
-                with torch.no_grad():
-                    outputs = self.model(timg)
-
-                self.postprocess(outputs, player)
+                for crop, origin in crops:
+                    timg = torch.from_numpy(self.preprocess(crop)).to(self.torch_device)
+                    with torch.no_grad():
+                        outputs = self.model(timg)
+                    self.collect(result, self.postprocess(outputs, player, crop), origin, sig)
 
             if self.parameters_changed():
                 self.__init__(self.mw)
@@ -572,14 +612,13 @@ class VideoWorker:
                 logger.exception(f'{MODULE_NAME} runtime error - {ex}')
             self.last_ex = str(ex)
 
-        player.unlock()
-
     def parameters_changed(self):
         result = False
 
         api = self.api == self.mw.videoConfigure.cmbAPI.currentText()
         name = self.model_name == self.mw.videoConfigure.cmbModelName.currentText()
         res = str(self.res) == self.mw.videoConfigure.cmbRes.currentText()
+        jobs = self.api != "OpenVINO" or self.infer_requests == self.mw.videoConfigure.spnInferRequests.value()
 
         dev = False
         if self.api == "PyTorch":
@@ -589,7 +628,7 @@ class VideoWorker:
         if self.api == "OpenVINO":
             dev = self.ov_device == self.mw.videoConfigure.cmbDevice.currentText()
 
-        if not api or not name or not res or not dev:
+        if not api or not name or not res or not dev or not jobs:
             result = True
 
         return result